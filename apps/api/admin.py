@@ -1,4 +1,13 @@
+from datetime import timedelta
+
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.functional import cached_property
+
 from apps.api.models import (
     OpenSolarProject,
     OpenSolarCustomer,
@@ -6,47 +15,149 @@ from apps.api.models import (
     OpenSolarModule,
     OpenSolarInverter,
     OpenSolarBattery,
+    SyncFailure,
+    SyncRun,
+    SyncStageRun,
 )
 
+
+class EstimatedCountPaginator(Paginator):
+    """
+    COUNT(*) on a table with hundreds of thousands of rows costs a full scan on
+    every changelist load. When the list is unfiltered and the table is large,
+    use the planner's estimate from pg_class.reltuples (kept current by
+    autovacuum/ANALYZE) instead; filtered and small lists are counted exactly.
+    """
+    EXACT_BELOW = 10_000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, "query", None)
+        if connection.vendor == "postgresql" and query is not None and not query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [self.object_list.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= self.EXACT_BELOW:
+                return row[0]
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for the fleet-sized tables."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # skip the second, unfiltered COUNT(*) when searching
+
+
 class OpenSolarProposalInline(admin.TabularInline):
     model = OpenSolarProposal
     extra = 0
 
 @admin.register(OpenSolarProject)
-class OpenSolarProjectAdmin(admin.ModelAdmin):
+class OpenSolarProjectAdmin(LargeTableAdmin):
     list_display = ('name', 'external_id', 'status', 'customer', 'created_at', 'price_including_tax')  # Display only 'price_including_tax'
-    search_fields = ('name', 'external_id')
+    list_select_related = ('customer',)
+    search_fields = ('name', '=external_id')  # trigram index on name, unique index on external_id
     list_per_page = 50  # Set the number of records per page here (adjust as needed)
     exclude = ('price', 'price_excluding_tax')  # Exclude 'price' and 'price_excluding_tax' from the form
+    raw_id_fields = ('customer',)
 
 @admin.register(OpenSolarCustomer)
-class OpenSolarCustomerAdmin(admin.ModelAdmin):
+class OpenSolarCustomerAdmin(LargeTableAdmin):
     list_display = ('name', 'email', 'phone')
-    search_fields = ('name', 'email')
+    search_fields = ('name', 'email')  # both trigram-indexed
 
-@admin.register(OpenSolarModule)
-class OpenSolarModuleAdmin(admin.ModelAdmin):
+
+class ComponentAdmin(LargeTableAdmin):
     list_display = ('code', 'manufacturer_name', 'quantity', 'get_project')
-    search_fields = ('code', 'manufacturer_name', 'project__name')
+    list_select_related = ('project',)
+    # Every column has a trigram index (the project's name too); external_id is unique.
+    search_fields = ('code', 'manufacturer_name', 'project__name', '=project__external_id')
+    raw_id_fields = ('project',)
 
+    @admin.display(description='Project', ordering='project__name')
     def get_project(self, obj):
         return obj.project.name
-    get_project.short_description = 'Project'
 
-@admin.register(OpenSolarInverter)
-class OpenSolarInverterAdmin(admin.ModelAdmin):
-    list_display = ('code', 'manufacturer_name', 'quantity', 'get_project')
-    search_fields = ('code', 'manufacturer_name', 'project__name')
 
-    def get_project(self, obj):
-        return obj.project.name
-    get_project.short_description = 'Project'
+@admin.register(OpenSolarModule)
+class OpenSolarModuleAdmin(ComponentAdmin):
+    pass
+
+@admin.register(OpenSolarInverter)
+class OpenSolarInverterAdmin(ComponentAdmin):
+    pass
 
 @admin.register(OpenSolarBattery)
-class OpenSolarBatteryAdmin(admin.ModelAdmin):
-    list_display = ('code', 'manufacturer_name', 'quantity', 'get_project')
-    search_fields = ('code', 'manufacturer_name', 'project__name')
+class OpenSolarBatteryAdmin(ComponentAdmin):
+    pass
 
-    def get_project(self, obj):
-        return obj.project.name
-    get_project.short_description = 'Project'
+
+class SyncStageRunInline(admin.TabularInline):
+    model = SyncStageRun
+    extra = 0
+    can_delete = False
+    fields = ('stage', 'status', 'started_at', 'duration', 'processed', 'skipped', 'failed',
+              'http_calls', 'retries', 'bytes_transferred', 'error')
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SyncRun)
+class SyncRunAdmin(admin.ModelAdmin):
+    list_display = ('command', 'status', 'targeted', 'full', 'started_at', 'duration')
+    list_filter = ('command', 'status', 'targeted', 'full')
+    date_hierarchy = 'started_at'
+    readonly_fields = ('command', 'targeted', 'full', 'status', 'started_at', 'finished_at', 'error')
+    inlines = [SyncStageRunInline]
+
+
+@admin.register(SyncStageRun)
+class SyncStageRunAdmin(admin.ModelAdmin):
+    list_display = ('stage', 'status', 'started_at', 'duration', 'processed', 'skipped', 'failed',
+                    'http_calls', 'retries', 'bytes_transferred', 'records_per_minute')
+    list_filter = ('stage', 'status', 'run__targeted')
+    list_select_related = ('run',)
+    date_hierarchy = 'started_at'
+    readonly_fields = [f.name for f in SyncStageRun._meta.fields]
+    change_list_template = 'admin/api/syncstagerun/change_list.html'
+
+    TREND_DAYS = 14
+
+    def changelist_view(self, request, extra_context=None):
+        """Per-stage daily averages above the list, to make throughput regressions visible."""
+        since = timezone.now() - timedelta(days=self.TREND_DAYS)
+        duration = ExpressionWrapper(F('finished_at') - F('started_at'), output_field=DurationField())
+        rows = (SyncStageRun.objects
+                .filter(started_at__gte=since, finished_at__isnull=False, run__targeted=False)
+                .annotate(day=TruncDate('started_at'))
+                .values('stage', 'day')
+                .annotate(runs=Count('id'), avg_duration=Avg(duration), processed=Sum('processed'),
+                          http_calls=Sum('http_calls'), retries=Sum('retries'), failed=Sum('failed'))
+                .order_by('stage', '-day'))
+
+        trends = []
+        for row in rows:
+            seconds = row['avg_duration'].total_seconds() if row['avg_duration'] else 0
+            per_run = row['processed'] / row['runs']
+            trends.append({
+                **row,
+                'avg_duration': timedelta(seconds=round(seconds)),
+                'records_per_minute': round(per_run * 60 / seconds, 1) if seconds else None,
+                'http_per_record': round(row['http_calls'] / row['processed'], 2) if row['processed'] else None,
+            })
+
+        extra_context = {**(extra_context or {}), 'trends': trends, 'trend_days': self.TREND_DAYS}
+        return super().changelist_view(request, extra_context=extra_context)
+
+
+@admin.register(SyncFailure)
+class SyncFailureAdmin(admin.ModelAdmin):
+    list_display = ('stage', 'external_id', 'error_class', 'attempts', 'last_failed_at', 'next_retry_at')
+    list_filter = ('stage', 'error_class')
+    search_fields = ('=external_id',)
+    readonly_fields = [f.name for f in SyncFailure._meta.fields]
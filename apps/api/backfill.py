@@ -0,0 +1,329 @@
+"""
+Set-based backfill for onboarding a whole org (`sync_opensolar --backfill`).
+
+Instead of an update_or_create per row, every fetched project is normalized
+into plain rows (the same mapping as sync_opensolar's per-row ingest),
+streamed with COPY FROM STDIN into temporary staging tables and merged into
+the real tables with one statement per model:
+
+  * customers, projects, proposals – INSERT … SELECT … ON CONFLICT (external_id)
+    DO UPDATE, keeping the newest staged row per external_id;
+  * modules, inverters, batteries – they have no natural key, so, as in the
+    per-row ingest, the staged projects' components are deleted and
+    re-inserted with one DELETE and one INSERT … SELECT per model;
+  * raw payloads – replaced the same way, keeping the newest per project.
+
+Postgres only (psycopg2's copy_expert). Records come from a live fetch,
+from a JSONL archive written by an earlier --save-archive run (see
+iter_archive()/ArchiveWriter) or, for `manage.py remap`, from the stored
+OpenSolarProjectPayload rows.
+"""
+import gzip
+import json
+from tempfile import SpooledTemporaryFile
+
+from django.db import connection, transaction
+
+from apps.api.models import (
+    OpenSolarBattery,
+    OpenSolarCustomer,
+    OpenSolarInverter,
+    OpenSolarModule,
+    OpenSolarProject,
+    OpenSolarProjectPayload,
+    OpenSolarProposal,
+)
+
+
+class _Spec:
+    """How one model is staged and merged."""
+
+    def __init__(self, model, fields, parent=None, key="external_id", keep_existing=(), one_per_parent=False):
+        self.model = model
+        self.fields = fields            # staged model fields, in COPY order
+        self.parent = parent            # (fk field name, parent model) joined on external_id
+        self.key = key                  # conflict target, or None for replace-by-project
+        self.keep_existing = keep_existing  # NULL in the staged row keeps the stored value
+        self.one_per_parent = one_per_parent  # replace-by-project, newest staged row only
+
+    @property
+    def table(self):
+        return self.model._meta.db_table
+
+    @property
+    def staging(self):
+        return f"backfill_{self.model._meta.model_name}"
+
+    def columns(self):
+        return ["seq"] + self.fields + (["parent_external_id"] if self.parent else [])
+
+
+SPECS = [
+    _Spec(OpenSolarCustomer,
+          ["external_id", "name", "email", "phone", "address", "city", "state", "zip_code"]),
+    _Spec(OpenSolarProject,
+          ["external_id", "name", "status", "created_at", "project_type", "share_link",
+           "system_size_kw", "system_output_kwh", "battery_size_kwh", "price_including_tax",
+           "remote_modified_at"],  # not deleted_at: only the ingest tombstones or restores
+          parent=("customer", OpenSolarCustomer),
+          keep_existing=("system_size_kw", "system_output_kwh", "battery_size_kwh", "price_including_tax")),
+    _Spec(OpenSolarProposal,
+          ["external_id", "title", "pdf_url", "created_at", "system_size_kw", "system_output_kwh",
+           "price", "battery_size_kwh"],
+          parent=("project", OpenSolarProject)),
+    _Spec(OpenSolarModule, ["manufacturer_name", "code", "quantity"], parent=("project", OpenSolarProject), key=None),
+    _Spec(OpenSolarInverter, ["manufacturer_name", "code", "quantity"], parent=("project", OpenSolarProject), key=None),
+    _Spec(OpenSolarBattery, ["manufacturer_name", "code", "quantity"], parent=("project", OpenSolarProject), key=None),
+    _Spec(OpenSolarProjectPayload, ["detail", "systems", "activations"], parent=("project", OpenSolarProject),
+          key=None, one_per_parent=True),
+]
+_BY_MODEL = {spec.model: spec for spec in SPECS}
+
+
+def normalize(summary, detail, systems, activations):
+    """
+    Rows for one project, as {model: [row dict, ...]}. Mirrors
+    sync_opensolar's per-row ingest: the listing entry supplies the contact
+    and project fields, the detail the share link and proposals, the last
+    system the sizes and price, and inverters whose activation could not be
+    fetched are dropped.
+    """
+    pid = str(summary["id"])
+    rows = {spec.model: [] for spec in SPECS}
+
+    contact = (summary.get("contacts_data") or [{}])[0]
+    customer_id = None
+    if contact.get("id"):
+        customer_id = str(contact["id"])
+        rows[OpenSolarCustomer].append({
+            "external_id": customer_id,
+            "name":        contact.get("display") or "No Name",
+            "email":       contact.get("email", ""),
+            "phone":       contact.get("phone", ""),
+            "address":     summary.get("address", ""),
+            "city":        summary.get("locality", ""),
+            "state":       summary.get("state", ""),
+            "zip_code":    summary.get("zip", ""),
+        })
+
+    proposals = detail.get("proposals", [])
+    project = {
+        "external_id":  pid,
+        "name":         summary.get("title", ""),
+        "status":       str(summary.get("stage", "")),
+        "created_at":   summary.get("created_date"),
+        "project_type": "Residential" if summary.get("is_residential") else "Commercial",
+        "share_link":   detail.get("share_link", ""),
+        "system_size_kw": None, "system_output_kwh": None, "battery_size_kwh": None,
+        "price_including_tax": None,
+        "remote_modified_at": summary.get("modified_date"),
+        "parent_external_id": customer_id,
+    }
+    rows[OpenSolarProject].append(project)
+
+    for prop in proposals:
+        rows[OpenSolarProposal].append({
+            "external_id":       str(prop.get("id")),
+            "title":             prop.get("title", "Untitled"),
+            "pdf_url":           prop.get("pdf_url"),
+            "created_at":        prop.get("created_at"),
+            "system_size_kw":    prop.get("kw_stc"),
+            "system_output_kwh": prop.get("output_annual_kwh"),
+            "price":             prop.get("price_including_tax"),
+            "battery_size_kwh":  prop.get("battery_total_kwh"),
+            "parent_external_id": pid,
+        })
+
+    battery_codes = set()
+    for system in systems or []:
+        price = system.get("price_including_tax")
+        if price is None:
+            price = next((p["price_including_tax"] for p in proposals if p.get("price_including_tax")), None)
+        if price is not None:
+            project["price_including_tax"] = price
+        project["system_size_kw"]    = system.get("kw_stc")
+        project["system_output_kwh"] = system.get("output_annual_kwh")
+        project["battery_size_kwh"]  = system.get("battery_total_kwh")
+
+        total_mod_qty = 0
+        for m in system.get("modules", []):
+            total_mod_qty += m.get("quantity", 0)
+            rows[OpenSolarModule].append({
+                "manufacturer_name": m.get("manufacturer_name", ""), "code": m.get("code", ""),
+                "quantity": m.get("quantity", 0), "parent_external_id": pid,
+            })
+
+        for inv in system.get("inverters", []):
+            qty = inv.get("quantity", 0) or 0
+            activation_id = inv.get("inverter_activation_id")
+            if activation_id:
+                inv_detail = activations.get(str(activation_id))
+                if inv_detail is None:
+                    continue
+                if inv_detail.get("data"):
+                    parsed = json.loads(inv_detail["data"])
+                    if str(parsed.get("microinverter", "")).upper() == "Y":
+                        qty = total_mod_qty
+            rows[OpenSolarInverter].append({
+                "manufacturer_name": inv.get("manufacturer_name", ""), "code": inv.get("code", ""),
+                "quantity": qty, "parent_external_id": pid,
+            })
+
+        for b in system.get("batteries", []):
+            if b.get("code") in battery_codes:
+                continue
+            battery_codes.add(b.get("code"))
+            rows[OpenSolarBattery].append({
+                "manufacturer_name": b.get("manufacturer_name", ""), "code": b.get("code", ""),
+                "quantity": b.get("quantity", 0), "parent_external_id": pid,
+            })
+
+    rows[OpenSolarProjectPayload].append({
+        "detail": detail, "systems": systems, "activations": activations, "parent_external_id": pid,
+    })
+    return rows
+
+
+def _copy_value(value):
+    """One field in COPY's text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+class Backfill:
+    """
+    Collects normalized rows in spooled COPY buffers, then load()s them in
+    one transaction. With store_payloads=False the raw payloads are left as
+    they are (remap reads them, so rewriting them would be wasted work).
+    """
+    SPOOL_BYTES = 16 * 1024 * 1024  # per table, before spilling to disk
+
+    def __init__(self, store_payloads=True):
+        if connection.vendor != "postgresql":
+            raise RuntimeError("The COPY backfill needs PostgreSQL")
+        self.specs = [spec for spec in SPECS if store_payloads or spec.model is not OpenSolarProjectPayload]
+        self.buffers = {spec.model: SpooledTemporaryFile(self.SPOOL_BYTES, mode="w+", encoding="utf-8")
+                        for spec in self.specs}
+        self.staged = dict.fromkeys(self.buffers, 0)
+        self.seq = 0
+
+    def add(self, record):
+        """Stage one archive record ({"summary", "detail", "systems", "activations"})."""
+        rows = normalize(record["summary"], record["detail"], record.get("systems"),
+                         record.get("activations") or {})
+        for model, model_rows in rows.items():
+            if model not in self.buffers:
+                continue
+            spec, buf = _BY_MODEL[model], self.buffers[model]
+            for row in model_rows:
+                self.seq += 1
+                values = [self.seq] + [row.get(name) for name in spec.columns()[1:]]
+                buf.write("\t".join(_copy_value(v) for v in values) + "\n")
+            self.staged[model] += len(model_rows)
+
+    def load(self):
+        """COPY everything into staging tables and merge. Returns {model name: rows written}."""
+        written = {}
+        with transaction.atomic(), connection.cursor() as cursor:
+            for spec in self.specs:
+                self._create_staging(cursor, spec)
+                buf = self.buffers[spec.model]
+                buf.seek(0)
+                cols = ", ".join(spec.columns())
+                cursor.copy_expert(f"COPY {spec.staging} ({cols}) FROM STDIN", buf)
+                cursor.execute(f"ANALYZE {spec.staging}")
+
+            for spec in self.specs:
+                for sql in self._merge_sql(spec):
+                    cursor.execute(sql)
+                written[spec.model.__name__] = cursor.rowcount
+        for buf in self.buffers.values():
+            buf.close()
+        return written
+
+    @staticmethod
+    def _create_staging(cursor, spec):
+        defs = ["seq bigint"]
+        for name in spec.fields:
+            defs.append(f"{name} {spec.model._meta.get_field(name).db_type(connection)}")
+        if spec.parent:
+            defs.append("parent_external_id varchar(100)")
+        cursor.execute(f"CREATE TEMP TABLE {spec.staging} ({', '.join(defs)}) ON COMMIT DROP")
+
+    @staticmethod
+    def _merge_sql(spec):
+        meta = spec.model._meta
+        pairs = [(name, meta.get_field(name).column, f"s.{name}") for name in spec.fields]
+        join = ""
+        if spec.parent:
+            fk_name, parent = spec.parent
+            pairs.append((fk_name, meta.get_field(fk_name).column, "p.id"))
+            kind = "LEFT JOIN" if spec.model is OpenSolarProject else "JOIN"
+            join = f"{kind} {parent._meta.db_table} p ON p.external_id = s.parent_external_id"
+        for field in meta.concrete_fields:
+            if getattr(field, "auto_now", False):  # bulk SQL bypasses auto_now
+                pairs.append((field.name, field.column, "now()"))
+
+        columns = ", ".join(column for _, column, _ in pairs)
+        select = ", ".join(expr for _, _, expr in pairs)
+        insert = f"INSERT INTO {spec.table} ({columns})"
+
+        if spec.key is None:
+            projects = _BY_MODEL[OpenSolarProject]
+            if spec.one_per_parent:
+                rows = (f"SELECT DISTINCT ON (s.parent_external_id) {select} FROM {spec.staging} s {join} "
+                        f"ORDER BY s.parent_external_id, s.seq DESC")
+            else:
+                rows = f"SELECT {select} FROM {spec.staging} s {join} ORDER BY s.seq"
+            return [
+                f"DELETE FROM {spec.table} WHERE project_id IN ("
+                f"SELECT p.id FROM {projects.table} p JOIN {projects.staging} s "
+                f"ON s.external_id = p.external_id)",
+                f"{insert} {rows}",
+            ]
+
+        updates = []
+        for name, column, _ in pairs:
+            if name == spec.key:
+                continue
+            if name in spec.keep_existing:
+                updates.append(f"{column} = COALESCE(EXCLUDED.{column}, {spec.table}.{column})")
+            else:
+                updates.append(f"{column} = EXCLUDED.{column}")
+        return [
+            f"{insert} SELECT DISTINCT ON (s.{spec.key}) {select} "
+            f"FROM {spec.staging} s {join} ORDER BY s.{spec.key}, s.seq DESC "
+            f"ON CONFLICT ({spec.key}) DO UPDATE SET {', '.join(updates)}"
+        ]
+
+
+# ─── Archives ───────────────────────────────────────────────────────────────
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def iter_archive(path):
+    """Yield the records of a JSONL archive (optionally gzipped)."""
+    with _open(path, "r") as fh:
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+
+
+class ArchiveWriter:
+    def __init__(self, path):
+        self.fh = _open(path, "w")
+
+    def write(self, record):
+        self.fh.write(json.dumps(record) + "\n")
+
+    def close(self):
+        self.fh.close()
@@ -0,0 +1,149 @@
+"""
+Circuit breakers and timeouts for the calls to OpenSolar and Odoo.
+
+Every outbound request runs inside guard(system), which shares one
+CircuitBreaker per remote system across the process (stage commands,
+pipeline threads, the daemon):
+
+  * closed – calls go through; SYNC_BREAKER_FAILURES consecutive failures
+    (a connection error, a timeout or a 502/503/504) trip it open;
+  * open – calls fail at once with CircuitOpen, so a run against a dead
+    backend stops instead of timing out record after record;
+  * half-open – after SYNC_BREAKER_RESET_SECONDS one probe call is let
+    through; success closes the breaker, failure opens it again.
+
+timeouts() is the (connect, read) pair every request passes to requests,
+from SYNC_CONNECT_TIMEOUT and SYNC_READ_TIMEOUT.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from apps.api import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+FAILURES = 5           # consecutive failures that trip a breaker
+RESET_SECONDS = 30.0   # how long a breaker stays open before a probe
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 60.0
+OUTAGE_STATUSES = frozenset({502, 503, 504})  # a 500 is about the record, not the backend
+
+_breakers = {}
+_registry_lock = threading.Lock()
+
+
+def _setting(name, default):
+    try:
+        from django.conf import settings
+        return getattr(settings, name, default)
+    except Exception:  # used outside Django (utils/ scripts)
+        return default
+
+
+class CircuitOpen(Exception):
+    """Calls to a remote system are refused while its breaker is open."""
+
+    def __init__(self, system, retry_in):
+        super().__init__(f"{system} circuit is open after repeated failures; next probe in {retry_in:.0f}s")
+        self.system = system
+
+
+class CircuitBreaker:
+    def __init__(self, system, failures=FAILURES, reset_seconds=RESET_SECONDS, clock=time.monotonic):
+        self.system = system
+        self.failure_threshold = failures
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return CLOSED
+        if self.clock() - self.opened_at >= self.reset_seconds:
+            return HALF_OPEN
+        return OPEN
+
+    def before_call(self):
+        """Raise CircuitOpen unless a call may go through now."""
+        with self.lock:
+            state = self.state
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self.probing:
+                self.probing = True  # this call is the probe; everyone else keeps failing fast
+                return
+            raise CircuitOpen(self.system, max(0.0, self.opened_at + self.reset_seconds - self.clock()))
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    metrics.CIRCUIT_TRIPS.inc(system=self.system)
+                self.opened_at = self.clock()
+                self.probing = False
+
+
+class _Call:
+    def __init__(self):
+        self.failed = False
+
+    def check(self, status):
+        """Count this call as a failure if `status` says the backend is down."""
+        if status in OUTAGE_STATUSES:
+            self.failed = True
+
+
+def breaker(system):
+    with _registry_lock:
+        if system not in _breakers:
+            _breakers[system] = CircuitBreaker(
+                system,
+                failures=_setting("SYNC_BREAKER_FAILURES", FAILURES),
+                reset_seconds=_setting("SYNC_BREAKER_RESET_SECONDS", RESET_SECONDS),
+            )
+        return _breakers[system]
+
+
+def reset():
+    """Forget every breaker (tests, or after changing the settings)."""
+    with _registry_lock:
+        _breakers.clear()
+
+
+@contextmanager
+def guard(system):
+    """
+    Run one request through `system`'s breaker. Any exception inside the
+    block counts as a failure; so does a status passed to the yielded
+    call's check() that means the backend is down.
+    """
+    b = breaker(system)
+    b.before_call()
+    call = _Call()
+    try:
+        yield call
+    except Exception:
+        b.record_failure()
+        raise
+    if call.failed:
+        b.record_failure()
+    else:
+        b.record_success()
+
+
+def timeouts():
+    return (_setting("SYNC_CONNECT_TIMEOUT", CONNECT_TIMEOUT), _setting("SYNC_READ_TIMEOUT", READ_TIMEOUT))
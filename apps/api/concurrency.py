@@ -0,0 +1,249 @@
+"""
+Adaptive (AIMD) limits on in-flight requests to OpenSolar and Odoo.
+
+Each remote system has one AdaptiveLimit shared across the process. Every
+request holds a slot() for its duration, and the limit moves with what the
+backend tells us:
+
+  * additive increase – after each window of WINDOW successful calls whose
+    p95 latency stayed within TOLERANCE × the baseline, and during which the
+    limit was actually reached, allow one more request in flight;
+  * multiplicative decrease – on a 429, a 5xx, a connection error or timeout,
+    or a window p95 above TOLERANCE × baseline, multiply the limit by
+    BACKOFF, at most once per round of in-flight requests.
+
+The baseline is the lowest window p95 seen, drifting slowly upwards so a
+backend that got permanently slower is not punished forever. So the limit
+settles just under the point where the backend starts queueing or throttling
+us, and follows it as OpenSolar's limits or our Odoo's capacity change.
+
+imap() runs the per-record work of a stage on max_limit worker threads; the
+slots, not the thread count, decide how many requests are really in flight.
+Only HTTP work belongs on the workers: the items are read and the results
+handled on the calling thread, so database access stays there.
+
+The current limit, in-flight count, window p95 and decreases per reason are
+exported as metrics.
+"""
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from apps.api import metrics
+from apps.api.profiling import thread_profile
+
+WINDOW = 20
+TOLERANCE = 1.5
+BACKOFF = 0.5
+BASELINE_DRIFT = 0.1  # how far the baseline moves towards a slower window p95
+DEFAULTS = {
+    "opensolar": {"initial": 1, "max_limit": 8},
+    "odoo": {"initial": 2, "max_limit": 8},
+}
+
+_limits = {}
+_registry_lock = threading.Lock()
+
+
+def _setting(name, default):
+    try:
+        from django.conf import settings
+        return getattr(settings, name, default)
+    except Exception:  # used outside Django (utils/ scripts)
+        return default
+
+
+def p95(samples):
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]
+
+
+class _Outcome:
+    def __init__(self):
+        self.reason = None
+
+    def check(self, status):
+        """Treat the call as a congestion signal if `status` is a 429 or 5xx."""
+        if status == 429:
+            self.reason = "throttled"
+        elif status >= 500:
+            self.reason = "server_error"
+
+
+class AdaptiveLimit:
+    def __init__(self, system, initial=1, min_limit=1, max_limit=8, window=WINDOW,
+                 tolerance=TOLERANCE, backoff=BACKOFF, clock=time.perf_counter):
+        self.system = system
+        self.min_limit = min_limit
+        self.max_limit = max(min_limit, max_limit)
+        self.window = window
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.clock = clock
+        self.cond = threading.Condition()
+
+        self.limit = float(min(max(initial, min_limit), self.max_limit))
+        self.in_flight = 0
+        self.samples = []
+        self.baseline = None
+        self.p95 = None
+        self.saturated = False     # the limit was reached during this window
+        self.completed = 0
+        self.settle_at = 0         # `completed` once the calls in flight at the last decrease are done
+        self._publish()
+
+    @property
+    def allowed(self):
+        return max(self.min_limit, int(self.limit))
+
+    @contextmanager
+    def slot(self):
+        """
+        Hold one in-flight slot for a request, waiting for one if the limit
+        is reached. Pass the response status to the yielded outcome's check();
+        an exception inside the block counts as a failure.
+        """
+        with self.cond:
+            while self.in_flight >= self.allowed:
+                self.saturated = True
+                self.cond.wait()
+            self.in_flight += 1
+            if self.in_flight >= self.allowed:
+                self.saturated = True
+            self._publish()
+        outcome = _Outcome()
+        started = self.clock()
+        try:
+            yield outcome
+        except Exception:
+            outcome.reason = "error"
+            raise
+        finally:
+            self._release(self.clock() - started, outcome.reason)
+
+    def _release(self, latency, reason):
+        with self.cond:
+            self.in_flight -= 1
+            self.completed += 1
+            if reason is not None:
+                self._decrease(reason)
+            else:
+                self.samples.append(latency)
+                if len(self.samples) >= self.window:
+                    self._end_window()
+            self._publish()
+            self.cond.notify_all()
+
+    def _end_window(self):
+        self.p95 = p95(self.samples)
+        if self.baseline is None or self.p95 < self.baseline:
+            self.baseline = self.p95
+        else:
+            self.baseline += (self.p95 - self.baseline) * BASELINE_DRIFT
+        if self.p95 > self.baseline * self.tolerance:
+            self._decrease("latency")
+        elif self.saturated and self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + 1)
+        self.samples = []
+        self.saturated = False
+
+    def _decrease(self, reason):
+        # Calls already in flight when the backend pushed back report the same
+        # overload; only the first of them counts.
+        if self.completed <= self.settle_at:
+            return
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+        self.settle_at = self.completed + self.in_flight
+        self.samples = []
+        self.saturated = False
+        metrics.CONCURRENCY_DECREASES.inc(system=self.system, reason=reason)
+
+    def _publish(self):
+        metrics.CONCURRENCY_LIMIT.set(self.allowed, system=self.system)
+        metrics.IN_FLIGHT.set(self.in_flight, system=self.system)
+        if self.p95 is not None:
+            metrics.WINDOW_P95.set(self.p95, system=self.system)
+
+
+class KeyedLocks:
+    """
+    One lock per key, for push workers that search Odoo for a record and
+    create it if missing: two workers handling the same key must not both
+    miss and create a duplicate. Use as `with locks(key):`; a key's lock is
+    dropped once nobody holds or waits for it, so a long-lived instance
+    stays as small as the work in flight.
+    """
+
+    def __init__(self):
+        self._locks = {}  # key -> [lock, holders + waiters]
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def __call__(self, key):
+        with self._lock:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+
+    def __len__(self):
+        return len(self._locks)
+
+
+def limiter(system):
+    with _registry_lock:
+        if system not in _limits:
+            config = {**DEFAULTS.get(system, {}), **_setting("SYNC_CONCURRENCY", {}).get(system, {})}
+            _limits[system] = AdaptiveLimit(system, **config)
+        return _limits[system]
+
+
+def reset():
+    """Forget every limit (tests, or after changing SYNC_CONCURRENCY)."""
+    with _registry_lock:
+        _limits.clear()
+
+
+def _profiled_call(func, item):
+    """Run func on a worker, in --profile's view like the pipeline stage threads."""
+    with thread_profile():
+        return func(item)
+
+
+def imap(func, items, system):
+    """
+    Yield (item, func(item)) in input order, running func on up to
+    `system`'s max_limit worker threads. `items` is consumed on the calling
+    thread, a bounded distance ahead of the results. An exception from func
+    is raised when its item's turn comes.
+    """
+    workers = limiter(system).max_limit
+    if workers <= 1:
+        for item in items:
+            yield item, func(item)
+        return
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{system}-worker")
+    pending = deque()
+    try:
+        for item in items:
+            # copy_context: keep the run_id etc. bound for tracing on the worker
+            pending.append((item, pool.submit(contextvars.copy_context().run, _profiled_call, func, item)))
+            if len(pending) >= 2 * workers:
+                item, future = pending.popleft()
+                yield item, future.result()
+        while pending:
+            item, future = pending.popleft()
+            yield item, future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,48 @@
+"""
+Credentials and endpoints for OpenSolar and Odoo, resolved on first use.
+
+    from apps.api.conf import sync_settings
+    OdooJSONRPC(sync_settings.ODOO_URL)
+
+Each name is read from Django settings the first time it is asked for and
+cached; a missing value raises ImproperlyConfigured at that point, not when a
+module is imported, so `manage.py help`, migrations and the admin work
+without credentials. The cache is dropped whenever a setting changes
+(override_settings in tests).
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+REQUIRED = (
+    "OPENSOLAR_API_TOKEN",
+    "OPENSOLAR_ORG_ID",
+    "ODOO_URL",
+    "ODOO_DB",
+    "ODOO_API_USERNAME",
+    "ODOO_API_TOKEN",
+)
+
+
+class SyncSettings:
+    def __getattr__(self, name):
+        if name not in REQUIRED:
+            raise AttributeError(name)
+        value = getattr(settings, name, "")
+        if not value:
+            raise ImproperlyConfigured(f"{name} is not set; add it to the environment or .env")
+        self.__dict__[name] = value
+        return value
+
+    def reset(self):
+        self.__dict__.clear()
+
+
+sync_settings = SyncSettings()
+
+
+@receiver(setting_changed)
+def _reset_sync_settings(setting, **kwargs):
+    if setting in REQUIRED:
+        sync_settings.reset()
@@ -0,0 +1,80 @@
+"""
+Dead-letter queue for the Odoo push stages.
+
+A contact that fails in sync_contacts_to_odoo, or a project that
+sync_projects_to_odoo skips (no customer, no share_link, no Odoo partner) or
+fails on, gets a SyncFailure row instead of just a line on stderr; the next
+successful sync of that record deletes it.
+
+`manage.py retry_failures` re-runs the due rows as targeted syncs of just
+those records. Each failed attempt pushes the next one back exponentially
+(RETRY_BASE, doubling, capped at RETRY_MAX); after MAX_ATTEMPTS the row is
+kept with no retry time, for someone to look at in the admin.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from apps.api.models import SyncFailure
+
+# stage -> the SyncCommand option that targets one of its records
+STAGE_TARGETS = {
+    "sync_contacts_to_odoo": "customer_id",
+    "sync_projects_to_odoo": "project_id",
+}
+RETRY_BASE = timedelta(minutes=5)
+RETRY_MAX = timedelta(hours=12)
+MAX_ATTEMPTS = 8
+
+
+def next_retry_at(attempts, now):
+    """When to retry after `attempts` failures, or None once they are used up."""
+    if attempts >= MAX_ATTEMPTS:
+        return None
+    return now + min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX)
+
+
+class FailureLog:
+    """
+    Records and clears one stage's SyncFailure rows. The ids with an open
+    failure are read once per run, so a clean record costs no extra query.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.reset()
+
+    def reset(self):
+        self._open = None
+
+    def open_ids(self):
+        if self._open is None:
+            self._open = set(SyncFailure.objects.filter(stage=self.stage).values_list("external_id", flat=True))
+        return self._open
+
+    def record(self, external_id, error_class, message=""):
+        external_id = str(external_id)
+        now = timezone.now()
+        failure, created = SyncFailure.objects.get_or_create(
+            stage=self.stage, external_id=external_id,
+            defaults={"error_class": error_class, "message": message, "first_failed_at": now,
+                      "last_failed_at": now, "next_retry_at": next_retry_at(1, now)},
+        )
+        if not created:
+            failure.attempts += 1
+            failure.error_class = error_class
+            failure.message = message
+            failure.last_failed_at = now
+            failure.next_retry_at = next_retry_at(failure.attempts, now)
+            failure.save()
+        self.open_ids().add(external_id)
+        return failure
+
+    def record_error(self, external_id, error):
+        return self.record(external_id, type(error).__name__, str(error))
+
+    def resolve(self, external_id):
+        external_id = str(external_id)
+        if external_id in self.open_ids():
+            SyncFailure.objects.filter(stage=self.stage, external_id=external_id).delete()
+            self._open.discard(external_id)
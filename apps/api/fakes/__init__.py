@@ -0,0 +1,9 @@
+"""
+Local stand-ins for the remote systems the sync talks to, for tests,
+benchmarks and offline load testing. Nothing here is used in production.
+
+  * opensolar – a WSGI app serving a synthetic OpenSolar fleet;
+  * odoo – an in-memory Odoo answering JSON-RPC and XML-RPC;
+  * transport – run any of the fake apps in-process (requests adapter) or
+    on a local port (threaded wsgiref server).
+"""
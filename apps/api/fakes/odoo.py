@@ -0,0 +1,274 @@
+"""
+In-memory stand-in for Odoo's external API, for push benchmarks and tests.
+
+    app = FakeOdoo(latency=0.005)
+
+serves POST /jsonrpc (JSON-RPC, as the push commands use it) and
+/xmlrpc/2/common + /xmlrpc/2/object (XML-RPC, as utils/odoo_sync.py uses it):
+
+  * common: login, authenticate, version
+  * object: execute_kw with search, search_count, search_read, read,
+    create (one dict or a list of them) and write
+
+on res.partner, res.country, res.country.state and x_projects. Domains are
+evaluated the way Odoo does (prefix "|" / "&" / "!", implicit AND), many2one
+fields read back as [id, display name] and empty strings are stored as False,
+so the commands see the same shapes as against a real server.
+
+`calls` counts RPCs per "model.method"; `latency` is added to every call.
+"""
+import json
+import re
+import threading
+import time
+import xmlrpc.client
+from collections import Counter
+
+MODELS = ("res.partner", "res.country", "res.country.state", "x_projects")
+
+# many2one fields: field -> comodel
+MANY2ONE = {
+    "country_id": "res.country",
+    "state_id": "res.country.state",
+    "x_studio_partner_id": "res.partner",
+}
+
+COUNTRIES = [(233, "United States", "US"), (39, "Canada", "CA"), (156, "Mexico", "MX")]
+
+UID = 2
+
+
+class OdooError(Exception):
+    """Raised inside the fake; becomes a JSON-RPC error or an XML-RPC fault."""
+
+
+def _like(value, pattern, case_sensitive):
+    regex = "^" + ".*".join(re.escape(part) for part in pattern.split("%")) + "$"
+    return re.match(regex, value, 0 if case_sensitive else re.IGNORECASE) is not None
+
+
+def _coerce(stored, value):
+    """Compare like Postgres would after Odoo casts the domain value to the column type."""
+    if isinstance(stored, bool) or isinstance(value, bool) or stored is None:
+        return value
+    if isinstance(stored, (int, float)) and isinstance(value, str):
+        try:
+            return type(stored)(value)
+        except ValueError:
+            return value
+    return value
+
+
+def _leaf(record, field, op, value):
+    stored = record.get(field, False)
+    if isinstance(stored, list):  # many2one read format
+        stored = stored[0]
+    if op in ("=", "!="):
+        if value is False:
+            match = stored in (False, None, "")
+        else:
+            match = stored == _coerce(stored, value)
+        return match if op == "=" else not match
+    if op in ("in", "not in"):
+        match = any(stored == _coerce(stored, v) for v in value)
+        return match if op == "in" else not match
+    if op in ("like", "ilike", "=like", "=ilike", "not like", "not ilike"):
+        if stored in (False, None):
+            return op.startswith("not")
+        pattern = value if op.startswith("=") else f"%{value}%"
+        match = _like(str(stored), pattern, "i" not in op)
+        return not match if op.startswith("not") else match
+    if op in ("<", ">", "<=", ">="):
+        if stored in (False, None):
+            return False
+        value = _coerce(stored, value)
+        return {"<": stored < value, ">": stored > value,
+                "<=": stored <= value, ">=": stored >= value}[op]
+    raise OdooError(f"Invalid domain operator {op!r}")
+
+
+def evaluate(domain, record):
+    """Evaluate an Odoo domain (prefix notation, implicit AND) against one record."""
+    stack = []
+    for token in reversed(domain or []):
+        if token == "!":
+            stack.append(not stack.pop())
+        elif token in ("&", "|"):
+            a, b = stack.pop(), stack.pop()
+            stack.append((a and b) if token == "&" else (a or b))
+        elif isinstance(token, (list, tuple)) and len(token) == 3:
+            stack.append(_leaf(record, *token))
+        else:
+            raise OdooError(f"Invalid domain term {token!r}")
+    return all(stack)
+
+
+class FakeOdoo:
+    def __init__(self, latency=0.0, db=None, login=None, password=None):
+        self.latency = latency
+        self.db = db
+        self.login = login
+        self.password = password
+        self.calls = Counter()    # "res.partner.search_read" -> count
+        self.records = {model: {} for model in MODELS}
+        self._next_id = {model: 1 for model in MODELS}
+        self._lock = threading.RLock()
+        for cid, name, code in COUNTRIES:
+            self.records["res.country"][cid] = {"id": cid, "name": name, "code": code}
+        self._next_id["res.country"] = max(c[0] for c in COUNTRIES) + 1
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    # ─── WSGI ───────────────────────────────────────────────────────────────
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+        body = environ["wsgi.input"].read(length) if length else b""
+
+        if environ.get("REQUEST_METHOD") != "POST":
+            status, content_type, payload = "405 Method Not Allowed", "text/plain", b"POST only"
+        elif path == "/jsonrpc":
+            status, content_type, payload = "200 OK", "application/json", self._jsonrpc(body)
+        elif path.startswith("/xmlrpc/2/"):
+            status, content_type, payload = "200 OK", "text/xml", self._xmlrpc(path.rsplit("/", 1)[-1], body)
+        else:
+            status, content_type, payload = "404 Not Found", "text/plain", b"Not found"
+
+        start_response(status, [("Content-Type", content_type), ("Content-Length", str(len(payload)))])
+        return [payload]
+
+    def _jsonrpc(self, body):
+        request = json.loads(body or b"{}")
+        params = request.get("params", {})
+        try:
+            # Like Odoo, params["kwargs"] is ignored: execute_kw takes its kwargs positionally.
+            result = self.dispatch(params.get("service"), params.get("method"), params.get("args") or [])
+            response = {"jsonrpc": "2.0", "id": request.get("id"), "result": result}
+        except OdooError as e:
+            response = {"jsonrpc": "2.0", "id": request.get("id"), "error": {
+                "code": 200, "message": "Odoo Server Error",
+                "data": {"name": "odoo.exceptions.ValidationError", "message": str(e)},
+            }}
+        return json.dumps(response).encode("utf-8")
+
+    def _xmlrpc(self, service, body):
+        args, method = xmlrpc.client.loads(body, use_builtin_types=True)
+        try:
+            result = self.dispatch(service, method, list(args))
+            return xmlrpc.client.dumps((result,), methodresponse=True, allow_none=True).encode("utf-8")
+        except OdooError as e:
+            return xmlrpc.client.dumps(xmlrpc.client.Fault(1, str(e)), allow_none=True).encode("utf-8")
+
+    # ─── RPC ────────────────────────────────────────────────────────────────
+    def dispatch(self, service, method, args):
+        if self.latency:
+            time.sleep(self.latency)
+
+        if service == "common":
+            self._count(f"common.{method}")
+            if method == "version":
+                return {"server_version": "17.0", "protocol_version": 1}
+            if method in ("login", "authenticate"):
+                return self._authenticate(*args[:3])
+            raise OdooError(f"Unknown method common.{method}")
+
+        if service == "object" and method in ("execute_kw", "execute"):
+            db, uid, password, model, model_method = args[:5]
+            if self._authenticate(db, uid, password, by_uid=True) is False:
+                raise OdooError("Access Denied")
+            if method == "execute_kw":
+                positional = list(args[5]) if len(args) > 5 else []
+                kwargs = dict(args[6]) if len(args) > 6 else {}
+            else:
+                positional, kwargs = list(args[5:]), {}
+            self._count(f"{model}.{model_method}")
+            return self.execute(model, model_method, positional, kwargs)
+
+        raise OdooError(f"Unknown service {service}.{method}")
+
+    def _count(self, name):
+        with self._lock:
+            self.calls[name] += 1
+
+    def _authenticate(self, db, login, password, by_uid=False):
+        if self.db is not None and db != self.db:
+            return False
+        if by_uid:
+            ok = login == UID
+        else:
+            ok = self.login is None or login == self.login
+        if self.password is not None and password != self.password:
+            ok = False
+        return UID if ok else False
+
+    def execute(self, model, method, args, kwargs):
+        if model not in self.records:
+            raise OdooError(f"Object {model} doesn't exist")
+        handler = getattr(self, f"_{method}", None)
+        if method not in ("search", "search_count", "search_read", "read", "create", "write") or handler is None:
+            raise OdooError(f"Method {method} not supported on {model}")
+        with self._lock:
+            return handler(model, *args, **kwargs)
+
+    # ─── ORM methods ────────────────────────────────────────────────────────
+    def _matching(self, model, domain, offset=0, limit=None, order=None):
+        ids = [rid for rid, rec in sorted(self.records[model].items()) if evaluate(domain, rec)]
+        ids = ids[offset:]
+        return ids[:limit] if limit else ids
+
+    def _search(self, model, domain, offset=0, limit=None, order=None, count=False):
+        ids = self._matching(model, domain, offset, limit, order)
+        return len(ids) if count else ids
+
+    def _search_count(self, model, domain, limit=None):
+        return len(self._matching(model, domain, limit=limit))
+
+    def _read(self, model, ids, fields=None, load="_classic_read"):
+        if isinstance(ids, int):
+            ids = [ids]
+        return [self._export(model, self.records[model][rid], fields) for rid in ids
+                if rid in self.records[model]]
+
+    def _search_read(self, model, domain=None, fields=None, offset=0, limit=None, order=None):
+        return [self._export(model, self.records[model][rid], fields)
+                for rid in self._matching(model, domain, offset, limit, order)]
+
+    def _create(self, model, vals_list):
+        single = isinstance(vals_list, dict)
+        ids = []
+        for vals in [vals_list] if single else vals_list:
+            rid = self._next_id[model]
+            self._next_id[model] += 1
+            self.records[model][rid] = {"id": rid, **self._clean(vals)}
+            ids.append(rid)
+        return ids[0] if single else ids
+
+    def _write(self, model, ids, vals):
+        for rid in [ids] if isinstance(ids, int) else ids:
+            if rid not in self.records[model]:
+                raise OdooError(f"Record {model}({rid},) does not exist")
+            self.records[model][rid].update(self._clean(vals))
+        return True
+
+    # ─── Helpers ────────────────────────────────────────────────────────────
+    @staticmethod
+    def _clean(vals):
+        """Store values the way Odoo would: empty strings become False."""
+        return {field: (False if value == "" else value) for field, value in vals.items()}
+
+    def _display_name(self, model, rid):
+        record = self.records[model].get(rid, {})
+        return record.get("name") or record.get("x_name") or f"{model},{rid}"
+
+    def _export(self, model, record, fields):
+        fields = fields or [f for f in record if f != "id"]
+        out = {"id": record["id"]}
+        for field in fields:
+            value = record.get(field, False)
+            comodel = MANY2ONE.get(field)
+            if comodel and value:
+                value = [value, self._display_name(comodel, value)]
+            out[field] = value
+        return out
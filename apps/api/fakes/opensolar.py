@@ -0,0 +1,320 @@
+"""
+Fake OpenSolar REST API backed by a synthetic fleet.
+
+    fleet = Fleet(10_000, seed=1)
+    app = FakeOpenSolar(fleet, latency=0.02, error_429=0.01, rate_limit=50)
+
+serves, under /api/orgs/<any org>/:
+
+  * GET projects/?page=&limit=          – listing pages (a plain list, at most
+                                          max_page_size entries whatever the limit);
+                                          fieldset=list trims entries to id and modified_date
+  * GET projects/{id}/                  – project detail, with proposals
+  * GET systems/?project={id}           – the project's designed systems
+  * GET component_inverter_activations/{id}/
+
+Projects are generated on demand from (seed, index), so a 100k fleet costs
+no memory until it is fetched. Fleet.change() bumps a fraction of projects to
+a new revision, for "1% changed" runs, and Fleet.delete() drops projects
+from the org.
+"""
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs
+
+FIRST_ID = 1_000_000
+_EPOCH = datetime(2022, 1, 1, tzinfo=timezone.utc)
+
+_MODULES = [("REC", "REC400AA"), ("Qcells", "Q.PEAK DUO ML-G10 400"), ("Jinko", "JKM415N-54HL4"),
+            ("LONGi", "LR5-54HPH-410M"), ("Canadian Solar", "CS6R-400MS")]
+_INVERTERS = [("Enphase", "IQ8PLUS-72-2-US", True), ("Enphase", "IQ8M-72-2-US", True),
+              ("SolarEdge", "SE7600H-US", False), ("SMA", "SB7.7-1SP-US-41", False),
+              ("Fronius", "Primo 8.2-1", False)]
+_BATTERIES = [("Tesla", "Powerwall 2", 13.5), ("Enphase", "IQ Battery 5P", 5.0),
+              ("LG", "RESU10H Prime", 9.6)]
+_STATES = [("CA", "Sacramento"), ("TX", "Austin"), ("AZ", "Phoenix"), ("FL", "Tampa"),
+           ("NY", "Albany"), ("NJ", "Trenton"), ("CO", "Denver"), ("NV", "Reno")]
+_STREETS = ["Main St", "Oak Ave", "Maple Dr", "Cedar Ln", "Sunset Blvd", "Pine Rd", "Lake View Ct"]
+_FIRST = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Quinn"]
+_LAST = ["Garcia", "Smith", "Nguyen", "Johnson", "Patel", "Brown", "Kim", "Lopez", "Miller", "Davis"]
+
+
+def _weighted(rng, weights):
+    """Pick an index from a list of relative weights."""
+    return rng.choices(range(len(weights)), weights=weights)[0]
+
+
+class Fleet:
+    """Deterministic synthetic fleet of `size` projects."""
+
+    def __init__(self, size, seed=0, share_link_ratio=0.9):
+        self.size = size
+        self.seed = seed
+        self.share_link_ratio = share_link_ratio
+        self.revisions = {}  # project id -> revision, for changed projects
+        self.deleted = set()
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    # ─── Ids ────────────────────────────────────────────────────────────────
+    def ids(self):
+        every = range(FIRST_ID, FIRST_ID + self.size)
+        return [pid for pid in every if pid not in self.deleted] if self.deleted else every
+
+    def __contains__(self, pid):
+        return FIRST_ID <= pid < FIRST_ID + self.size and pid not in self.deleted
+
+    @staticmethod
+    def customer_id(index):
+        # Roughly 10 projects per 7 customers: some customers own several.
+        return 500_000 + index * 7 // 10
+
+    def change(self, fraction, seed=None):
+        """Move `fraction` of the fleet to a new revision. Returns the changed ids."""
+        rng = random.Random(seed)
+        changed = rng.sample(list(self.ids()), max(1, int(self.size * fraction)))
+        with self._lock:
+            for pid in changed:
+                self.revisions[pid] = self.revisions.get(pid, 0) + 1
+                self._cache.pop(pid, None)
+        return changed
+
+    def delete(self, fraction, seed=None):
+        """Remove `fraction` of the fleet from the org. Returns the deleted ids."""
+        rng = random.Random(seed)
+        deleted = rng.sample(list(self.ids()), max(1, int(self.size * fraction)))
+        with self._lock:
+            self.deleted.update(deleted)
+        return deleted
+
+    # ─── Records ────────────────────────────────────────────────────────────
+    def project(self, pid):
+        """Full project detail, as /projects/{id}/ returns it."""
+        with self._lock:
+            cached = self._cache.get(pid)
+        if cached is not None:
+            return cached
+        detail = self._build(pid)
+        with self._lock:
+            if len(self._cache) > 50_000:
+                self._cache.clear()
+            self._cache[pid] = detail
+        return detail
+
+    def summary(self, pid):
+        """Listing entry: the detail without proposals and the share link."""
+        detail = self.project(pid)
+        return {k: v for k, v in detail.items() if k not in ("proposals", "share_link", "_systems")}
+
+    def systems(self, pid):
+        return self.project(pid)["_systems"]
+
+    def activation(self, activation_id):
+        pid = activation_id // 10
+        if pid not in self:
+            return None
+        for system in self.systems(pid):
+            for inv in system["inverters"]:
+                if inv["inverter_activation_id"] == activation_id:
+                    return {"id": activation_id,
+                            "data": json.dumps({"microinverter": "Y" if inv["_micro"] else "N"})}
+        return None
+
+    def payload(self, pid):
+        """The raw responses the ingest stores for a project, as the API serves them."""
+        systems = self.systems(pid)
+        activations = {str(inv["inverter_activation_id"]): self.activation(inv["inverter_activation_id"])
+                       for system in systems for inv in system["inverters"]}
+        return {"detail": _public(self.project(pid)), "systems": _public(systems), "activations": activations}
+
+    def _build(self, pid):
+        index = pid - FIRST_ID
+        rng = random.Random(self.seed * 1_000_003 + index)
+        revision = self.revisions.get(pid, 0)
+
+        state, city = rng.choice(_STATES)
+        created = _EPOCH + timedelta(days=rng.randint(0, 900), seconds=rng.randint(0, 86_399))
+        modified = created + timedelta(days=rng.randint(0, 60) + revision)
+        cid = self.customer_id(index)
+        crng = random.Random(self.seed * 1_000_003 - cid)  # same contact on all their projects
+        first, last = crng.choice(_FIRST), crng.choice(_LAST)
+        kw = round(rng.uniform(3.0, 16.0), 2)
+
+        # Proposals: mostly 1-2, occasionally up to 5.
+        proposals = []
+        for n in range(1 + _weighted(rng, [50, 30, 12, 5, 3])):
+            proposals.append({
+                "id": pid * 10 + n,
+                "title": f"Option {n + 1}",
+                "pdf_url": f"https://files.example.com/proposals/{pid}-{n}.pdf",
+                "created_at": (created + timedelta(days=n)).isoformat(),
+                "kw_stc": round(kw * rng.uniform(0.85, 1.15), 2),
+                "output_annual_kwh": round(kw * rng.uniform(1200, 1700), 2),
+                "price_including_tax": round(kw * rng.uniform(2600, 3600), 2),
+                "battery_total_kwh": 0,
+            })
+
+        # Systems: one design per project, modules of one type, 0-2 battery types.
+        manufacturer, code = rng.choice(_MODULES)
+        module_qty = max(6, int(kw * 1000 / 400))
+        inv_maker, inv_code, micro = rng.choice(_INVERTERS)
+        battery_count = _weighted(rng, [70, 25, 5])
+        batteries, battery_kwh = [], 0.0
+        for maker, model, kwh in rng.sample(_BATTERIES, battery_count):
+            qty = rng.randint(1, 2)
+            batteries.append({"manufacturer_name": maker, "code": model, "quantity": qty})
+            battery_kwh += qty * kwh
+        systems = [{
+            "kw_stc": kw,
+            "output_annual_kwh": proposals[0]["output_annual_kwh"],
+            "battery_total_kwh": battery_kwh,
+            "price_including_tax": proposals[0]["price_including_tax"] if rng.random() < 0.8 else None,
+            "modules": [{"manufacturer_name": manufacturer, "code": code, "quantity": module_qty}],
+            "inverters": [{
+                "manufacturer_name": inv_maker, "code": inv_code,
+                "quantity": 1 if not micro else 0,
+                "inverter_activation_id": pid * 10 + 1,
+                "_micro": micro,
+            }],
+            "batteries": batteries,
+        }]
+
+        title = f"{rng.randint(10, 9999)} {rng.choice(_STREETS)}"
+        return {
+            "id": pid,
+            "title": title + (f" (rev {revision})" if revision else ""),
+            "stage": rng.choice([0, 1, 2, 3, 4, 5]),
+            "is_residential": rng.random() < 0.85,
+            "created_date": created.isoformat(),
+            "modified_date": modified.isoformat(),
+            "address": title,
+            "locality": city,
+            "state": state,
+            "zip": f"{rng.randint(10000, 99999)}",
+            "contacts_data": [{
+                "id": cid,
+                "display": f"{first} {last}",
+                "email": f"{first}.{last}.{cid}@example.com".lower(),
+                "phone": f"555-{crng.randint(1000, 9999)}",
+            }],
+            "share_link": (f"https://app.opensolar.com/share/{pid}"
+                           if rng.random() < self.share_link_ratio else ""),
+            "proposals": proposals,
+            "_systems": systems,
+        }
+
+
+def _public(obj):
+    """Drop the generator's private keys (leading underscore) before serving."""
+    if isinstance(obj, dict):
+        return {k: _public(v) for k, v in obj.items() if not k.startswith("_")}
+    if isinstance(obj, list):
+        return [_public(v) for v in obj]
+    return obj
+
+
+class FakeOpenSolar:
+    """
+    WSGI app. `latency` (+ up to `jitter`) seconds per request; `error_429`
+    and `error_500` are injection probabilities; `rate_limit` caps requests
+    per second (429 beyond it, like the real API); `max_page_size` caps the
+    listing's `limit`, as a server may without saying so.
+    """
+    ROUTES = [
+        ("/projects/",                            re.compile(r"^/api/orgs/\w+/projects/?$")),
+        ("/projects/{id}/",                       re.compile(r"^/api/orgs/\w+/projects/(\d+)/?$")),
+        ("/systems/",                             re.compile(r"^/api/orgs/\w+/systems/?$")),
+        ("/component_inverter_activations/{id}/", re.compile(r"^/api/orgs/\w+/component_inverter_activations/(\d+)/?$")),
+    ]
+
+    def __init__(self, fleet, latency=0.0, jitter=0.0, error_429=0.0, error_500=0.0,
+                 rate_limit=None, max_page_size=None, seed=0):
+        self.fleet = fleet
+        self.latency = latency
+        self.jitter = jitter
+        self.error_429 = error_429
+        self.error_500 = error_500
+        self.rate_limit = rate_limit
+        self.max_page_size = max_page_size
+        self.calls = Counter()       # endpoint template -> requests served
+        self.statuses = Counter()    # status code -> responses
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = float(rate_limit or 0)
+        self._refilled = time.monotonic()
+
+    def __call__(self, environ, start_response):
+        status, body = self.handle(environ.get("PATH_INFO", ""), parse_qs(environ.get("QUERY_STRING", "")))
+        payload = json.dumps(body).encode("utf-8")
+        start_response(status, [("Content-Type", "application/json"),
+                                ("Content-Length", str(len(payload)))])
+        return [payload]
+
+    def _take_token(self):
+        now = time.monotonic()
+        self._tokens = min(float(self.rate_limit),
+                           self._tokens + (now - self._refilled) * self.rate_limit)
+        self._refilled = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def handle(self, path, query):
+        for template, pattern in self.ROUTES:
+            match = pattern.match(path)
+            if match:
+                break
+        else:
+            return self._reply("404 Not Found", {"detail": "Not found."})
+
+        with self._lock:
+            self.calls[template] += 1
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0)
+            roll = self._rng.random()
+            limited = self.rate_limit is not None and not self._take_token()
+        if delay:
+            time.sleep(delay)
+
+        if limited or roll < self.error_429:
+            return self._reply("429 Too Many Requests", {"detail": "Request was throttled."})
+        if roll < self.error_429 + self.error_500:
+            return self._reply("500 Internal Server Error", {"detail": "Server error."})
+
+        if template == "/projects/":
+            limit = int(query.get("limit", ["20"])[0])
+            if self.max_page_size:
+                limit = min(limit, self.max_page_size)
+            page = int(query.get("page", ["1"])[0])
+            ids = self.fleet.ids()[(page - 1) * limit:page * limit]
+            if query.get("fieldset") == ["list"]:
+                return self._reply("200 OK", [{"id": pid, "modified_date": self.fleet.project(pid)["modified_date"]}
+                                              for pid in ids])
+            return self._reply("200 OK", [self.fleet.summary(pid) for pid in ids])
+
+        if template == "/systems/":
+            pid = int(query.get("project", ["0"])[0])
+            if pid not in self.fleet:
+                return self._reply("200 OK", [])
+            return self._reply("200 OK", _public(self.fleet.systems(pid)))
+
+        object_id = int(match.group(1))
+        if template == "/projects/{id}/":
+            if object_id not in self.fleet:
+                return self._reply("404 Not Found", {"detail": "Not found."})
+            return self._reply("200 OK", _public(self.fleet.project(object_id)))
+
+        activation = self.fleet.activation(object_id)
+        if activation is None:
+            return self._reply("404 Not Found", {"detail": "Not found."})
+        return self._reply("200 OK", activation)
+
+    def _reply(self, status, body):
+        with self._lock:
+            self.statuses[int(status[:3])] += 1
+        return status, body
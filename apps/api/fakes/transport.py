@@ -0,0 +1,101 @@
+"""
+Two ways to put a fake WSGI app behind the sync's HTTP clients:
+
+  * WSGIAdapter – a requests transport adapter that calls the app directly,
+    no sockets involved. Mount it on a client's session:
+        client.session.mount(client.base, WSGIAdapter(app))
+  * serve() – a threaded wsgiref server on a local port, for running the
+    real commands (and their real keep-alive sessions) against the fake.
+"""
+import io
+import sys
+import threading
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from requests.adapters import BaseAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+
+class WSGIAdapter(BaseAdapter):
+    def __init__(self, app):
+        super().__init__()
+        self.app = app
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        body = request.body or b""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+
+        environ = {
+            "REQUEST_METHOD": request.method,
+            "SCRIPT_NAME": "",
+            "PATH_INFO": url.path,
+            "QUERY_STRING": url.query,
+            "SERVER_NAME": url.hostname or "localhost",
+            "SERVER_PORT": str(url.port or (443 if url.scheme == "https" else 80)),
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "CONTENT_LENGTH": str(len(body)),
+            "CONTENT_TYPE": request.headers.get("Content-Type", ""),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": url.scheme,
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in request.headers.items():
+            key = name.upper().replace("-", "_")
+            if key not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+                environ[f"HTTP_{key}"] = value
+
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started["status"], started["headers"] = status, headers
+
+        chunks = self.app(environ, start_response)
+        try:
+            content = b"".join(chunks)
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+
+        resp = Response()
+        code, _, reason = started["status"].partition(" ")
+        resp.status_code = int(code)
+        resp.reason = reason
+        resp.headers = CaseInsensitiveDict(started["headers"])
+        resp.encoding = "utf-8"
+        resp._content = content
+        resp.url = request.url
+        resp.request = request
+        return resp
+
+    def close(self):
+        pass
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(app, host="127.0.0.1", port=0, quiet=True):
+    """
+    Serve `app` from a background thread. Returns (server, base_url); call
+    server.shutdown() when done. port=0 picks a free port.
+    """
+    handler = _QuietHandler if quiet else WSGIRequestHandler
+    server = make_server(host, port, app, server_class=_ThreadingWSGIServer, handler_class=handler)
+    thread = threading.Thread(target=server.serve_forever, name="fake-server", daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_port}"
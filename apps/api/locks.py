@@ -0,0 +1,117 @@
+"""
+Cross-process single-flight locks for the sync jobs.
+
+Every stage (sync_opensolar, sync_contacts_to_odoo, sync_projects_to_odoo)
+and the full sync_all pipeline take a Postgres session-level advisory lock,
+so a cron run, a manual /api/sync-all/ call and run_all_syncs.bat can never
+work on the same rows at the same time.
+
+Advisory locks are re-entrant within one database session, which lets the
+pipeline hold every stage lock while it calls the stage commands itself.
+"""
+import zlib
+from contextlib import contextmanager, ExitStack
+
+from django.db import connection
+
+# classid half of the two-int advisory key, so our locks can't collide with
+# advisory locks taken by anything else sharing the database
+LOCK_NAMESPACE = "opensolar_sync"
+
+STAGES = ("sync_opensolar", "sync_contacts_to_odoo", "sync_projects_to_odoo")
+PIPELINE = "sync_all"
+
+
+class SyncAlreadyRunning(Exception):
+    """Another process holds the lock for this job."""
+
+    def __init__(self, name):
+        super().__init__(f"{name} is already running in another process")
+        self.name = name
+
+
+class RunLock:
+    """Outcome of a single_flight() acquisition.
+
+    `acquired` – we hold the lock and should do the work.
+    `attached` – another run held it; we waited for it to finish instead of
+                 starting a duplicate, so there is nothing left to do.
+    """
+
+    def __init__(self, name, acquired=False, attached=False):
+        self.name = name
+        self.acquired = acquired
+        self.attached = attached
+
+
+def _int4(value):
+    """crc32 is unsigned; advisory lock keys are signed int4."""
+    return value - (1 << 32) if value >= (1 << 31) else value
+
+
+def lock_key(name):
+    return (
+        _int4(zlib.crc32(LOCK_NAMESPACE.encode())),
+        _int4(zlib.crc32(name.encode())),
+    )
+
+
+def _query(sql, key):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, key)
+        return cursor.fetchone()[0]
+
+
+@contextmanager
+def single_flight(name, attach=False, block=False):
+    """
+    Hold the advisory lock `name` for the duration of the block.
+
+    If another process holds it:
+      * by default raise SyncAlreadyRunning, so a second trigger exits fast;
+      * with attach=True, wait for that run to finish and yield a RunLock with
+        `attached` set, so the caller reports it instead of running again;
+      * with block=True, wait for it and then run anyway.
+
+    Only PostgreSQL gives us cross-process locking; on other backends
+    (local SQLite test runs) the block always runs.
+    """
+    if connection.vendor != "postgresql":
+        yield RunLock(name, acquired=True)
+        return
+
+    key = lock_key(name)
+    if not _query("SELECT pg_try_advisory_lock(%s, %s)", key):
+        if not (attach or block):
+            raise SyncAlreadyRunning(name)
+        _query("SELECT pg_advisory_lock(%s, %s)", key)
+        if attach:
+            # The run we waited for has finished: its result is ours.
+            _query("SELECT pg_advisory_unlock(%s, %s)", key)
+            yield RunLock(name, attached=True)
+            return
+
+    try:
+        yield RunLock(name, acquired=True)
+    finally:
+        _query("SELECT pg_advisory_unlock(%s, %s)", key)
+
+
+@contextmanager
+def pipeline_lock(attach=False):
+    """
+    Lock the full pipeline plus every stage it runs, so a stand-alone stage
+    started by cron can't slip in between two stages of a sync_all run.
+
+    `attach` applies to a running sync_all. A stand-alone stage still in
+    flight is waited for when attaching, since there is no pipeline run to
+    report, and otherwise makes us exit with SyncAlreadyRunning.
+    """
+    with ExitStack() as stack:
+        lock = stack.enter_context(single_flight(PIPELINE, attach=attach))
+        if lock.attached:
+            yield lock
+            return
+        for name in STAGES:
+            stack.enter_context(single_flight(name, block=attach))
+        yield lock
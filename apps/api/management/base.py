@@ -0,0 +1,190 @@
+from collections import namedtuple
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.api import metrics, profiling, tracing
+from apps.api.failures import FailureLog
+from apps.api.locks import single_flight, SyncAlreadyRunning
+from apps.api.runs import StageStats, track_run, track_stage
+
+
+class SyncCommand(BaseCommand):
+    """
+    Base for the sync stage commands.
+
+    Subclasses implement `run()` instead of `handle()`; `handle()` wraps it in
+    the stage's single-flight lock so overlapping triggers (cron, the
+    /api/sync-all/ view, run_all_syncs.bat) never run the same stage twice.
+
+    Every stage also accepts --project-id / --customer-id (repeatable, or
+    --project-id-file / --customer-id-file with one id per line) to sync just
+    those records. Targeted runs touch a handful of rows, so they skip the
+    stage-wide lock and can run while a full sync is in progress.
+
+    Each execution is recorded as a SyncRun/SyncStageRun (see apps.api.runs);
+    subclasses bump the counters on `self.stats`, and log records they could
+    not sync on `self.failures` (see apps.api.failures).
+
+    --profile wraps the run in cProfile and writes a .pstats file plus a
+    short report (see apps.api.profiling). --trace writes a span per outbound
+    HTTP/RPC call to a JSONL file (see apps.api.tracing).
+
+    If the stage is already running (and --wait wasn't given) the command
+    fails with CommandError, so the shell sees a non-zero exit. Callers that
+    need to tell the outcomes apart (the /api/sync-all/ view) pass
+    `raise_if_running=True` to get SyncAlreadyRunning instead, and read
+    `attached` after the call.
+    """
+    lock_name = None    # defaults to the command's module name
+    is_stage = True     # record a SyncStageRun for this command
+    stealth_options = ("raise_if_running",)
+
+    Targets = namedtuple("Targets", "project_ids customer_ids")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = StageStats()
+        self.failures = FailureLog(self.get_lock_name())
+        self.attached = False  # the last run waited for another one instead of running
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--wait", action="store_true",
+            help="If this stage is already running elsewhere, wait for that run "
+                 "to finish instead of exiting straight away.",
+        )
+        parser.add_argument(
+            "--profile", nargs="?", const="", default=None, metavar="PATH",
+            help="Profile the run with cProfile and write a .pstats file "
+                 "(default: profiles/<command>-<timestamp>.pstats).",
+        )
+        parser.add_argument(
+            "--profile-top", type=int, default=20, metavar="N",
+            help="Number of functions listed in the --profile report (default 20).",
+        )
+        parser.add_argument(
+            "--trace", metavar="PATH",
+            help="Write one JSON span per OpenSolar/Odoo call to this JSONL file "
+                 "(overrides SYNC_TRACE_FILE).",
+        )
+        parser.add_argument(
+            "--project-id", action="append", default=[], metavar="ID",
+            help="Only sync this OpenSolar project (repeatable).",
+        )
+        parser.add_argument(
+            "--customer-id", action="append", default=[], metavar="ID",
+            help="Only sync this OpenSolar customer/contact (repeatable).",
+        )
+        parser.add_argument(
+            "--project-id-file", metavar="PATH",
+            help="Read OpenSolar project ids from a file, one per line.",
+        )
+        parser.add_argument(
+            "--customer-id-file", metavar="PATH",
+            help="Read OpenSolar customer ids from a file, one per line.",
+        )
+
+    def get_lock_name(self):
+        return self.lock_name or self.__module__.rsplit(".", 1)[-1]
+
+    def get_lock(self, attach):
+        return single_flight(self.get_lock_name(), attach=attach)
+
+    @staticmethod
+    def _read_ids(path):
+        try:
+            with open(path) as fh:
+                lines = [line.split("#", 1)[0] for line in fh]
+        except OSError as e:
+            raise CommandError(f"Cannot read ids from {path}: {e}")
+        return [tok for line in lines for tok in line.replace(",", " ").split()]
+
+    def get_targets(self, options):
+        """
+        The explicit project/customer ids for this run, or None for a
+        whole-table run. Both sets are OpenSolar external ids (strings).
+        """
+        project_ids = set(map(str, options.get("project_id") or []))
+        customer_ids = set(map(str, options.get("customer_id") or []))
+        if options.get("project_id_file"):
+            project_ids.update(self._read_ids(options["project_id_file"]))
+        if options.get("customer_id_file"):
+            customer_ids.update(self._read_ids(options["customer_id_file"]))
+        if not (project_ids or customer_ids):
+            return None
+        return self.Targets(project_ids, customer_ids)
+
+    def handle(self, *args, **options):
+        if not options.get("trace"):
+            return self._profiled(*args, **options)
+        previous = tracing.set_exporter(tracing.JsonlExporter(options["trace"]))
+        try:
+            return self._profiled(*args, **options)
+        finally:
+            tracing.set_exporter(previous)
+
+    def _profiled(self, *args, **options):
+        if options.get("profile") is None:
+            return self._handle(*args, **options)
+
+        path = options["profile"] or profiling.default_path(self.get_lock_name())
+        with profiling.profile_session(path) as result:
+            self._handle(*args, **options)
+        self.stdout.write(profiling.report(result["stats"], top=options["profile_top"]))
+        self.stdout.write(self.style.SUCCESS(f"📝 Profile written to {result['path']}"))
+
+    def _handle(self, *args, **options):
+        self.stats.reset()  # the same instance may run many times (run_sync_daemon)
+        self.failures.reset()
+        self.reset_run_state()
+        self.attached = False
+        targets = self.get_targets(options)
+        if targets is not None:
+            self.stdout.write(self.style.NOTICE(
+                f"🎯 Targeted run: {len(targets.project_ids)} project id(s), "
+                f"{len(targets.customer_ids)} customer id(s)"
+            ))
+            self._tracked_run(args, targets, options)
+            return
+
+        name = self.get_lock_name()
+        try:
+            with self.get_lock(options.get("wait", False)) as lock:
+                if lock.attached:
+                    self.attached = True
+                    self.stdout.write(self.style.NOTICE(
+                        f"⏳ Waited for the running {name} to finish; nothing left to do."
+                    ))
+                    return
+                self._tracked_run(args, None, options)
+        except SyncAlreadyRunning as e:
+            if options.get("raise_if_running"):
+                raise
+            # Non-zero exit so cron/the daemon don't record a skipped run as a success.
+            raise CommandError(f"{e}; pass --wait to wait for it instead.") from e
+
+    def _tracked_run(self, args, targets, options):
+        name = self.get_lock_name()
+        with metrics.time_db_writes(), track_run(name, targeted=targets is not None,
+                                                    full=bool(options.get("full"))) as run:
+            if not self.is_stage:
+                return self.run(*args, targets=targets, **options)
+            with track_stage(name, self.stats, run):
+                return self.run(*args, targets=targets, **options)
+
+    def run(self, *args, **options):
+        raise NotImplementedError("subclasses of SyncCommand must provide a run() method")
+
+    def reset_run_state(self):
+        """
+        Forget what the previous run cached per record. Called before every
+        run, so a command reused by run_sync_daemon doesn't grow with the
+        fleet; the per-process caches in reset_caches() are kept.
+        """
+
+    def reset_caches(self):
+        """
+        Forget anything cached between runs of this instance (logins, lookup
+        ids). run_sync_daemon reuses one instance per stage and calls this
+        every few cycles so that nothing cached goes stale for long.
+        """
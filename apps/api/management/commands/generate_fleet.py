@@ -0,0 +1,150 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from apps.api.fakes.opensolar import Fleet
+from apps.api.models import (
+    OpenSolarBattery,
+    OpenSolarCustomer,
+    OpenSolarInverter,
+    OpenSolarModule,
+    OpenSolarProject,
+    OpenSolarProjectPayload,
+    OpenSolarProposal,
+)
+
+
+def _dec(value):
+    return None if value is None else Decimal(str(round(value, 2)))
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a synthetic fleet (customers, projects, proposals, "
+        "modules, inverters, batteries, raw payloads) for profiling at production scale"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("projects", type=int, help="Number of projects to generate")
+        parser.add_argument("--seed", type=int, default=0, help="Generator seed (same seed, same fleet)")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Projects per bulk insert")
+        parser.add_argument(
+            "--clear", action="store_true",
+            help="Delete every existing OpenSolar customer and project first",
+        )
+
+    def handle(self, *args, **options):
+        fleet = Fleet(options["projects"], seed=options["seed"])
+        batch_size = options["batch_size"]
+
+        if options["clear"]:
+            self.stdout.write("🧹 Clearing existing OpenSolar data…")
+            OpenSolarProject.objects.all().delete()
+            OpenSolarCustomer.objects.all().delete()
+        elif OpenSolarProject.objects.filter(external_id__in=[str(pid) for pid in fleet.ids()[:batch_size]]).exists():
+            raise CommandError("Generated projects already exist; pass --clear to replace them.")
+
+        started = time.monotonic()
+        customers = dict(OpenSolarCustomer.objects.values_list("external_id", "pk"))
+        ids = fleet.ids()
+        totals = dict.fromkeys(("customers", "projects", "proposals", "modules", "inverters", "batteries",
+                                "payloads"), 0)
+
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            with transaction.atomic():
+                counts = self.insert_batch([fleet.project(pid) for pid in batch], customers,
+                                           [fleet.payload(pid) for pid in batch])
+            for key, n in counts.items():
+                totals[key] += n
+            done = min(start + batch_size, len(ids))
+            self.stdout.write(f"   {done}/{len(ids)} projects ({done / (time.monotonic() - started):.0f}/s)")
+
+        self.stdout.write(self.style.SUCCESS(
+            "✅ Generated " + ", ".join(f"{n} {key}" for key, n in totals.items())
+            + f" in {time.monotonic() - started:.1f}s"
+        ))
+
+    def insert_batch(self, details, customers, payloads):
+        """
+        Bulk-insert one batch of generated project details and their raw
+        payloads (as Fleet.payload() returns them). `customers` maps external_id → pk.
+        """
+        new_customers = {}
+        for detail in details:
+            contact = detail["contacts_data"][0]
+            cid = str(contact["id"])
+            if cid not in customers and cid not in new_customers:
+                new_customers[cid] = OpenSolarCustomer(
+                    external_id=cid,
+                    name=contact["display"],
+                    email=contact["email"],
+                    phone=contact["phone"],
+                    address=detail["address"],
+                    city=detail["locality"],
+                    state=detail["state"],
+                    zip_code=detail["zip"],
+                )
+        for customer in OpenSolarCustomer.objects.bulk_create(new_customers.values()):
+            customers[customer.external_id] = customer.pk
+
+        projects = []
+        for detail in details:
+            system = detail["_systems"][0]
+            price = system["price_including_tax"] or detail["proposals"][0]["price_including_tax"]
+            projects.append(OpenSolarProject(
+                external_id=str(detail["id"]),
+                name=detail["title"],
+                status=str(detail["stage"]),
+                customer_id=customers[str(detail["contacts_data"][0]["id"])],
+                created_at=parse_datetime(detail["created_date"]),
+                remote_modified_at=parse_datetime(detail["modified_date"]),
+                project_type="Residential" if detail["is_residential"] else "Commercial",
+                share_link=detail["share_link"],
+                system_size_kw=_dec(system["kw_stc"]),
+                system_output_kwh=_dec(system["output_annual_kwh"]),
+                battery_size_kwh=_dec(system["battery_total_kwh"]),
+                price_including_tax=_dec(price),
+            ))
+        projects = OpenSolarProject.objects.bulk_create(projects)
+
+        proposals, modules, inverters, batteries = [], [], [], []
+        for detail, project in zip(details, projects):
+            for prop in detail["proposals"]:
+                proposals.append(OpenSolarProposal(
+                    external_id=str(prop["id"]),
+                    project=project,
+                    title=prop["title"],
+                    pdf_url=prop["pdf_url"],
+                    created_at=parse_datetime(prop["created_at"]),
+                    system_size_kw=_dec(prop["kw_stc"]),
+                    system_output_kwh=_dec(prop["output_annual_kwh"]),
+                    price=_dec(prop["price_including_tax"]),
+                    battery_size_kwh=_dec(prop["battery_total_kwh"]),
+                ))
+            for system in detail["_systems"]:
+                module_qty = sum(m["quantity"] for m in system["modules"])
+                for m in system["modules"]:
+                    modules.append(OpenSolarModule(project=project, manufacturer_name=m["manufacturer_name"],
+                                                   code=m["code"], quantity=m["quantity"]))
+                for inv in system["inverters"]:
+                    inverters.append(OpenSolarInverter(project=project, manufacturer_name=inv["manufacturer_name"],
+                                                       code=inv["code"],
+                                                       quantity=module_qty if inv["_micro"] else inv["quantity"]))
+                for b in system["batteries"]:
+                    batteries.append(OpenSolarBattery(project=project, manufacturer_name=b["manufacturer_name"],
+                                                      code=b["code"], quantity=b["quantity"]))
+
+        OpenSolarProposal.objects.bulk_create(proposals)
+        OpenSolarModule.objects.bulk_create(modules)
+        OpenSolarInverter.objects.bulk_create(inverters)
+        OpenSolarBattery.objects.bulk_create(batteries)
+        OpenSolarProjectPayload.objects.bulk_create(
+            OpenSolarProjectPayload(project=project, **payload) for project, payload in zip(projects, payloads)
+        )
+        return {"customers": len(new_customers), "projects": len(projects), "proposals": len(proposals),
+                "modules": len(modules), "inverters": len(inverters), "batteries": len(batteries),
+                "payloads": len(payloads)}
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from apps.api import webhooks
+
+
+class Command(BaseCommand):
+    help = "Run targeted syncs for projects queued by OpenSolar webhooks"
+
+    def handle(self, *args, **kwargs):
+        processed = webhooks.process_pending(stdout=self.stdout, stderr=self.stderr)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Processed {processed} queued project(s)."
+        ))
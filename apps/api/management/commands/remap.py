@@ -0,0 +1,51 @@
+import traceback
+
+from django.db.models import Q
+
+from apps.api import backfill
+from apps.api.management.base import SyncCommand
+from apps.api.models import OpenSolarProjectPayload
+
+
+class Command(SyncCommand):
+    help = (
+        "Re-derive customers, projects, proposals and components from the stored raw "
+        "OpenSolar payloads, without calling the API (PostgreSQL)"
+    )
+    lock_name = "sync_opensolar"  # writes the same tables as the ingest
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--chunk-size", type=int, default=2000,
+            help="Payload rows read per round trip (default 2000).",
+        )
+
+    def run(self, *args, targets=None, **kwargs):
+        payloads = OpenSolarProjectPayload.objects.filter(project__deleted_at__isnull=True)  # tombstoned: gone
+        if targets is not None:
+            payloads = payloads.filter(
+                Q(project__external_id__in=targets.project_ids)
+                | Q(project__customer__external_id__in=targets.customer_ids)
+            )
+
+        try:
+            loader = backfill.Backfill(store_payloads=False)
+            rows = payloads.values_list("detail", "systems", "activations").iterator(
+                chunk_size=kwargs.get("chunk_size") or 2000
+            )
+            for detail, systems, activations in rows:
+                # The stored detail is a superset of the listing entry, so it stands in for both.
+                loader.add({"summary": detail, "detail": detail, "systems": systems, "activations": activations})
+                self.stats.incr("processed")
+
+            self.stdout.write(f"📥 Remapping {self.stats.processed} stored projects…")
+            written = loader.load()
+            self.stdout.write(self.style.SUCCESS(
+                "✅ Remap complete: " + ", ".join(f"{n} {model}" for model, n in written.items())
+            ))
+
+        except Exception as e:
+            self.stats.error = f"Remap Error: {e}"
+            self.stderr.write(self.style.ERROR(f"❌ Remap Error: {e}"))
+            traceback.print_exc()
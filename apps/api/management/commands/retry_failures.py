@@ -0,0 +1,59 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.api.failures import STAGE_TARGETS
+from apps.api.models import OpenSolarCustomer, OpenSolarProject, SyncFailure
+
+TARGET_MODELS = {"customer_id": OpenSolarCustomer, "project_id": OpenSolarProject}
+# Rows the stages no longer sync: sync_projects_to_odoo skips tombstoned projects.
+TARGET_FILTERS = {"project_id": {"deleted_at__isnull": True}}
+
+
+class Command(BaseCommand):
+    help = "Retry the records in the SyncFailure dead-letter queue whose next attempt is due"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stage", action="append", choices=sorted(STAGE_TARGETS),
+            help="Only retry this stage's failures (repeatable; default all).",
+        )
+        parser.add_argument(
+            "--all", action="store_true",
+            help="Retry every failure now, including ones not yet due or out of attempts.",
+        )
+        parser.add_argument("--limit", type=int, default=500, help="Records retried per stage (default 500).")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        retried = 0
+        for stage, option in STAGE_TARGETS.items():
+            if options["stage"] and stage not in options["stage"]:
+                continue
+            failures = SyncFailure.objects.filter(stage=stage)
+            if not options["all"]:
+                failures = failures.filter(next_retry_at__lte=now)
+            ids = list(failures.order_by("next_retry_at").values_list("external_id", flat=True)[:options["limit"]])
+            if not ids:
+                continue
+
+            # Records deleted locally, or tombstoned, since they failed can't be synced any more.
+            present = set(TARGET_MODELS[option].objects
+                          .filter(external_id__in=ids, **TARGET_FILTERS.get(option, {}))
+                          .values_list("external_id", flat=True))
+            gone = [pk for pk in ids if pk not in present]
+            if gone:
+                SyncFailure.objects.filter(stage=stage, external_id__in=gone).delete()
+                self.stdout.write(f"🗑️ Dropped {len(gone)} {stage} failure(s) for records no longer synced")
+            ids = [pk for pk in ids if pk in present]
+            if not ids:
+                continue
+
+            self.stdout.write(f"🔁 Retrying {len(ids)} {stage} record(s)")
+            call_command(stage, **{option: ids}, stdout=self.stdout, stderr=self.stderr)
+            retried += len(ids)
+
+        still = SyncFailure.objects.filter(last_failed_at__gte=now).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Retried {retried} record(s); {still} failed again."
+        ))
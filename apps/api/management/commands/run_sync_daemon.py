@@ -0,0 +1,123 @@
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management import call_command, get_commands, load_command_class
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.utils import timezone
+
+from apps.api import scheduler
+from apps.api.management.commands import sync_all
+from apps.api.pipeline import QUEUE_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        "Run sync_all on a schedule in one long-lived process, keeping HTTP sessions, "
+        "the Odoo login, DB connections and lookup caches warm between cycles. "
+        "With --schedule, run each SYNC_SCHEDULE job on its own cadence instead"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval", type=float, default=None,
+            help="Seconds between the starts of two cycles (default SYNC_DAEMON_INTERVAL).",
+        )
+        parser.add_argument("--pipeline", action="store_true", help="Run each cycle as sync_all --pipeline.")
+        parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+        parser.add_argument(
+            "--refresh-every", type=int, default=12, metavar="N",
+            help="Log in to Odoo again and drop cached lookups every N cycles (default 12, 0 = never).",
+        )
+        parser.add_argument("--max-cycles", type=int, default=0, help="Stop after N cycles (default: run until stopped).")
+        parser.add_argument(
+            "--schedule", action="store_true",
+            help="Run the SYNC_SCHEDULE jobs (per-stage cadences, jitter, catch-up and "
+                 "concurrency limits) instead of sync_all every --interval seconds.",
+        )
+
+    def handle(self, *args, **options):
+        interval = options["interval"] if options["interval"] is not None else settings.SYNC_DAEMON_INTERVAL
+        refresh_every = options["refresh_every"]
+        stop = threading.Event()
+
+        def request_stop(signum, frame):
+            if stop.is_set():
+                raise SystemExit(1)  # second signal: don't wait for the cycle
+            self.stdout.write(self.style.WARNING(
+                f"🛑 {signal.Signals(signum).name}: stopping after the current cycle (send again to exit now)"
+            ))
+            stop.set()
+
+        previous = {sig: signal.signal(sig, request_stop) for sig in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            if options["schedule"]:
+                runs = self.serve_schedule(stop, refresh_every)
+                self.stdout.write(self.style.SUCCESS(f"👋 Sync daemon stopped after {runs} scheduled run(s)."))
+            else:
+                cycle = self.serve_cycles(stop, interval, refresh_every, options)
+                self.stdout.write(self.style.SUCCESS(f"👋 Sync daemon stopped after {cycle} cycle(s)."))
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+            connections.close_all()
+
+    def serve_cycles(self, stop, interval, refresh_every, options):
+        runner = sync_all.Command(self.stdout, self.stderr)
+        cycle = 0
+        self.stdout.write(f"🔁 Sync daemon started: every {interval:g}s ({'pipeline' if options['pipeline'] else 'stages'})")
+        while not stop.is_set():
+            cycle += 1
+            started = time.monotonic()
+            # Drops connections older than CONN_MAX_AGE or broken since the last cycle.
+            close_old_connections()
+            if refresh_every and cycle > 1 and (cycle - 1) % refresh_every == 0:
+                runner.reset_caches()
+
+            try:
+                call_command(runner, pipeline=options["pipeline"], queue_size=options["queue_size"],
+                             stdout=self.stdout, stderr=self.stderr)
+            except Exception as e:
+                self.stderr.write(self.style.ERROR(f"💥 Cycle {cycle} failed: {e!r}"))
+
+            elapsed = time.monotonic() - started
+            if options["max_cycles"] and cycle >= options["max_cycles"]:
+                break
+            wait = max(0.0, interval - elapsed)
+            self.stdout.write(f"⏱️ Cycle {cycle} took {elapsed:.1f}s; next in {wait:.0f}s")
+            stop.wait(wait)
+        return cycle
+
+    def serve_schedule(self, stop, refresh_every):
+        jobs = scheduler.jobs_from_settings()
+        if not jobs:
+            raise CommandError("SYNC_SCHEDULE is empty; nothing to run.")
+        commands = {}  # job name -> command instance, reused so its caches stay warm
+
+        def run_job(job):
+            command = commands.get(job.name)
+            if command is None:
+                command = commands[job.name] = load_command_class(get_commands()[job.command], job.command)
+            elif refresh_every and job.runs % refresh_every == 0 and hasattr(command, "reset_caches"):
+                command.reset_caches()
+            self.stdout.write(f"▶️ [{job.name}] {job.command}")
+            call_command(command, stdout=self.stdout, stderr=self.stderr, **job.options)
+
+        def finished(job, elapsed, error):
+            next_due = timezone.localtime(job.next_due).strftime("%Y-%m-%d %H:%M:%S")
+            if error is None:
+                self.stdout.write(f"⏱️ [{job.name}] took {elapsed:.1f}s; next at {next_due}")
+            else:
+                self.stderr.write(self.style.ERROR(f"💥 [{job.name}] failed after {elapsed:.1f}s: {error!r}; next at {next_due}"))
+
+        schedule = scheduler.Scheduler(jobs, run_job, max_concurrent=settings.SYNC_SCHEDULE_MAX_CONCURRENT,
+                                       on_finish=finished)
+        schedule.start()
+        self.stdout.write(f"🗓️ Sync daemon started: {len(jobs)} scheduled job(s), "
+                          f"up to {schedule.max_concurrent} at a time")
+        for job in jobs:
+            self.stdout.write(f"   {job.name}: {job.command}, first run {timezone.localtime(job.next_due):%Y-%m-%d %H:%M:%S}")
+        schedule.serve(stop)
+        return sum(job.runs for job in jobs)
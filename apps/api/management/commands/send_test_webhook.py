@@ -0,0 +1,52 @@
+import json
+import time
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.api.webhooks import sign
+
+
+class Command(BaseCommand):
+    help = "Send fake, correctly signed OpenSolar project-change webhooks to a local receiver"
+
+    def add_arguments(self, parser):
+        parser.add_argument("project_ids", nargs="+", help="OpenSolar project ids to announce")
+        parser.add_argument(
+            "--url", default="http://127.0.0.1:8000/api/webhooks/opensolar/",
+            help="Webhook receiver URL",
+        )
+        parser.add_argument(
+            "--secret", default=None,
+            help="Signing secret (defaults to OPENSOLAR_WEBHOOK_SECRET)",
+        )
+        parser.add_argument(
+            "--burst", type=int, default=1,
+            help="Send each event this many times, to exercise coalescing",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=0.0,
+            help="Seconds to wait between deliveries",
+        )
+
+    def handle(self, *args, **options):
+        secret = options["secret"]
+        if secret is None:
+            secret = getattr(settings, "OPENSOLAR_WEBHOOK_SECRET", "")
+
+        for _ in range(options["burst"]):
+            for pid in options["project_ids"]:
+                body = json.dumps({
+                    "model": "Project",
+                    "object_id": int(pid) if pid.isdigit() else pid,
+                    "event": "updated",
+                }).encode()
+                headers = {"Content-Type": "application/json"}
+                if secret:
+                    headers["X-OpenSolar-Signature"] = sign(body, secret)
+
+                resp = requests.post(options["url"], data=body, headers=headers, timeout=10)
+                self.stdout.write(f"📤 project {pid} → {resp.status_code} {resp.text}")
+                if options["interval"]:
+                    time.sleep(options["interval"])
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.api.fakes.odoo import FakeOdoo
+from apps.api.fakes.transport import serve
+
+
+class Command(BaseCommand):
+    help = "Serve an in-memory Odoo (JSON-RPC and XML-RPC) locally, for push benchmarks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8069)
+        parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every RPC")
+
+    def handle(self, *args, **options):
+        app = FakeOdoo(latency=options["latency"])
+        server, base_url = serve(app, options["host"], options["port"])
+        self.stdout.write(self.style.SUCCESS(f"🗄️ Fake Odoo at {base_url}"))
+        self.stdout.write(f"   Point the sync at it with ODOO_URL={base_url}")
+
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
+            self.stdout.write(f"Served {app.total_calls} RPCs: {dict(app.calls)}")
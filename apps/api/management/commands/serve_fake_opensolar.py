@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.api.fakes.opensolar import FakeOpenSolar, Fleet
+from apps.api.fakes.transport import serve
+
+
+class Command(BaseCommand):
+    help = "Serve a synthetic OpenSolar fleet locally, for offline benchmarks and load tests"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--projects", type=int, default=1000, help="Fleet size")
+        parser.add_argument("--seed", type=int, default=0, help="Generator seed")
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+        parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra seconds")
+        parser.add_argument("--error-429", type=float, default=0.0, help="Probability of a 429 response")
+        parser.add_argument("--error-500", type=float, default=0.0, help="Probability of a 500 response")
+        parser.add_argument("--rate-limit", type=float, default=None, help="Requests per second before 429s")
+        parser.add_argument("--max-page-size", type=int, default=None,
+                            help="Serve at most this many listing entries per page, whatever the limit")
+
+    def handle(self, *args, **options):
+        app = FakeOpenSolar(
+            Fleet(options["projects"], seed=options["seed"]),
+            latency=options["latency"],
+            jitter=options["jitter"],
+            error_429=options["error_429"],
+            error_500=options["error_500"],
+            rate_limit=options["rate_limit"],
+            max_page_size=options["max_page_size"],
+            seed=options["seed"],
+        )
+        server, base_url = serve(app, options["host"], options["port"])
+        self.stdout.write(self.style.SUCCESS(
+            f"🌞 Fake OpenSolar with {options['projects']} projects at {base_url}/api"
+        ))
+        self.stdout.write(f"   Point the sync at it with OPENSOLAR_BASE_URL={base_url}/api OPENSOLAR_GET_DELAY=0")
+
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
+            self.stdout.write(f"Served {sum(app.calls.values())} requests: {dict(app.calls)}")
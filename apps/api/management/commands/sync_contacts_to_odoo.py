@@ -1,102 +1,162 @@
-from django.core.management.base import BaseCommand
+import threading
+
+from apps.api import concurrency, tracing
+from apps.api.circuit import CircuitOpen
+from apps.api.conf import sync_settings
+from apps.api.management.base import SyncCommand
 from apps.api.models import OpenSolarCustomer
-import requests
+from django.db.models import Q
 import json
+from apps.api.odoo import OdooJSONRPC
 
-from decouple import config
 
+class Command(SyncCommand):
+    help = 'Sync OpenSolar customers to Odoo as contacts'
 
-ODOO_URL = config("ODOO_URL")
-ODOO_DB = config("ODOO_DB")
-ODOO_USERNAME = config("ODOO_API_USERNAME")
-ODOO_PASSWORD = config("ODOO_API_TOKEN")
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lookup_lock = threading.Lock()  # one country/state lookup at a time across push workers
+        self._dedupe_locks = concurrency.KeyedLocks()
+        self.reset_caches()
 
-ODOO_RPC = f"{ODOO_URL}/jsonrpc"
+    def reset_caches(self):
+        self._uid = None
+        self._country_ids = {}  # name -> res.country id
+        self._state_ids = {}    # (code, country id) -> res.country.state id
 
-class Command(BaseCommand):
-    help = 'Sync OpenSolar customers to Odoo as contacts'
-
-    def handle(self, *args, **kwargs):
+    def run(self, *args, targets=None, **kwargs):
         try:
             uid = self.authenticate()
             customers = OpenSolarCustomer.objects.all()
+            if targets is not None:
+                customers = customers.filter(
+                    Q(external_id__in=targets.customer_ids)
+                    | Q(projects__external_id__in=targets.project_ids)
+                ).distinct()
 
-            for customer in customers:
-                external_id = customer.external_id
-                email       = customer.email or ""
-                name        = customer.name
-                phone       = customer.phone or ""
-                address     = customer.address or ""
-                city        = customer.city or ""
-                state_code  = customer.state or ""
-                zip_code    = customer.zip_code or ""    # ← your Django field
-                country_name= "United States"
-
-                try:
-                    country_id = self.get_country_id(uid, country_name)
-                    state_id   = self.get_or_create_state_id(uid, state_code, state_code, country_id)
-
-                    contact_data = {
-                        "name": name,
-                        "email": email,
-                        "phone": phone,
-                        "street": address,
-                        "city": city,
-                        "zip": zip_code,
-                        "state_id": state_id,
-                        "country_id": country_id,
-                        "x_studio_opensolar_external_id": int(external_id)  # Syncing the external_id
-                    }
-
-                    # Dedupe by external ID OR email
-                    domain = [
-                        "|",
-                        ["x_studio_opensolar_external_id", "=", int(external_id)],
-                        ["email", "=", email if email else False]
-                    ]
-                    existing = self.search_contact(uid, domain)
-
-                    if existing:
-                        contact_id = existing[0]["id"]
-                        # Perform update + log changes
-                        self.update_contact(uid, contact_id, contact_data)
-                    else:
-                        # Create new
-                        new_id = self.create_contact(uid, contact_data)
-                        self.stdout.write(self.style.SUCCESS(
-                            f"🆕 Created new contact ID {new_id} | {name}"
-                        ))
-
-                except Exception as contact_err:
-                    self.stderr.write(self.style.ERROR(
-                        f"❌ Failed to sync contact '{name}': {contact_err}"
-                    ))
+            for customer, outcome in concurrency.imap(lambda c: self.push_customer(uid, c), customers, "odoo"):
+                self.record_outcome(customer, outcome)
 
             self.stdout.write(self.style.SUCCESS(
                 f"✅ Sync complete for {customers.count()} customers."
             ))
 
         except Exception as e:
+            self.stats.error = f"General Sync Error: {e}"
             self.stderr.write(self.style.ERROR(f"❌ General Sync Error: {e}"))
 
+    @property
+    def odoo(self):
+        if not hasattr(self, "_odoo"):
+            self._odoo = OdooJSONRPC(sync_settings.ODOO_URL, stats=self.stats)
+        return self._odoo
+
+    def sync_customer(self, uid, customer):
+        return self.record_outcome(customer, self.push_customer(uid, customer))
+
+    def push_customer(self, uid, customer):
+        """
+        The Odoo side of one customer, safe to run on a push worker: returns
+        (contact id, None), or (None, exception) if it failed.
+        """
+        with tracing.bind(customer_id=customer.external_id):
+            try:
+                return self._sync_customer(uid, customer), None
+            except CircuitOpen:
+                raise  # Odoo is down: end the run instead of failing every remaining contact
+            except Exception as e:
+                return None, e
+
+    def record_outcome(self, customer, outcome):
+        """Count and dead-letter (or clear) a push_customer() result. Returns the contact id."""
+        contact_id, error = outcome
+        if error is not None:
+            self.stats.incr("failed")
+            self.failures.record_error(customer.external_id, error)
+            self.stderr.write(self.style.ERROR(
+                f"❌ Failed to sync contact '{customer.name}': {error}"
+            ))
+        elif contact_id is not None:
+            self.failures.resolve(customer.external_id)
+        return contact_id
+
+    def _sync_customer(self, uid, customer):
+        """Create or update the Odoo contact for one customer. Returns the contact id."""
+        external_id = customer.external_id
+        email       = customer.email or ""
+        name        = customer.name
+        phone       = customer.phone or ""
+        address     = customer.address or ""
+        city        = customer.city or ""
+        state_code  = customer.state or ""
+        zip_code    = customer.zip_code or ""    # ← your Django field
+        country_name= "United States"
+
+        country_id = self.get_country_id(uid, country_name)
+        state_id   = self.get_or_create_state_id(uid, state_code, state_code, country_id)
+
+        contact_data = {
+            "name": name,
+            "email": email,
+            "phone": phone,
+            "street": address,
+            "city": city,
+            "zip": zip_code,
+            "state_id": state_id,
+            "country_id": country_id,
+            "x_studio_opensolar_external_id": int(external_id)  # Syncing the external_id
+        }
+
+        # Dedupe by external ID OR email; customers sharing an email are pushed one at a time
+        domain = [
+            "|",
+            ["x_studio_opensolar_external_id", "=", int(external_id)],
+            ["email", "=", email if email else False]
+        ]
+        with self._dedupe_locks(email):
+            existing = self.search_contact(uid, domain)
+
+            if existing:
+                contact_id = existing[0]["id"]
+                # Perform update + log changes
+                return self.update_contact(uid, contact_id, contact_data)
+            else:
+                # Create new
+                new_id = self.create_contact(uid, contact_data)
+                self.stats.incr("processed")
+                self.stdout.write(self.style.SUCCESS(
+                    f"🆕 Created new contact ID {new_id} | {name}"
+                ))
+                return new_id
+
     def authenticate(self):
+        if self._uid:
+            return self._uid
         payload = {
             "jsonrpc": "2.0",
             "method": "call",
             "params": {
                 "service": "common",
                 "method": "login",
-                "args": [ODOO_DB, ODOO_USERNAME, ODOO_PASSWORD],
+                "args": [sync_settings.ODOO_DB, sync_settings.ODOO_API_USERNAME, sync_settings.ODOO_API_TOKEN],
             },
             "id": 1,
         }
-        res = requests.post(ODOO_RPC, json=payload).json()
+        res = self.odoo.post(payload)
         uid = res.get("result")
         if not uid:
             raise Exception("Authentication failed.")
+        self._uid = uid
         return uid
 
     def get_country_id(self, uid, country_name):
+        if country_name not in self._country_ids:
+            with self._lookup_lock:
+                if country_name not in self._country_ids:
+                    self._country_ids[country_name] = self._get_country_id(uid, country_name)
+        return self._country_ids[country_name]
+
+    def _get_country_id(self, uid, country_name):
         payload = {
             "jsonrpc": "2.0",
             "method": "call",
@@ -104,7 +164,7 @@ class Command(BaseCommand):
                 "service": "object",
                 "method": "execute_kw",
                 "args": [
-                    ODOO_DB, uid, ODOO_PASSWORD,
+                    sync_settings.ODOO_DB, uid, sync_settings.ODOO_API_TOKEN,
                     "res.country", "search",
                     [[["name", "=", country_name]]]
                 ],
@@ -112,13 +172,20 @@ class Command(BaseCommand):
             },
             "id": 2,
         }
-        res = requests.post(ODOO_RPC, json=payload).json()
+        res = self.odoo.post(payload)
         results = res.get("result", [])
         if not results:
             raise Exception(f"Country '{country_name}' not found.")
         return results[0]
 
     def get_or_create_state_id(self, uid, state_code, state_name, country_id):
+        key = (state_code, country_id)
+        with self._lookup_lock:  # two workers must not both create a missing state
+            if key not in self._state_ids:
+                self._state_ids[key] = self._get_or_create_state_id(uid, state_code, state_name, country_id)
+        return self._state_ids[key]
+
+    def _get_or_create_state_id(self, uid, state_code, state_name, country_id):
         # Try to find the state
         payload = {
             "jsonrpc": "2.0",
@@ -127,7 +194,7 @@ class Command(BaseCommand):
                 "service": "object",
                 "method": "execute_kw",
                 "args": [
-                    ODOO_DB, uid, ODOO_PASSWORD,
+                    sync_settings.ODOO_DB, uid, sync_settings.ODOO_API_TOKEN,
                     "res.country.state", "search_read",
                     [[["code", "=", state_code], ["country_id", "=", country_id]]]
                 ],
@@ -135,7 +202,7 @@ class Command(BaseCommand):
             },
             "id": 3,
         }
-        res = requests.post(ODOO_RPC, json=payload).json()
+        res = self.odoo.post(payload)
         states = res.get("result", [])
         if states:
             return states[0]["id"]
@@ -148,7 +215,7 @@ class Command(BaseCommand):
                 "service": "object",
                 "method": "execute_kw",
                 "args": [
-                    ODOO_DB, uid, ODOO_PASSWORD,
+                    sync_settings.ODOO_DB, uid, sync_settings.ODOO_API_TOKEN,
                     "res.country.state", "create",
                     [{
                         "name": state_name,
@@ -159,7 +226,7 @@ class Command(BaseCommand):
             },
             "id": 4,
         }
-        return requests.post(ODOO_RPC, json=create_payload).json().get("result")
+        return self.odoo.post(create_payload).get("result")
 
     def search_contact(self, uid, domain):
         payload = {
@@ -169,7 +236,7 @@ class Command(BaseCommand):
                 "service": "object",
                 "method": "execute_kw",
                 "args": [
-                    ODOO_DB, uid, ODOO_PASSWORD,
+                    sync_settings.ODOO_DB, uid, sync_settings.ODOO_API_TOKEN,
                     "res.partner", "search_read",
                     [domain]
                 ],
@@ -177,7 +244,7 @@ class Command(BaseCommand):
             },
             "id": 5,
         }
-        res = requests.post(ODOO_RPC, json=payload).json()
+        res = self.odoo.post(payload)
         return res.get("result", [])
 
     def create_contact(self, uid, data):
@@ -188,13 +255,13 @@ class Command(BaseCommand):
                 "service": "object",
                 "method": "execute_kw",
                 "args": [
-                    ODOO_DB, uid, ODOO_PASSWORD,
+                    sync_settings.ODOO_DB, uid, sync_settings.ODOO_API_TOKEN,
                     "res.partner", "create", [data]
                 ]
             },
             "id": 6,
         }
-        return requests.post(ODOO_RPC, json=payload).json().get("result")
+        return self.odoo.post(payload).get("result")
 
     def update_contact(self, uid, contact_id, new_data):
         # 1) Read current field values
@@ -205,14 +272,14 @@ class Command(BaseCommand):
                 "service": "object",
                 "method": "execute_kw",
                 "args": [
-                    ODOO_DB, uid, ODOO_PASSWORD,
+                    sync_settings.ODOO_DB, uid, sync_settings.ODOO_API_TOKEN,
                     "res.partner", "read", [[contact_id]]
                 ],
                 "kwargs": {"fields": list(new_data.keys())}
             },
             "id": 7,
         }
-        existing = requests.post(ODOO_RPC, json=read_payload).json().get("result", [])[0]
+        existing = self.odoo.post(read_payload).get("result", [])[0]
 
         # 2) Compute diffs
         changes = {}
@@ -230,18 +297,20 @@ class Command(BaseCommand):
                     "service": "object",
                     "method": "execute_kw",
                     "args": [
-                        ODOO_DB, uid, ODOO_PASSWORD,
+                        sync_settings.ODOO_DB, uid, sync_settings.ODOO_API_TOKEN,
                         "res.partner", "write",
                         [[contact_id], new_data]
                     ]
                 },
                 "id": 8,
             }
-            requests.post(ODOO_RPC, json=write_payload)
+            self.odoo.post(write_payload)
+            self.stats.incr("processed")
             self.stdout.write(self.style.WARNING(
                 f"🔄 Updated contact ID {contact_id} with changes: {json.dumps(changes)}"
             ))
         else:
+            self.stats.incr("skipped")
             self.stdout.write(self.style.SUCCESS(
                 f"✔️ No changes for contact ID {contact_id}"
             ))
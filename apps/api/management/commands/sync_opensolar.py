@@ -1,10 +1,15 @@
 # api/management/commands/sync_opensolar.py
-import time
 import json
+import math
 import traceback
-import requests
-from decouple import config
-from django.core.management.base import BaseCommand
+from datetime import timezone as dt_timezone
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from apps.api import backfill, concurrency, metrics, tracing
+from apps.api.conf import sync_settings
+from apps.api.management.base import SyncCommand
+from apps.api.opensolar import OpenSolarClient
 from apps.api.models import (
     OpenSolarProject,
     OpenSolarCustomer,
@@ -12,303 +17,485 @@ from apps.api.models import (
     OpenSolarModule,
     OpenSolarInverter,
     OpenSolarBattery,
+    OpenSolarProjectPayload,
 )
 
-import math
+TOMBSTONE_BATCH = 1000  # external ids per UPDATE when marking vanished projects deleted
+TOMBSTONE_MAX_FRACTION = 0.1  # more of the fleet than this vanishing at once needs --full
+TOMBSTONE_ALWAYS = 10         # ...unless it is only this many projects
+
+
+def remote_modified(value):
+    """OpenSolar's modified_date as an aware datetime (naive ones are UTC), or None."""
+    parsed = parse_datetime(value) if value else None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
 
-class Command(BaseCommand):
+class Command(SyncCommand):
     help = 'Sync projects, customers, proposals, and full system details from OpenSolar'
 
-    def handle(self, *args, **kwargs):
-        token   = config("OPENSOLAR_API_TOKEN")
-        org_id  = config("OPENSOLAR_ORG_ID")
-        base    = f"https://api.opensolar.com/api/orgs/{org_id}"
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json",
-        }
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--full", action="store_true",
+            help="Fetch every project's details, not just those the id listing shows as new or changed, "
+                 "and tombstone projects missing from the listing even if that is a large share of them.",
+        )
+        parser.add_argument(
+            "--backfill", action="store_true",
+            help="Load with COPY into staging tables and one set-based merge per model "
+                 "(PostgreSQL; for onboarding a whole org).",
+        )
+        parser.add_argument(
+            "--archive", metavar="PATH",
+            help="Backfill from a saved JSONL(.gz) response archive instead of the API (implies --backfill).",
+        )
+        parser.add_argument(
+            "--save-archive", metavar="PATH",
+            help="With --backfill, also write every fetched response to this JSONL(.gz) archive.",
+        )
 
-        PAGE_SIZE      = 20             # Number of projects per request
-        page           = 1              # Start from the first page
-        last_get       = 0.0            # timestamp of last GET request
-        GET_DELAY      = 1.0            # seconds between calls
-        total_synced   = 0
-        total_projects = None           # Will try to grab from first page if possible
+    def run(self, *args, targets=None, **kwargs):
+        import requests  # deferred to keep `manage.py` startup cheap; see benchmarks/startup.py
+        if kwargs.get("backfill") or kwargs.get("archive"):
+            return self.backfill(targets, archive=kwargs.get("archive"), save_archive=kwargs.get("save_archive"))
 
-        def throttle(last_time, delay):
-            """Sleep so that at least `delay` seconds has passed since last_time."""
-            delta = time.time() - last_time
-            if delta < delay:
-                time.sleep(delay - delta)
+        total_synced = 0
 
         try:
-            while True:
-                throttle(last_get, GET_DELAY)
-                projects_url = f"{base}/projects/"
-                params = {"limit": PAGE_SIZE, "page": page}
-                max_retries = 3
-                backoff = GET_DELAY
-
-                got_data = False
-                for attempt in range(max_retries):
-                    try:
-                        resp = requests.get(projects_url, headers=headers, params=params)
-                        resp.raise_for_status()
-                        last_get = time.time()
-                        got_data = True
-                        break
-                    except requests.exceptions.HTTPError as e:
-                        status = getattr(resp, 'status_code', None)
-                        if status == 404 or status == 500:
-                            self.stdout.write(self.style.WARNING(
-                                f"❌ No more pages or server error after last page (page {page}): {e}. Stopping sync."
-                            ))
-                            return  
-                        else:
-                            self.stdout.write(self.style.WARNING(
-                                f"⚠️ HTTP error on page {page}: {e}, retrying in {backoff}s"
-                            ))
-                            time.sleep(backoff)
-                            backoff *= 2
-                if not got_data:
-                    self.stdout.write(self.style.WARNING(
-                        f"❌ Max retries exceeded for page {page}. Stopping sync."
-                    ))
-                    return
+            if targets is not None:
+                for pid in sorted(self.resolve_project_ids(targets)):
+                    if self.ingest_by_id(pid):
+                        total_synced += 1
+            else:
+                for projects in self.iter_ingest_pages(full=kwargs.get("full", False)):
+                    for project_obj in self.ingest_page(projects):
+                        if project_obj:
+                            total_synced += 1
 
-                data = resp.json()
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ Synced {total_synced} OpenSolar projects (paged in {self.client.PAGE_SIZE} chunks)."
+            ))
 
-                if total_projects is None and isinstance(data, dict) and "count" in data:
-                    total_projects = data["count"]
-                    max_pages = math.ceil(total_projects / PAGE_SIZE)
-                    self.stdout.write(self.style.NOTICE(
-                        f"Total projects: {total_projects}. Expecting up to {max_pages} pages."
-                    ))
+        except requests.RequestException as e:
+            self.stats.error = f"API Request Error: {e}"
+            self.stderr.write(self.style.ERROR(f"❌ API Request Error: {e}"))
+            traceback.print_exc()
+        except Exception as e:
+            self.stats.error = f"General Sync Error: {e}"
+            self.stderr.write(self.style.ERROR(f"❌ General Sync Error: {e}"))
+            traceback.print_exc()
+
+    @property
+    def client(self):
+        if not hasattr(self, "_client"):
+            self._client = OpenSolarClient(
+                sync_settings.OPENSOLAR_API_TOKEN,
+                sync_settings.OPENSOLAR_ORG_ID,
+                warn=lambda msg: self.stdout.write(self.style.WARNING(msg)),
+                stats=self.stats,
+                base_url=settings.OPENSOLAR_BASE_URL,
+                get_delay=settings.OPENSOLAR_GET_DELAY,
+            )
+        return self._client
+
+    def iter_ingest_pages(self, full=False):
+        """
+        Yield pages of listing entries to ingest: the whole paged listing
+        with `full`, otherwise just the projects plan_changes() finds new or
+        changed. Either way the id listing is read first for deletions.
+        """
+        changed = self.plan_changes(full=full)
+        if full:
+            yield from self.iter_project_pages()
+            return
+        size = self.client.PAGE_SIZE
+        for start in range(0, len(changed), size):
+            yield [{"id": pid} for pid in changed[start:start + size]]
+
+    def plan_changes(self, full=False):
+        """
+        Compare the id-only listing with the local projects, tombstone the
+        ones gone from OpenSolar and return the external ids whose details
+        need fetching: new, modified since their last ingest, or back after
+        a tombstone. Losing more than TOMBSTONE_MAX_FRACTION of the fleet in
+        one run looks more like a bad listing than real deletions, so that
+        takes `full` (--full).
+        """
+        remote, complete = self.list_remote_ids()
+        local = list(OpenSolarProject.objects.filter(deleted_at__isnull=True)
+                     .values_list("external_id", "remote_modified_at"))
+        # Without a modified_date on either side there is nothing to compare, so it counts as changed.
+        changed = sorted(pid for pid, _ in set(remote.items()) - {pair for pair in local if pair[1] is not None})
+        vanished = {pid for pid, _ in local} - remote.keys()
+        if not full:
+            self.stats.incr("skipped", len(remote) - len(changed))
+        self.stdout.write(self.style.NOTICE(
+            f"🔎 {len(remote)} projects listed: {len(changed)} new or changed, {len(vanished)} gone."
+        ))
+
+        if vanished and not complete:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ The id listing stopped early; not tombstoning {len(vanished)} unlisted projects."
+            ))
+        elif vanished and not remote:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ The id listing is empty; refusing to tombstone all {len(vanished)} local projects."
+            ))
+        elif len(vanished) > max(TOMBSTONE_ALWAYS, TOMBSTONE_MAX_FRACTION * len(local)) and not full:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ {len(vanished)} of {len(local)} local projects are missing from the id listing; "
+                f"not tombstoning that many without --full."
+            ))
+        elif vanished:
+            self.tombstone(vanished)
+        return changed
 
-                if isinstance(data, dict) and "projects" in data:
-                    projects = data["projects"]
-                elif isinstance(data, list):
-                    projects = data
+    def list_remote_ids(self):
+        """
+        {external_id: modified datetime or None} for every project in the
+        org, from the id-only listing, and whether the listing was read to
+        its end.
+
+        The server may serve fewer than ID_PAGE_SIZE per page, so the end is
+        judged from what it actually returns: the `count` it reports when it
+        sends one, otherwise an empty page or one shorter than the largest
+        seen. A short first page alone proves nothing; the next one decides.
+        """
+        remote, page, count, page_size = {}, 1, None, 0
+        while True:
+            data = self.client.list_project_ids(page)
+            if isinstance(data, dict):
+                count = data.get("count", count)
+                data = data.get("projects")
+            if not isinstance(data, list) or not data:
+                # An empty page ends the listing; a 404/500 may too, but only `count` can say so.
+                if count is not None:
+                    complete = len(remote) >= count
                 else:
+                    complete = isinstance(data, list)
+                if not complete:
                     self.stdout.write(self.style.WARNING(
-                        f"Unexpected response format: {data}"
+                        f"❌ Id listing ended at page {page} with {len(remote)} of "
+                        f"{count if count is not None else 'an unknown number of'} projects."
                     ))
-                    break
+                return remote, complete
+            for entry in data:
+                remote[str(entry["id"])] = remote_modified(entry.get("modified_date"))
+            if count is not None and len(remote) >= count:
+                return remote, True
+            if count is None and page > 1 and len(data) < page_size:
+                return remote, True
+            page_size = max(page_size, len(data))
+            page += 1
 
-                if not projects:
-                    self.stdout.write(self.style.SUCCESS(
-                        f"✅ No more projects found (empty page {page}). Stopping sync."
-                    ))
-                    break
-
-                self.stdout.write(f"Fetched {len(projects)} projects from page {page}")
-
-                for proj in projects:
-                    pid = proj["id"]
-
-                    throttle(last_get, GET_DELAY)
-                    proj_url = f"{base}/projects/{pid}/"
-                    for attempt in range(max_retries):
-                        try:
-                            full = requests.get(proj_url, headers=headers)
-                            full.raise_for_status()
-                            last_get = time.time()
-                            break
-                        except requests.exceptions.HTTPError as e:
-                            status = getattr(full, 'status_code', None)
-                            if status == 404 or status == 500:
-                                self.stdout.write(self.style.WARNING(
-                                    f"❌ No more detail or server error for project {pid}: {e}. Skipping project."
-                                ))
-                                continue
-                            else:
-                                self.stdout.write(self.style.WARNING(
-                                    f"⚠️ HTTP error on project {pid}: {e}, retrying in {backoff}s"
-                                ))
-                                time.sleep(backoff)
-                                backoff *= 2
-                    else:
-                        self.stdout.write(self.style.WARNING(
-                            f"❌ Max retries exceeded for project {pid}. Skipping."
-                        ))
-                        continue
+    def tombstone(self, external_ids):
+        """Mark projects that are gone from OpenSolar deleted. Their rows stay, for history and Odoo."""
+        now = timezone.now()
+        ids = sorted(external_ids)
+        for start in range(0, len(ids), TOMBSTONE_BATCH):
+            # update() skips auto_now; bump updated_at so ?updated_since= pollers see the tombstone.
+            OpenSolarProject.objects.filter(external_id__in=ids[start:start + TOMBSTONE_BATCH],
+                                            deleted_at__isnull=True).update(deleted_at=now, updated_at=now)
+        metrics.PROJECTS_TOMBSTONED.inc(len(ids))
+        self.stdout.write(self.style.WARNING(f"🪦 Tombstoned {len(ids)} projects no longer in OpenSolar."))
 
-                    full_data = full.json()
-                    share_link = full_data.get("share_link", "")
-
-                    contact = (proj.get("contacts_data") or [{}])[0]
-                    if contact.get("id"):
-                        customer, _ = OpenSolarCustomer.objects.update_or_create(
-                            external_id=contact["id"],
-                            defaults={
-                                "name":    contact.get("display") or "No Name",
-                                "email":   contact.get("email", ""),
-                                "phone":   contact.get("phone", ""),
-                                "address": proj.get("address", ""),
-                                "city":    proj.get("locality", ""),
-                                "state":   proj.get("state", ""),
-                                "zip_code": proj.get("zip", ""),
-                            },
-                        )
-                    else:
-                        self.stdout.write(f"⚠️ No customer on project {pid}")
-                        customer = None
-
-                    project_obj, _ = OpenSolarProject.objects.update_or_create(
-                        external_id=pid,
-                        defaults={
-                            "name":         proj.get("title", ""),
-                            "status":       str(proj.get("stage", "")),
-                            "customer":     customer,
-                            "created_at":   proj.get("created_date"),
-                            "project_type": "Residential" if proj.get("is_residential") else "Commercial",
-                            "share_link":   share_link,
-                        },
-                    )
+    def iter_project_pages(self):
+        """Yield each page of project summaries from the OpenSolar listing."""
+        page           = 1              # Start from the first page
+        total_projects = None           # Will try to grab from first page if possible
 
-                    # — clear old parts —
-                    project_obj.modules.all().delete()
-                    project_obj.inverters.all().delete()
-                    project_obj.batteries.all().delete()
-
-                    for prop in full_data.get("proposals", []):
-                        OpenSolarProposal.objects.update_or_create(
-                            external_id=prop.get("id"),
-                            defaults={
-                                "project":            project_obj,
-                                "title":              prop.get("title", "Untitled"),
-                                "pdf_url":            prop.get("pdf_url"),
-                                "created_at":         prop.get("created_at"),
-                                "system_size_kw":     prop.get("kw_stc"),
-                                "system_output_kwh":  prop.get("output_annual_kwh"),
-                                "price":              prop.get("price_including_tax"),
-                                "battery_size_kwh":   prop.get("battery_total_kwh"),
-                            }
-                        )
-
-                    throttle(last_get, GET_DELAY)
-                    systems_url = f"{base}/systems/"
-                    params = {"project": pid, "fieldset": "list", "page": 1, "limit": 1}
-                    for attempt in range(max_retries):
-                        try:
-                            systems_resp = requests.get(systems_url, headers=headers, params=params)
-                            systems_resp.raise_for_status()
-                            last_get = time.time()
-                            break
-                        except requests.exceptions.HTTPError as e:
-                            status = getattr(systems_resp, 'status_code', None)
-                            if status == 404 or status == 500:
-                                self.stdout.write(self.style.WARNING(
-                                    f"❌ No system details or server error for project {pid}: {e}. Skipping system details."
-                                ))
-                                continue
-                            else:
-                                self.stdout.write(self.style.WARNING(
-                                    f"⚠️ HTTP error on systems for project {pid}: {e}, retrying in {backoff}s"
-                                ))
-                                time.sleep(backoff)
-                                backoff *= 2
-                    else:
-                        self.stdout.write(self.style.WARNING(
-                            f"❌ Max retries exceeded for systems on project {pid}. Skipping."
-                        ))
-                        continue
+        while True:
+            data = self.client.list_projects(page)
+            if data is None:
+                self.stdout.write(self.style.WARNING(
+                    f"❌ No more pages or server error after last page (page {page}). Stopping sync."
+                ))
+                return
 
-                    systems_data = systems_resp.json()
-                    if not systems_data:
-                        continue
-                    for system in systems_data:
-                        price_including_tax = system.get("price_including_tax")
-                        if price_including_tax is not None:
-                            project_obj.price_including_tax = price_including_tax
-                        else:
-                            for prop in full_data.get("proposals", []):
-                                pft = prop.get("price_including_tax")
-                                if pft:
-                                    project_obj.price_including_tax = pft
-                                    break
-
-                        project_obj.system_size_kw    = system.get("kw_stc")
-                        project_obj.system_output_kwh = system.get("output_annual_kwh")
-                        project_obj.battery_size_kwh  = system.get("battery_total_kwh")
-                        project_obj.save()
-
-                        total_mod_qty = 0
-                        for m in system.get("modules", []):
-                            module_qty = m.get("quantity", 0)
-                            total_mod_qty += module_qty
-                            OpenSolarModule.objects.create(
-                                project=project_obj,
-                                manufacturer_name=m.get("manufacturer_name", ""),
-                                code=m.get("code", ""),
-                                quantity=module_qty,
-                            )
-
-                        for inv in system.get("inverters", []):
-                            qty = inv.get("quantity", 0) or 0
-                            activation_id = inv.get("inverter_activation_id")
-                            if activation_id:
-                                throttle(last_get, GET_DELAY)
-                                activation_url = f"{base}/component_inverter_activations/{activation_id}/"
-                                for attempt in range(max_retries):
-                                    try:
-                                        inv_resp = requests.get(activation_url, headers=headers)
-                                        inv_resp.raise_for_status()
-                                        last_get = time.time()
-                                        break
-                                    except requests.exceptions.HTTPError as e:
-                                        status = getattr(inv_resp, 'status_code', None)
-                                        if status == 404 or status == 500:
-                                            self.stdout.write(self.style.WARNING(
-                                                f"❌ No inverter detail or server error for activation {activation_id}: {e}. Skipping inverter."
-                                            ))
-                                            continue
-                                        else:
-                                            self.stdout.write(self.style.WARNING(
-                                                f"⚠️ HTTP error on inverter activation {activation_id}: {e}, retrying in {backoff}s"
-                                            ))
-                                            time.sleep(backoff)
-                                            backoff *= 2
-                                else:
-                                    self.stdout.write(self.style.WARNING(
-                                        f"❌ Max retries exceeded for inverter activation {activation_id}. Skipping."
-                                    ))
-                                    continue
-
-                                inv_detail = inv_resp.json()
-                                data_blob = inv_detail.get("data")
-                                if data_blob:
-                                    parsed = json.loads(data_blob)
-                                    if str(parsed.get("microinverter", "")).upper() == "Y":
-                                        qty = total_mod_qty
-
-                            OpenSolarInverter.objects.create(
-                                project=project_obj,
-                                manufacturer_name=inv.get("manufacturer_name", ""),
-                                code=inv.get("code", ""),
-                                quantity=qty,
-                            )
-
-                        for b in system.get("batteries", []):
-                            if not OpenSolarBattery.objects.filter(project=project_obj, code=b.get("code")).exists():
-                                OpenSolarBattery.objects.create(
-                                    project=project_obj,
-                                    manufacturer_name=b.get("manufacturer_name", ""),
-                                    code=b.get("code", ""),
-                                    quantity=b.get("quantity", 0),
-                                )
+            if total_projects is None and isinstance(data, dict) and "count" in data:
+                total_projects = data["count"]
+                max_pages = math.ceil(total_projects / self.client.PAGE_SIZE)
+                self.stdout.write(self.style.NOTICE(
+                    f"Total projects: {total_projects}. Expecting up to {max_pages} pages."
+                ))
 
-                        total_synced += 1
+            if isinstance(data, dict) and "projects" in data:
+                projects = data["projects"]
+            elif isinstance(data, list):
+                projects = data
+            else:
+                self.stdout.write(self.style.WARNING(
+                    f"Unexpected response format: {data}"
+                ))
+                return
+
+            if not projects:
+                self.stdout.write(self.style.SUCCESS(
+                    f"✅ No more projects found (empty page {page}). Stopping sync."
+                ))
+                return
+
+            self.stdout.write(f"Fetched {len(projects)} projects from page {page}")
+            yield projects
+            page += 1
+
+    def backfill(self, targets=None, archive=None, save_archive=None):
+        """Stage every project (from the API or `archive`) and merge them in one transaction."""
+        import requests
+        writer = None
+        try:
+            loader = backfill.Backfill()
+            if save_archive and not archive:
+                writer = backfill.ArchiveWriter(save_archive)
 
-                page += 1
+            if archive:
+                records = backfill.iter_archive(archive)
+            else:
+                records = self.iter_fetched_records(targets)
 
+            for record in records:
+                if writer:
+                    writer.write(record)
+                loader.add(record)
+                self.stats.incr("processed")
+                metrics.PROJECTS_INGESTED.inc()
+                if self.stats.processed % 1000 == 0:
+                    self.stdout.write(f"   staged {self.stats.processed} projects")
+
+            self.stdout.write(f"📥 Merging {self.stats.processed} staged projects…")
+            written = loader.load()
             self.stdout.write(self.style.SUCCESS(
-                f"✅ Synced {total_synced} OpenSolar projects (paged in {PAGE_SIZE} chunks)."
+                "✅ Backfill complete: " + ", ".join(f"{n} {model}" for model, n in written.items())
             ))
 
         except requests.RequestException as e:
+            self.stats.error = f"API Request Error: {e}"
             self.stderr.write(self.style.ERROR(f"❌ API Request Error: {e}"))
             traceback.print_exc()
         except Exception as e:
-            self.stderr.write(self.style.ERROR(f"❌ General Sync Error: {e}"))
+            self.stats.error = f"Backfill Error: {e}"
+            self.stderr.write(self.style.ERROR(f"❌ Backfill Error: {e}"))
             traceback.print_exc()
+        finally:
+            if writer:
+                writer.close()
+
+    def iter_fetched_records(self, targets=None):
+        """Yield archive records ({"summary", "detail", "systems", "activations"}) from the API."""
+        if targets is not None:
+            summaries = ({"id": pid} for pid in sorted(self.resolve_project_ids(targets)))
+        else:
+            summaries = (proj for projects in self.iter_project_pages() for proj in projects)
+
+        for summary, record in concurrency.imap(self.fetch_record, summaries, "opensolar"):
+            if record is None:
+                self.stats.incr("failed")
+                self.stdout.write(self.style.WARNING(f"❌ Skipping project {summary['id']}."))
+                continue
+            yield record
+
+    def fetch_record(self, summary, strict=False):
+        """
+        Every response the ingest needs for one project, or None if the
+        detail is missing. `strict` raises OpenSolarUnavailable instead when
+        the detail failed with a 500 or ran out of retries.
+        """
+        pid = summary["id"]
+        with tracing.bind(project_id=str(pid)):
+            detail = self.client.get_project(pid, strict=strict)
+            if detail is None:
+                return None
+            if len(summary) == 1:  # targeted: the detail is a superset of the listing entry
+                summary = detail
+            systems = self.client.get_systems(pid)
+            activations = {}
+            for system in systems or []:
+                for inv in system.get("inverters", []):
+                    activation_id = inv.get("inverter_activation_id")
+                    if activation_id and str(activation_id) not in activations:
+                        payload = self.client.get_inverter_activation(activation_id)
+                        if payload is not None:
+                            activations[str(activation_id)] = payload
+        return {"summary": summary, "detail": detail, "systems": systems, "activations": activations}
+
+    def resolve_project_ids(self, targets):
+        """Explicit project ids plus the locally known projects of any targeted customers."""
+        project_ids = set(targets.project_ids)
+        for cid in targets.customer_ids:
+            known = set(OpenSolarProject.objects
+                        .filter(customer__external_id=cid)
+                        .values_list("external_id", flat=True))
+            if not known:
+                self.stdout.write(self.style.WARNING(
+                    f"⚠️ No local projects for customer {cid}; run a full sync or pass --project-id."
+                ))
+            project_ids |= known
+        return project_ids
+
+    def ingest_by_id(self, pid, strict=False):
+        """Fetch one project straight from /projects/{id}/ and ingest it (see fetch_record for `strict`)."""
+        return self.ingest_project({"id": pid}, strict=strict)
+
+    def ingest_page(self, projects):
+        """
+        Ingest a page of listing entries, yielding the OpenSolarProject (or
+        None) for each in order. The OpenSolar calls for several projects run
+        at once, within the adaptive "opensolar" limit; everything is stored
+        on this thread.
+        """
+        for proj, record in concurrency.imap(self.fetch_record, projects, "opensolar"):
+            yield self.store_record(proj, record)
+
+    def ingest_project(self, proj, strict=False):
+        return self.store_record(proj, self.fetch_record(proj, strict=strict))
+
+    def store_record(self, proj, record):
+        with tracing.bind(project_id=str(proj["id"])):
+            return self._store_record(proj, record)
+
+    def _store_record(self, proj, record):
+        """
+        Store one project from the responses fetch_record() collected for
+        its listing entry. Returns the OpenSolarProject, or None if the
+        project detail could not be fetched.
+        """
+        pid = proj["id"]
+        if record is None:
+            self.stats.incr("failed")
+            self.stdout.write(self.style.WARNING(f"❌ Skipping project {pid}."))
+            return None
+        proj         = record["summary"]
+        full_data    = record["detail"]
+        systems_data = record["systems"]
+        activations  = record["activations"]
+        share_link = full_data.get("share_link", "")
+
+        contact = (proj.get("contacts_data") or [{}])[0]
+        if contact.get("id"):
+            customer, _ = OpenSolarCustomer.objects.update_or_create(
+                external_id=contact["id"],
+                defaults={
+                    "name":    contact.get("display") or "No Name",
+                    "email":   contact.get("email", ""),
+                    "phone":   contact.get("phone", ""),
+                    "address": proj.get("address", ""),
+                    "city":    proj.get("locality", ""),
+                    "state":   proj.get("state", ""),
+                    "zip_code": proj.get("zip", ""),
+                },
+            )
+        else:
+            self.stdout.write(f"⚠️ No customer on project {pid}")
+            customer = None
+
+        project_obj, _ = OpenSolarProject.objects.update_or_create(
+            external_id=pid,
+            defaults={
+                "name":         proj.get("title", ""),
+                "status":       str(proj.get("stage", "")),
+                "customer":     customer,
+                "created_at":   proj.get("created_date"),
+                "project_type": "Residential" if proj.get("is_residential") else "Commercial",
+                "share_link":   share_link,
+                "remote_modified_at": remote_modified(proj.get("modified_date")),
+                "deleted_at":   None,
+            },
+        )
+
+        # — clear old parts —
+        project_obj.modules.all().delete()
+        project_obj.inverters.all().delete()
+        project_obj.batteries.all().delete()
+
+        for prop in full_data.get("proposals", []):
+            OpenSolarProposal.objects.update_or_create(
+                external_id=prop.get("id"),
+                defaults={
+                    "project":            project_obj,
+                    "title":              prop.get("title", "Untitled"),
+                    "pdf_url":            prop.get("pdf_url"),
+                    "created_at":         prop.get("created_at"),
+                    "system_size_kw":     prop.get("kw_stc"),
+                    "system_output_kwh":  prop.get("output_annual_kwh"),
+                    "price":              prop.get("price_including_tax"),
+                    "battery_size_kwh":   prop.get("battery_total_kwh"),
+                }
+            )
+
+        self.stats.incr("processed")
+        metrics.PROJECTS_INGESTED.inc()
+
+        if not systems_data:
+            self.store_payload(project_obj, full_data, systems_data, activations)
+            return project_obj
+
+        for system in systems_data:
+            price_including_tax = system.get("price_including_tax")
+            if price_including_tax is not None:
+                project_obj.price_including_tax = price_including_tax
+            else:
+                for prop in full_data.get("proposals", []):
+                    pft = prop.get("price_including_tax")
+                    if pft:
+                        project_obj.price_including_tax = pft
+                        break
+
+            project_obj.system_size_kw    = system.get("kw_stc")
+            project_obj.system_output_kwh = system.get("output_annual_kwh")
+            project_obj.battery_size_kwh  = system.get("battery_total_kwh")
+            project_obj.save()
+
+            total_mod_qty = 0
+            for m in system.get("modules", []):
+                module_qty = m.get("quantity", 0)
+                total_mod_qty += module_qty
+                OpenSolarModule.objects.create(
+                    project=project_obj,
+                    manufacturer_name=m.get("manufacturer_name", ""),
+                    code=m.get("code", ""),
+                    quantity=module_qty,
+                )
+
+            for inv in system.get("inverters", []):
+                qty = inv.get("quantity", 0) or 0
+                activation_id = inv.get("inverter_activation_id")
+                if activation_id:
+                    inv_detail = activations.get(str(activation_id))
+                    if inv_detail is None:
+                        continue
+
+                    data_blob = inv_detail.get("data")
+                    if data_blob:
+                        parsed = json.loads(data_blob)
+                        if str(parsed.get("microinverter", "")).upper() == "Y":
+                            qty = total_mod_qty
+
+                OpenSolarInverter.objects.create(
+                    project=project_obj,
+                    manufacturer_name=inv.get("manufacturer_name", ""),
+                    code=inv.get("code", ""),
+                    quantity=qty,
+                )
+
+            for b in system.get("batteries", []):
+                if not OpenSolarBattery.objects.filter(project=project_obj, code=b.get("code")).exists():
+                    OpenSolarBattery.objects.create(
+                        project=project_obj,
+                        manufacturer_name=b.get("manufacturer_name", ""),
+                        code=b.get("code", ""),
+                        quantity=b.get("quantity", 0),
+                    )
+
+        self.store_payload(project_obj, full_data, systems_data, activations)
+        return project_obj
+
+    @staticmethod
+    def store_payload(project_obj, detail, systems, activations):
+        """Keep the raw responses so `manage.py remap` can re-derive fields without the API."""
+        OpenSolarProjectPayload.objects.update_or_create(
+            project=project_obj,
+            defaults={"detail": detail, "systems": systems, "activations": activations},
+        )
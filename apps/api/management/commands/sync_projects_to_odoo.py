@@ -1,14 +1,11 @@
-from django.core.management.base import BaseCommand
+from apps.api import concurrency, tracing
+from apps.api.circuit import CircuitOpen
+from apps.api.conf import sync_settings
+from apps.api.management.base import SyncCommand
 from apps.api.models import OpenSolarProject
-import requests
-from decouple import config
+from django.db.models import Q
+from apps.api.odoo import OdooJSONRPC
 
-# ─── Odoo JSON-RPC settings ─────────────────────────────────────────────────
-ODOO_URL      = config("ODOO_URL")
-ODOO_DB       = config("ODOO_DB")
-ODOO_USERNAME = config("ODOO_API_USERNAME")
-ODOO_PASSWORD = config("ODOO_API_TOKEN")
-ODOO_RPC      = f"{ODOO_URL}/jsonrpc"
 
 # ─── x_projects field names ────────────────────────────────────────────────
 F_NAME       = "x_name"
@@ -32,105 +29,149 @@ F_BAT_TYPE   = "x_studio_battery_type"
 F_BAT_QTY    = "x_studio_battery_quantity"
 
 
-class Command(BaseCommand):
+class Command(SyncCommand):
     help = "Sync OpenSolarProject → Odoo x_projects (incl. first Module/Inverter/Battery)"
 
-    def handle(self, *args, **kwargs):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._dedupe_locks = concurrency.KeyedLocks()
+        self.reset_caches()
+
+    def reset_caches(self):
+        self._uid = None
+        self.reset_run_state()
+
+    def reset_run_state(self):
+        self._partners = {}  # (customer external_id, email) -> res.partner {"id", "name"}
+
+    def run(self, *args, targets=None, **kwargs):
         uid      = self._authenticate()
-        projects = OpenSolarProject.objects.all()
+        projects = OpenSolarProject.objects.filter(deleted_at__isnull=True)  # tombstoned: gone from OpenSolar
+        if targets is not None:
+            projects = projects.filter(
+                Q(external_id__in=targets.project_ids)
+                | Q(customer__external_id__in=targets.customer_ids)
+            )
         self.stdout.write(f"\n🔎  {projects.count()} projects in Django\n")
 
-        for proj in projects:
-            # ─── GUARD: skip any project with no customer linked
-            if not proj.customer:
-                self.stderr.write(
-                    f"   ❌  SKIP: no customer linked for project external_id={proj.external_id}\n\n"
-                )
-                continue
-
-            ext_id   = int(proj.external_id)
-            share    = proj.share_link or ""
-            price    = float(proj.price_including_tax or 0.0)  # Ensure using price_including_tax
-            sys_size = float(proj.system_size_kw or 0.0)
-            cust     = proj.customer
-
-            self.stdout.write(
-                f"➡️  OS#{ext_id} – customer: {cust.name}\n"
-                f"   🔗 share_link: {share!r}\n"
-                f"   💲 price (including tax): {price!r}\n"  # Display the price (including tax)
-                f"   📏 sys_size:   {sys_size!r}"
-            )
+        # Built here, on this thread: prepare_project() reads the database.
+        prepared = ((proj, self.prepare_project(proj)) for proj in projects)
+        for (proj, _), outcome in concurrency.imap(lambda item: self.push_project(uid, *item), prepared, "odoo"):
+            self.record_outcome(proj, outcome)
 
-            if not share:
-                self.stdout.write("   ‼️  SKIP: no share_link\n\n")
-                continue
+        self.stdout.write(self.style.SUCCESS("✅ Full sync complete\n"))
 
-            # ─── Find or skip partner in Odoo (Map customer contact using external_id)
-            partner = self._search_read(
-                uid, "res.partner",
-                ["|",
-                    [F_EXT_ID, "=", cust.external_id],  # Use customer external_id
-                    ["email", "=", cust.email or False],
-                ],
-                ["id", "name"]
+    def sync_project(self, uid, proj):
+        """Create or update the Odoo x_projects record for one project. Returns its id, or None if skipped."""
+        return self.record_outcome(proj, self.push_project(uid, proj, self.prepare_project(proj)))
+
+    def prepare_project(self, proj):
+        """The x_projects values for one project (without the partner), or None if it is skipped."""
+        # ─── GUARD: skip any project with no customer linked
+        if not proj.customer:
+            self.stats.incr("skipped")
+            self.failures.record(proj.external_id, "MissingCustomer", "no customer linked")
+            self.stderr.write(
+                f"   ❌  SKIP: no customer linked for project external_id={proj.external_id}\n\n"
             )
-            if not partner:
-                self.stderr.write(
-                    f"   ❌  No Odoo contact for {cust.name} ({cust.email})\n\n"
-                )
-                continue
-
-            pid = partner[0]["id"]
-            self.stdout.write(f"   👤 partner #{pid}: {partner[0]['name']}")
-
-            # ─── Build project vals
-            vals = {
-                F_NAME:     cust.name,
-                F_PARTNER:  pid,
-                F_EXT_ID:   ext_id,
-                F_PROPOSAL: share,
-                F_SYS_SIZE: sys_size,
-
-                # Map price_including_tax to both value and change fields
-                F_VALUE:    price,  # This is for the x_studio_value field (monetary field)
-                F_CHANGE:   price,  # This is for the x_studio_change_order_price field (monetary field)
-                "x_studio_open_solar_project_id": ext_id  # Correct field name here
-            }
-
-            # ─── Flatten first Module
-            first_mod = proj.modules.first()
-            if first_mod:
-                vals.update({
-                    F_MOD_MAN:  first_mod.manufacturer_name,
-                    F_MOD_TYPE: first_mod.code,
-                    F_MOD_QTY:  first_mod.quantity,
-                })
-
-            # ─── Flatten first Inverter
-            first_inv = proj.inverters.first()
-            if first_inv:
-                vals.update({
-                    F_INV_MAN:  first_inv.manufacturer_name,
-                    F_INV_TYPE: first_inv.code,
-                    F_INV_QTY:  first_inv.quantity,
-                })
-
-            # ─── Flatten first Battery
-            first_bat = proj.batteries.first()
-            if first_bat:
-                vals.update({
-                    F_BAT_MAN:  first_bat.manufacturer_name,
-                    F_BAT_TYPE: first_bat.code,
-                    F_BAT_QTY:  first_bat.quantity,
-                })
-
-            self.stdout.write(f"   [DEBUG] payload → {vals}")
-
-            # ─── Dedupe on (external_id, customer_name) for the project
+            return None
+
+        ext_id   = int(proj.external_id)
+        share    = proj.share_link or ""
+        price    = float(proj.price_including_tax or 0.0)  # Ensure using price_including_tax
+        sys_size = float(proj.system_size_kw or 0.0)
+        cust     = proj.customer
+
+        self.stdout.write(
+            f"➡️  OS#{ext_id} – customer: {cust.name}\n"
+            f"   🔗 share_link: {share!r}\n"
+            f"   💲 price (including tax): {price!r}\n"  # Display the price (including tax)
+            f"   📏 sys_size:   {sys_size!r}"
+        )
+
+        if not share:
+            self.stats.incr("skipped")
+            self.failures.record(proj.external_id, "MissingShareLink", "no share_link")
+            self.stdout.write("   ‼️  SKIP: no share_link\n\n")
+            return None
+
+        # ─── Build project vals
+        vals = {
+            F_NAME:     cust.name,
+            F_EXT_ID:   ext_id,
+            F_PROPOSAL: share,
+            F_SYS_SIZE: sys_size,
+
+            # Map price_including_tax to both value and change fields
+            F_VALUE:    price,  # This is for the x_studio_value field (monetary field)
+            F_CHANGE:   price,  # This is for the x_studio_change_order_price field (monetary field)
+            "x_studio_open_solar_project_id": ext_id  # Correct field name here
+        }
+
+        # ─── Flatten first Module
+        first_mod = proj.modules.first()
+        if first_mod:
+            vals.update({
+                F_MOD_MAN:  first_mod.manufacturer_name,
+                F_MOD_TYPE: first_mod.code,
+                F_MOD_QTY:  first_mod.quantity,
+            })
+
+        # ─── Flatten first Inverter
+        first_inv = proj.inverters.first()
+        if first_inv:
+            vals.update({
+                F_INV_MAN:  first_inv.manufacturer_name,
+                F_INV_TYPE: first_inv.code,
+                F_INV_QTY:  first_inv.quantity,
+            })
+
+        # ─── Flatten first Battery
+        first_bat = proj.batteries.first()
+        if first_bat:
+            vals.update({
+                F_BAT_MAN:  first_bat.manufacturer_name,
+                F_BAT_TYPE: first_bat.code,
+                F_BAT_QTY:  first_bat.quantity,
+            })
+        return vals
+
+    def push_project(self, uid, proj, vals):
+        """
+        The Odoo side of one prepared project, safe to run on a push worker.
+        Returns (x_projects id, None), or (None, failure) where failure is an
+        (error class, message) skip or the exception raised.
+        """
+        if vals is None:
+            return None, None
+        with tracing.bind(project_id=proj.external_id):
+            try:
+                return self._push_project(uid, proj, vals)
+            except CircuitOpen:
+                raise  # Odoo is down: end the run
+            except Exception as e:
+                return None, e
+
+    def _push_project(self, uid, proj, vals):
+        cust = proj.customer
+
+        # ─── Find or skip partner in Odoo (Map customer contact using external_id)
+        partner = self.find_partner(uid, cust)
+        if not partner:
+            return None, ("MissingPartner", f"No Odoo contact for {cust.name} ({cust.email})")
+
+        pid = partner[0]["id"]
+        self.stdout.write(f"   👤 partner #{pid}: {partner[0]['name']}")
+        vals = {**vals, F_PARTNER: pid}
+
+        self.stdout.write(f"   [DEBUG] payload → {vals}")
+
+        # ─── Dedupe on (external_id, customer_name) for the project; one push per name at a time
+        with self._dedupe_locks(cust.name):
             existing = self._search_read(
                 uid, "x_projects",
                 ["|",
-                    [F_EXT_ID, "=", ext_id],
+                    [F_EXT_ID, "=", vals[F_EXT_ID]],
                     [F_NAME,  "=", cust.name],
                 ],
                 ["id"]
@@ -146,25 +187,67 @@ class Command(BaseCommand):
                     self.style.SUCCESS(f"   🆕 Created x_projects #{prj_id}")
                 )
 
-            self.stdout.write("")  # blank line
+        self.stdout.write("")  # blank line
+        return prj_id, None
 
-        self.stdout.write(self.style.SUCCESS("✅ Full sync complete\n"))
+    def record_outcome(self, proj, outcome):
+        """Count and dead-letter (or clear) a push_project() result; re-raises a push error."""
+        prj_id, failure = outcome
+        if isinstance(failure, Exception):
+            self.failures.record_error(proj.external_id, failure)
+            raise failure
+        if failure is not None:
+            error_class, message = failure
+            self.stats.incr("skipped")
+            self.failures.record(proj.external_id, error_class, message)
+            self.stderr.write(f"   ❌  {message}\n\n")
+            return None
+        if prj_id is not None:
+            self.stats.incr("processed")
+            self.failures.resolve(proj.external_id)
+        return prj_id
+
+    def find_partner(self, uid, cust):
+        """The Odoo contact for a customer, as [{"id", "name"}] or []. Hits are remembered."""
+        key = (cust.external_id, cust.email or "")
+        with self._dedupe_locks(key):  # a customer's other projects wait for this lookup
+            if key in self._partners:
+                return [self._partners[key]]
+            partner = self._search_read(
+                uid, "res.partner",
+                ["|",
+                    [F_EXT_ID, "=", cust.external_id],  # Use customer external_id
+                    ["email", "=", cust.email or False],
+                ],
+                ["id", "name"]
+            )
+            if partner:
+                self._partners[key] = partner[0]
+            return partner
 
     # ─── JSON-RPC helpers ────────────────────────────────────────────────────
+    @property
+    def odoo(self):
+        if not hasattr(self, "_odoo"):
+            self._odoo = OdooJSONRPC(sync_settings.ODOO_URL, stats=self.stats)
+        return self._odoo
+
     def _rpc(self, payload):
-        resp = requests.post(ODOO_RPC, json=payload).json()
+        resp = self.odoo.post(payload)
         if "error" in resp:
             raise RuntimeError(resp["error"]["data"]["message"])
         return resp.get("result", [])
 
     def _authenticate(self):
-        return self._rpc({
-            "jsonrpc":"2.0", "method":"call",
-            "params":{
-                "service":"common","method":"login",
-                "args":[ODOO_DB,ODOO_USERNAME,ODOO_PASSWORD]
-            }, "id":1
-        })
+        if not self._uid:
+            self._uid = self._rpc({
+                "jsonrpc":"2.0", "method":"call",
+                "params":{
+                    "service":"common","method":"login",
+                    "args":[sync_settings.ODOO_DB,sync_settings.ODOO_API_USERNAME,sync_settings.ODOO_API_TOKEN]
+                }, "id":1
+            })
+        return self._uid
 
     def _search_read(self, uid, model, domain, fields):
         return self._rpc({
@@ -172,7 +255,7 @@ class Command(BaseCommand):
             "params":{
                 "service":"object","method":"execute_kw",
                 "args":[
-                    ODOO_DB, uid, ODOO_PASSWORD,
+                    sync_settings.ODOO_DB, uid, sync_settings.ODOO_API_TOKEN,
                     model, "search_read",
                     [domain],
                     {"fields":fields,"limit":1}
@@ -186,7 +269,7 @@ class Command(BaseCommand):
             "params":{
                 "service":"object","method":"execute_kw",
                 "args":[
-                    ODOO_DB, uid, ODOO_PASSWORD,
+                    sync_settings.ODOO_DB, uid, sync_settings.ODOO_API_TOKEN,
                     model, "create",[vals]
                 ]
             },"id":3
@@ -198,7 +281,7 @@ class Command(BaseCommand):
             "params":{
                 "service":"object","method":"execute_kw",
                 "args":[
-                    ODOO_DB, uid, ODOO_PASSWORD,
+                    sync_settings.ODOO_DB, uid, sync_settings.ODOO_API_TOKEN,
                     model, "write",[[rec_id],vals]
                 ]
             },"id":4
@@ -0,0 +1,284 @@
+"""
+Sync metrics in the Prometheus text exposition format, for /api/metrics/.
+
+No client library: a few counters, histograms and gauges keyed by label
+values, fed from tracing spans (HTTP latency, Odoo RPCs, retries), the
+OpenSolar throttle, a DB execute wrapper, the circuit breakers, the adaptive
+concurrency limits and the ingest stage.
+
+The syncs mostly run outside the web process (cron commands,
+run_sync_daemon), so each process only collects into memory and flush()es
+to MetricTotal rows: counters and histogram buckets are added to the
+running totals, gauges overwrite the stored value. flush() runs when a sync
+run finishes, after the webhook queue is drained and before every scrape,
+and the endpoint renders from the table, so every process is counted.
+Gauges are therefore as of the last flush of the process that set them –
+requests_in_flight is usually 0, read at the end of a run. Nothing is
+served from the web process's memory alone.
+
+Series about runs themselves (last successful run per stage, run totals,
+the dead-letter queue) are read from SyncStageRun and SyncFailure.
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "opensolar_sync_"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _num(value):
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = PREFIX + name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def drain(self):
+        """Take the values collected since the last flush, leaving the metric empty."""
+        with self.lock:
+            values, self.values = self.values, {}
+        return values
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, n=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + n
+
+    def render(self, values=None):
+        lines = self.header()
+        with self.lock:
+            for key, value in sorted((self.values if values is None else values).items()):
+                lines.append(f"{self.name}{_labels(self.label_names, key)} {_num(value)}")
+        return lines
+
+    def samples(self, values):
+        """(labels, sample, value) rows for MetricTotal."""
+        return [(key, "", value) for key, value in values.items()]
+
+    def from_samples(self, rows):
+        return {key: value for key, _, value in rows}
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self.lock:
+            self.values[key] = value
+
+    def drain(self):
+        """A gauge keeps its value: it is stored again, unchanged, until set anew."""
+        with self.lock:
+            return dict(self.values)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self.values[key] = (counts, total + value)
+
+    def render(self, values=None):
+        lines = self.header()
+        with self.lock:
+            for key, (counts, total) in sorted((self.values if values is None else values).items()):
+                for bound, count in zip(self.buckets, counts):
+                    le = (("le", _num(bound)),)
+                    lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {count}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_num(total)}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, key)} {counts[-1]}")
+        return lines
+
+    def samples(self, values):
+        """One row per bucket (the bound, as rendered in `le`) and one for the sum."""
+        rows = []
+        for key, (counts, total) in values.items():
+            rows.extend((key, _num(bound), count) for bound, count in zip(self.buckets, counts))
+            rows.append((key, "sum", total))
+        return rows
+
+    def from_samples(self, rows):
+        index = {_num(bound): i for i, bound in enumerate(self.buckets)}
+        values = {}
+        for key, sample, value in rows:
+            counts, total = values.setdefault(key, ([0] * len(self.buckets), 0.0))
+            if sample == "sum":
+                values[key] = (counts, value)
+            elif sample in index:
+                counts[index[sample]] = int(value)
+        return values
+
+
+# ─── The metrics ────────────────────────────────────────────────────────────
+PROJECTS_INGESTED = Counter("projects_ingested_total", "Projects ingested from OpenSolar.")
+PROJECTS_TOMBSTONED = Counter("projects_tombstoned_total", "Projects marked deleted after leaving OpenSolar.")
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Outbound call latency per endpoint template.",
+    labels=("system", "endpoint"),
+)
+HTTP_ERRORS = Counter("http_errors_total", "Outbound calls that failed.", labels=("system", "endpoint"))
+RETRIES = Counter("http_retries_total", "Retried outbound requests.", labels=("system", "endpoint"))
+ODOO_RPCS = Counter("odoo_rpc_total", "Odoo RPCs per model and method.", labels=("model", "method"))
+RATE_LIMIT_WAIT = Counter("rate_limit_wait_seconds_total", "Time spent sleeping in the OpenSolar throttle.")
+DB_WRITE = Histogram("db_write_duration_seconds", "Duration of INSERT/UPDATE/DELETE statements.")
+CIRCUIT_TRIPS = Counter("circuit_trips_total", "Times a remote system's circuit breaker opened.", labels=("system",))
+CONCURRENCY_LIMIT = Gauge("concurrency_limit", "Requests the adaptive limit currently allows in flight.",
+                          labels=("system",))
+IN_FLIGHT = Gauge("requests_in_flight", "Requests in flight right now.", labels=("system",))
+WINDOW_P95 = Gauge("window_p95_seconds", "p95 latency of the adaptive limit's last full window.",
+                   labels=("system",))
+CONCURRENCY_DECREASES = Counter("concurrency_decreases_total", "Times the adaptive limit was cut, by cause.",
+                                labels=("system", "reason"))
+
+REGISTRY = [PROJECTS_INGESTED, PROJECTS_TOMBSTONED, HTTP_LATENCY, HTTP_ERRORS, RETRIES, ODOO_RPCS,
+            RATE_LIMIT_WAIT, DB_WRITE, CIRCUIT_TRIPS, CONCURRENCY_LIMIT, IN_FLIGHT, WINDOW_P95,
+            CONCURRENCY_DECREASES]
+
+
+def observe_call(system, endpoint, seconds, retries=0, error=None):
+    """Called by tracing.span() for every finished outbound call."""
+    HTTP_LATENCY.observe(seconds, system=system, endpoint=endpoint)
+    if retries:
+        RETRIES.inc(retries, system=system, endpoint=endpoint)
+    if error:
+        HTTP_ERRORS.inc(system=system, endpoint=endpoint)
+    if system == "odoo" and "." in endpoint:
+        model, method = endpoint.rsplit(".", 1)
+        ODOO_RPCS.inc(model=model, method=method)
+
+
+_WRITES = ("INSERT", "UPDATE", "DELETE")
+
+
+def db_write_timer(execute, sql, params, many, context):
+    """connection.execute_wrapper() hook timing write statements."""
+    if not sql.lstrip()[:6].upper().startswith(_WRITES):
+        return execute(sql, params, many, context)
+    t0 = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        DB_WRITE.observe(time.perf_counter() - t0)
+
+
+@contextmanager
+def time_db_writes():
+    """Time DB writes on this thread's default connection for the duration of the block."""
+    from django.db import connection
+    with connection.execute_wrapper(db_write_timer):
+        yield
+
+
+def flush():
+    """
+    Add what this process collected since the last flush to the MetricTotal
+    rows, and store the gauges' current values. Safe to call often; a failed
+    write is logged and its counts are lost rather than failing the sync.
+    """
+    added, latest = [], []
+    for metric in REGISTRY:
+        values = metric.drain()
+        rows = [(metric.name, json.dumps(list(key)), sample, value)
+                for key, sample, value in metric.samples(values)]
+        (latest if metric.kind == "gauge" else added).extend(rows)
+    if not (added or latest):
+        return
+
+    from django.db import connection, transaction
+    from apps.api.models import MetricTotal
+    table = connection.ops.quote_name(MetricTotal._meta.db_table)
+    upsert = (f"INSERT INTO {table} (name, labels, sample, value, updated_at) "
+              f"VALUES (%s, %s, %s, %s, now()) ON CONFLICT (name, labels, sample) "
+              f"DO UPDATE SET value = {{}}, updated_at = EXCLUDED.updated_at")
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            if added:
+                cursor.executemany(upsert.format(f"{table}.value + EXCLUDED.value"), added)
+            if latest:
+                cursor.executemany(upsert.format("EXCLUDED.value"), latest)
+    except Exception:
+        logger.exception("Could not store sync metrics")
+
+
+def _stored_lines():
+    """The REGISTRY series, from the totals every process has flushed."""
+    from apps.api.models import MetricTotal
+
+    rows = {}
+    for name, labels, sample, value in MetricTotal.objects.values_list("name", "labels", "sample", "value"):
+        rows.setdefault(name, []).append((tuple(json.loads(labels)), sample, value))
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render(metric.from_samples(rows.get(metric.name, []))))
+    return lines
+
+
+def _run_history_lines():
+    """Series derived from SyncStageRun, so runs in other processes count too."""
+    from django.db.models import Count, Max, Sum
+    from apps.api.models import SyncFailure, SyncRun, SyncStageRun
+
+    last_ok = Gauge("last_success_timestamp_seconds",
+                    "Unix time the stage last finished successfully.", labels=("stage",))
+    totals = Counter("stage_records_total", "Records handled per stage and outcome, all recorded runs.",
+                     labels=("stage", "outcome"))
+    dead = Gauge("dead_letter_records", "Records waiting in the SyncFailure dead-letter queue.",
+                 labels=("stage", "error_class"))
+
+    for row in (SyncStageRun.objects.filter(status=SyncRun.STATUS_OK)
+                .values("stage").annotate(last=Max("finished_at"))):
+        if row["last"]:
+            last_ok.set(row["last"].timestamp(), stage=row["stage"])
+    for row in (SyncStageRun.objects.values("stage")
+                .annotate(processed=Sum("processed"), skipped=Sum("skipped"), failed=Sum("failed"))):
+        for outcome in ("processed", "skipped", "failed"):
+            totals.inc(row[outcome] or 0, stage=row["stage"], outcome=outcome)
+    for row in SyncFailure.objects.values("stage", "error_class").annotate(n=Count("id")):
+        dead.set(row["n"], stage=row["stage"], error_class=row["error_class"])
+    return last_ok.render() + totals.render() + dead.render()
+
+
+def render():
+    flush()
+    lines = _stored_lines()
+    lines.extend(_run_history_lines())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_opensolarproject_price_excluding_tax_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingProjectSync',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('external_id', models.CharField(max_length=100, unique=True)),
+                ('first_event_at', models.DateTimeField()),
+                ('last_event_at', models.DateTimeField()),
+                ('due_at', models.DateTimeField(db_index=True)),
+                ('event_count', models.PositiveIntegerField(default=1)),
+            ],
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-19 15:25
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_syncrun_syncstagerun'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='opensolarbattery',
+            index=models.Index(fields=['project', 'code'], name='battery_project_code_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='opensolarcustomer',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='customer_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='opensolarcustomer',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('email'), name='gin_trgm_ops'), name='customer_email_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='opensolarproject',
+            index=models.Index(fields=['updated_at'], name='project_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='opensolarproject',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='project_name_trgm_idx'),
+        ),
+    ]
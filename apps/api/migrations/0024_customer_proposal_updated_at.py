@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-19 15:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_sync_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='opensolarcustomer',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='opensolarproposal',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='opensolarcustomer',
+            index=models.Index(fields=['updated_at'], name='customer_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='opensolarproposal',
+            index=models.Index(fields=['updated_at'], name='proposal_updated_at_idx'),
+        ),
+    ]
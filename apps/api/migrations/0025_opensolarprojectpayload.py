@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-19 15:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_customer_proposal_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpenSolarProjectPayload',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='payload', serialize=False, to='api.opensolarproject')),
+                ('detail', models.JSONField()),
+                ('systems', models.JSONField(blank=True, null=True)),
+                ('activations', models.JSONField(blank=True, default=dict)),
+                ('fetched_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-19 15:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_opensolarprojectpayload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncFailure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(max_length=100)),
+                ('external_id', models.CharField(max_length=100)),
+                ('error_class', models.CharField(max_length=100)),
+                ('message', models.TextField(blank=True, default='')),
+                ('attempts', models.PositiveIntegerField(default=1)),
+                ('first_failed_at', models.DateTimeField()),
+                ('last_failed_at', models.DateTimeField()),
+                ('next_retry_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+            ],
+            options={
+                'ordering': ['next_retry_at'],
+                'constraints': [models.UniqueConstraint(fields=('stage', 'external_id'), name='syncfailure_stage_record_uniq')],
+            },
+        ),
+    ]
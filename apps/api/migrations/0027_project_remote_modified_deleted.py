@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 15:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0026_syncfailure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='opensolarproject',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='opensolarproject',
+            name='remote_modified_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
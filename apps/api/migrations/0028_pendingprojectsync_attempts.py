@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_project_remote_modified_deleted'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pendingprojectsync',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='pendingprojectsync',
+            name='last_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-19 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0028_pendingprojectsync_attempts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('labels', models.CharField(blank=True, default='', max_length=255)),
+                ('sample', models.CharField(blank=True, default='', max_length=20)),
+                ('value', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('name', 'labels', 'sample'), name='metrictotal_sample_uniq')],
+            },
+        ),
+    ]
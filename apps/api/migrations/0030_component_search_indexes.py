@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-19 16:18
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0029_metrictotal'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='opensolarbattery',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('code'), name='gin_trgm_ops'), name='battery_code_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='opensolarbattery',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('manufacturer_name'), name='gin_trgm_ops'), name='battery_maker_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='opensolarinverter',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('code'), name='gin_trgm_ops'), name='inverter_code_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='opensolarinverter',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('manufacturer_name'), name='gin_trgm_ops'), name='inverter_maker_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='opensolarmodule',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('code'), name='gin_trgm_ops'), name='module_code_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='opensolarmodule',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('manufacturer_name'), name='gin_trgm_ops'), name='module_maker_trgm_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 16:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0030_component_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncrun',
+            name='full',
+            field=models.BooleanField(default=False),
+        ),
+    ]
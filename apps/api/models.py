@@ -1,4 +1,6 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 
 class OpenSolarCustomer(models.Model):
     external_id = models.CharField(max_length=100, unique=True)
@@ -9,6 +11,15 @@ class OpenSolarCustomer(models.Model):
     city = models.CharField(max_length=100, null=True, blank=True)
     state = models.CharField(max_length=100, null=True, blank=True)
     zip_code = models.CharField(max_length=20, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at'], name='customer_updated_at_idx'),
+            # Admin search runs UPPER(col) LIKE UPPER('%term%'); trigram GIN serves that.
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='customer_name_trgm_idx'),
+            GinIndex(OpClass(Upper('email'), name='gin_trgm_ops'), name='customer_email_trgm_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -29,6 +40,14 @@ class OpenSolarProject(models.Model):
     price_including_tax = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     battery_size_kwh = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
     share_link = models.URLField(null=True, blank=True)
+    remote_modified_at = models.DateTimeField(null=True, blank=True)  # OpenSolar's modified_date at the last ingest
+    deleted_at = models.DateTimeField(null=True, blank=True)  # set once the project is gone from OpenSolar
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at'], name='project_updated_at_idx'),
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='project_name_trgm_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -45,6 +64,12 @@ class OpenSolarProposal(models.Model):
     system_output_kwh = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     battery_size_kwh = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at'], name='proposal_updated_at_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.project.name}"
@@ -55,16 +80,183 @@ class OpenSolarModule(models.Model):
     code = models.CharField(max_length=255)
     quantity = models.PositiveIntegerField()
 
+    class Meta:
+        indexes = [
+            # Admin search on part code and manufacturer (UPPER(col) LIKE, see the customer indexes).
+            GinIndex(OpClass(Upper('code'), name='gin_trgm_ops'), name='module_code_trgm_idx'),
+            GinIndex(OpClass(Upper('manufacturer_name'), name='gin_trgm_ops'), name='module_maker_trgm_idx'),
+        ]
+
 class OpenSolarInverter(models.Model):
     project = models.ForeignKey(OpenSolarProject, on_delete=models.CASCADE, related_name='inverters')
     manufacturer_name = models.CharField(max_length=255)
     code = models.CharField(max_length=255)
     quantity = models.PositiveIntegerField()
 
+    class Meta:
+        indexes = [
+            GinIndex(OpClass(Upper('code'), name='gin_trgm_ops'), name='inverter_code_trgm_idx'),
+            GinIndex(OpClass(Upper('manufacturer_name'), name='gin_trgm_ops'), name='inverter_maker_trgm_idx'),
+        ]
+
 class OpenSolarBattery(models.Model):
     project = models.ForeignKey(OpenSolarProject, on_delete=models.CASCADE, related_name='batteries')
     manufacturer_name = models.CharField(max_length=255)
     code = models.CharField(max_length=255)
     quantity = models.PositiveIntegerField()
 
+    class Meta:
+        indexes = [
+            # sync_opensolar checks for an existing battery by (project, code)
+            models.Index(fields=['project', 'code'], name='battery_project_code_idx'),
+            GinIndex(OpClass(Upper('code'), name='gin_trgm_ops'), name='battery_code_trgm_idx'),
+            GinIndex(OpClass(Upper('manufacturer_name'), name='gin_trgm_ops'), name='battery_maker_trgm_idx'),
+        ]
+
+
+
+
+class OpenSolarProjectPayload(models.Model):
+    """
+    The latest raw OpenSolar responses for a project, kept so that a newly
+    mapped field can be filled in with `manage.py remap` instead of
+    re-downloading the fleet. Detail is a superset of the listing entry.
+    """
+    project = models.OneToOneField(OpenSolarProject, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='payload')
+    detail = models.JSONField()
+    systems = models.JSONField(null=True, blank=True)
+    activations = models.JSONField(default=dict, blank=True)  # inverter activation id -> payload
+    fetched_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Payload for project {self.project_id}"
+
+
+class PendingProjectSync(models.Model):
+    """
+    A project that OpenSolar told us (via webhook) has changed and still needs
+    a targeted ingest + Odoo push. One row per project: a burst of webhooks
+    for the same project just pushes `due_at` back, so it is synced once.
+    The row stays until a sync succeeds; failed ones are retried with backoff.
+    """
+    external_id = models.CharField(max_length=100, unique=True)
+    first_event_at = models.DateTimeField()
+    last_event_at = models.DateTimeField()
+    due_at = models.DateTimeField(db_index=True)
+    event_count = models.PositiveIntegerField(default=1)
+    attempts = models.PositiveIntegerField(default=0)  # failed syncs since the last success
+    last_error = models.TextField(blank=True, default="")
+
+    def __str__(self):
+        return f"Project {self.external_id} (due {self.due_at:%Y-%m-%d %H:%M:%S})"
+
+
+class SyncRun(models.Model):
+    """One execution of a sync command (a stage on its own, or sync_all)."""
+    STATUS_RUNNING = "running"
+    STATUS_OK = "ok"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, "Running"),
+        (STATUS_OK, "OK"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    command = models.CharField(max_length=100)
+    targeted = models.BooleanField(default=False)  # --project-id / --customer-id run
+    full = models.BooleanField(default=False)      # --full run: every project fetched
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_RUNNING)
+    started_at = models.DateTimeField(db_index=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
 
+    class Meta:
+        ordering = ["-started_at"]
+
+    def __str__(self):
+        return f"{self.command} @ {self.started_at:%Y-%m-%d %H:%M}"
+
+    @property
+    def duration(self):
+        if self.finished_at:
+            return self.finished_at - self.started_at
+
+
+class SyncStageRun(models.Model):
+    """Timing and counters for one stage within a SyncRun."""
+    run = models.ForeignKey(SyncRun, on_delete=models.CASCADE, related_name='stages')
+    stage = models.CharField(max_length=100)
+    status = models.CharField(max_length=20, choices=SyncRun.STATUS_CHOICES, default=SyncRun.STATUS_RUNNING)
+    started_at = models.DateTimeField(db_index=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    processed = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    http_calls = models.PositiveIntegerField(default=0)
+    retries = models.PositiveIntegerField(default=0)
+    bytes_transferred = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+
+    class Meta:
+        ordering = ["-started_at"]
+
+    def __str__(self):
+        return f"{self.stage} @ {self.started_at:%Y-%m-%d %H:%M}"
+
+    @property
+    def duration(self):
+        if self.finished_at:
+            return self.finished_at - self.started_at
+
+    @property
+    def records_per_minute(self):
+        duration = self.duration
+        if duration and duration.total_seconds() > 0:
+            return round(self.processed * 60 / duration.total_seconds(), 1)
+
+
+class SyncFailure(models.Model):
+    """
+    A record an Odoo push stage could not sync: the dead-letter queue read by
+    `manage.py retry_failures` (see apps.api.failures). One row per stage and
+    record; a later successful sync of the record deletes it.
+    """
+    stage = models.CharField(max_length=100)
+    external_id = models.CharField(max_length=100)  # OpenSolar customer (contacts) or project (projects) id
+    error_class = models.CharField(max_length=100)
+    message = models.TextField(blank=True, default="")
+    attempts = models.PositiveIntegerField(default=1)
+    first_failed_at = models.DateTimeField()
+    last_failed_at = models.DateTimeField()
+    next_retry_at = models.DateTimeField(null=True, blank=True, db_index=True)  # None: out of attempts
+
+    class Meta:
+        ordering = ["next_retry_at"]
+        constraints = [
+            models.UniqueConstraint(fields=["stage", "external_id"], name="syncfailure_stage_record_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.stage} {self.external_id}: {self.error_class} (attempt {self.attempts})"
+
+
+class MetricTotal(models.Model):
+    """
+    Running total of one sample of a sync metric, added to by every process
+    that syncs (cron commands, run_sync_daemon, the web process) so that
+    /api/metrics/ reports them all. Written by apps.api.metrics.flush().
+    """
+    name = models.CharField(max_length=100)
+    labels = models.CharField(max_length=255, blank=True, default="")  # JSON list of label values
+    sample = models.CharField(max_length=20, blank=True, default="")   # histogram bucket bound or "sum"
+    value = models.FloatField(default=0)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["name", "labels", "sample"], name="metrictotal_sample_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.name}{self.labels} {self.sample} = {self.value}"
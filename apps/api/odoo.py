@@ -0,0 +1,42 @@
+"""
+Shared Odoo JSON-RPC transport for the push commands.
+
+The commands still build their own payloads; this just posts them over one
+keep-alive session, through the "odoo" circuit breaker and with explicit
+timeouts, within the adaptive "odoo" concurrency limit, and counts calls and
+bytes for the run history. One instance can be shared by worker threads.
+"""
+from apps.api import circuit, concurrency, tracing
+
+
+def rpc_endpoint(payload):
+    """Trace name for a JSON-RPC payload: "res.partner.search_read", "common.login", ..."""
+    params = payload.get("params", {})
+    args = params.get("args") or []
+    if params.get("method") == "execute_kw" and len(args) >= 5:
+        return f"{args[3]}.{args[4]}"
+    return f"{params.get('service')}.{params.get('method')}"
+
+
+class OdooJSONRPC:
+    def __init__(self, url, stats=None):
+        import requests  # deferred, as in apps.api.opensolar
+        self.url = f"{url}/jsonrpc"
+        self.session = requests.Session()
+        self.stats = stats
+
+    def post(self, payload):
+        """POST one JSON-RPC payload and return the decoded response body."""
+        with tracing.span("odoo", rpc_endpoint(payload)) as span:
+            with concurrency.limiter("odoo").slot() as outcome, circuit.guard("odoo") as call:
+                resp = self.session.post(self.url, json=payload, timeout=circuit.timeouts())
+                call.check(resp.status_code)
+                outcome.check(resp.status_code)
+            span.set(status=resp.status_code, bytes=len(resp.content))
+            body = resp.json()
+            if isinstance(body, dict) and "error" in body:
+                span.set(error="rpc_error")
+        if self.stats is not None:
+            self.stats.incr("http_calls")
+            self.stats.incr("bytes_transferred", len(resp.content))
+        return body
@@ -0,0 +1,126 @@
+"""
+Thin OpenSolar REST client shared by sync_opensolar and the sync_all pipeline.
+
+Keeps the one-request-per-GET_DELAY throttle and the retry/backoff rules that
+used to be copy-pasted around every GET in sync_opensolar. Every GET goes
+through the "opensolar" circuit breaker with explicit timeouts (see
+apps.api.circuit) and holds a slot of the adaptive "opensolar" concurrency
+limit (see apps.api.concurrency), so the client can be shared by worker
+threads.
+"""
+import threading
+import time
+
+from apps.api import circuit, concurrency, metrics, tracing
+
+
+class OpenSolarUnavailable(Exception):
+    """A strict GET got a 500 or ran out of retries (see OpenSolarClient.get)."""
+
+
+class OpenSolarClient:
+    BASE_URL    = "https://api.opensolar.com/api"
+    PAGE_SIZE   = 20     # Number of projects per listing request
+    ID_PAGE_SIZE = 1000  # Largest page the listing serves, for the id-only pass
+    GET_DELAY   = 1.0    # seconds between calls
+    MAX_RETRIES = 3
+
+    def __init__(self, token, org_id, warn=print, stats=None, base_url=None, get_delay=None):
+        self.base = f"{(base_url or self.BASE_URL).rstrip('/')}/orgs/{org_id}"
+        if get_delay is not None:
+            self.GET_DELAY = get_delay
+        import requests  # deferred: importing it costs more than the rest of the sync commands together
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+        })
+        self.warn = warn
+        self.stats = stats
+        self.last_get = 0.0  # start time of the latest GET, or of the next one already booked
+        self._throttle_lock = threading.Lock()
+
+    def throttle(self):
+        """Sleep until this GET may start: starts are at least GET_DELAY apart, across threads."""
+        with self._throttle_lock:
+            now = time.time()
+            start = max(now, self.last_get + self.GET_DELAY)
+            self.last_get = start
+        if start > now:
+            time.sleep(start - now)
+            metrics.RATE_LIMIT_WAIT.inc(start - now)
+
+    def get(self, path, params=None, what=None, template=None, strict=False):
+        """
+        GET `path` (relative to the org URL) and return the decoded JSON.
+
+        404 and 500 are treated as "nothing there" and anything else is
+        retried with exponential backoff. Returns None when the caller should
+        skip this resource. Connection errors, timeouts and CircuitOpen
+        propagate. With `strict`, only a 404 returns None: a 500 or running
+        out of retries raises OpenSolarUnavailable, for callers that must
+        not mistake an outage for a missing resource.
+
+        `template` names the endpoint in traces, e.g. "/projects/{id}/".
+        """
+        from requests.exceptions import HTTPError
+        what = what or path
+        url = f"{self.base}{path}"
+        backoff = self.GET_DELAY
+
+        with tracing.span("opensolar", f"GET {template or path}") as span:
+            for attempt in range(self.MAX_RETRIES):
+                if attempt:
+                    span.set(retries=attempt)
+                    if self.stats is not None:
+                        self.stats.incr("retries")
+                self.throttle()
+                with concurrency.limiter("opensolar").slot() as outcome, circuit.guard("opensolar") as call:
+                    resp = self.session.get(url, params=params, timeout=circuit.timeouts())
+                    call.check(resp.status_code)
+                    outcome.check(resp.status_code)
+                span.set(status=resp.status_code, bytes=span.attrs.get("bytes", 0) + len(resp.content))
+                if self.stats is not None:
+                    self.stats.incr("http_calls")
+                    self.stats.incr("bytes_transferred", len(resp.content))
+                try:
+                    resp.raise_for_status()
+                except HTTPError as e:
+                    if resp.status_code in (404, 500):
+                        self.warn(f"❌ No data or server error for {what}: {e}.")
+                        if strict and resp.status_code == 500:
+                            raise OpenSolarUnavailable(f"{what}: {e}") from e
+                        return None
+                    self.warn(f"⚠️ HTTP error on {what}: {e}, retrying in {backoff}s")
+                    time.sleep(backoff)
+                    backoff *= 2
+                    continue
+                return resp.json()
+
+        self.warn(f"❌ Max retries exceeded for {what}.")
+        if strict:
+            raise OpenSolarUnavailable(f"{what}: max retries exceeded")
+        return None
+
+    # ─── Endpoints ──────────────────────────────────────────────────────────
+    def list_projects(self, page):
+        return self.get("/projects/", {"limit": self.PAGE_SIZE, "page": page}, what=f"page {page}")
+
+    def list_project_ids(self, page):
+        """A page of {"id", "modified_date", …} entries: the listing's smallest fieldset."""
+        params = {"fieldset": "list", "limit": self.ID_PAGE_SIZE, "page": page}
+        return self.get("/projects/", params, what=f"id page {page}")
+
+    def get_project(self, pid, strict=False):
+        return self.get(f"/projects/{pid}/", what=f"project {pid}", template="/projects/{id}/", strict=strict)
+
+    def get_systems(self, pid):
+        params = {"project": pid, "fieldset": "list", "page": 1, "limit": 1}
+        return self.get("/systems/", params, what=f"systems on project {pid}")
+
+    def get_inverter_activation(self, activation_id):
+        return self.get(
+            f"/component_inverter_activations/{activation_id}/",
+            what=f"inverter activation {activation_id}",
+            template="/component_inverter_activations/{id}/",
+        )
@@ -0,0 +1,22 @@
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+
+def has_sync_key(request):
+    """
+    True if SYNC_SECRET is unset or the request carries it, as ?key= or as
+    an "Authorization: Bearer <secret>" header.
+    """
+    expected = getattr(settings, "SYNC_SECRET", None)
+    if not expected:
+        return True
+    auth = request.META.get("HTTP_AUTHORIZATION", "")
+    secret = auth[7:] if auth.startswith("Bearer ") else request.GET.get("key")
+    return secret == expected
+
+
+class HasSyncKey(BasePermission):
+    message = "Invalid sync key"
+
+    def has_permission(self, request, view):
+        return has_sync_key(request)
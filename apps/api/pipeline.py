@@ -0,0 +1,202 @@
+"""
+Full OpenSolar → Django → Odoo sync, either stage by stage or streamed.
+
+run_stages() is the classic order: the whole fleet through sync_opensolar,
+then every customer through sync_contacts_to_odoo, then every project through
+sync_projects_to_odoo.
+
+run_pipeline() streams instead: one thread per stage, joined by bounded
+queues, so each project is pushed to Odoo seconds after it is fetched rather
+than after the whole fleet has been ingested. The two push stages fan their
+Odoo calls out through concurrency.imap, like the stage commands do. The
+stage threads reuse the per-record methods of the stage commands, so both
+modes write exactly the same data.
+
+Callers are expected to hold locks.pipeline_lock().
+"""
+import queue
+import threading
+
+from django.core.management import call_command
+from django.db import connections
+
+from apps.api import concurrency, metrics, tracing
+from apps.api.locks import PIPELINE
+from apps.api.profiling import thread_profile
+from apps.api.models import OpenSolarProject
+from apps.api.runs import track_run, track_stage
+
+QUEUE_SIZE = 50  # projects buffered between two stages
+_DONE = object()
+
+
+def _target_options(targets):
+    if targets is None:
+        return {}
+    return {"project_id": sorted(targets.project_ids), "customer_id": sorted(targets.customer_ids)}
+
+
+def run_stages(stdout=None, stderr=None, targets=None, commands=None, full=False):
+    """
+    Run the three stages in order; `commands` are stage Command instances to
+    reuse. `full` makes the ingest fetch every project, not just changed ones.
+    """
+    stage_options = ({"full": full}, {}, {})
+    for command, options in zip(commands or ("sync_opensolar", "sync_contacts_to_odoo", "sync_projects_to_odoo"),
+                                stage_options):
+        call_command(command, stdout=stdout, stderr=stderr, **_target_options(targets), **options)
+
+
+class _Stage(threading.Thread):
+    """One pipeline stage: take items from `inbox`, hand results to `outbox`."""
+
+    def __init__(self, name, command, stop, inbox=None, outbox=None, run_record=None):
+        super().__init__(name=f"sync_all:{name}", daemon=True)
+        self.command = command
+        self.run_record = run_record
+        self.stop = stop
+        self.inbox = inbox
+        self.outbox = outbox
+        self.error = None
+
+    def emit(self, item):
+        # Bounded put that gives up if a downstream stage has died.
+        while not self.stop.is_set():
+            try:
+                self.outbox.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def items(self):
+        while not self.stop.is_set():
+            try:
+                item = self.inbox.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                return
+            yield item
+
+    def run(self):
+        self.command.stats.reset()
+        self.command.failures.reset()
+        self.command.reset_run_state()
+        try:
+            with thread_profile(), metrics.time_db_writes(), tracing.bind(run_id=self.run_record.pk), \
+                    track_stage(self.command.get_lock_name(), self.command.stats, self.run_record):
+                self.work()
+        except Exception as e:
+            self.error = e
+            self.stop.set()
+        finally:
+            if self.outbox is not None:
+                self.emit(_DONE)
+            connections.close_all()
+
+    def work(self):
+        raise NotImplementedError
+
+
+class _IngestStage(_Stage):
+    def __init__(self, command, targets=None, full=False, **kwargs):
+        super().__init__("ingest", command, **kwargs)
+        self.targets = targets
+        self.full = full
+
+    def work(self):
+        if self.targets is not None:
+            for pid in sorted(self.command.resolve_project_ids(self.targets)):
+                if self.stop.is_set():
+                    return
+                project_obj = self.command.ingest_by_id(pid)
+                if project_obj is not None:
+                    self.emit(project_obj.pk)
+            return
+
+        for projects in self.command.iter_ingest_pages(full=self.full):
+            for project_obj in self.command.ingest_page(projects):
+                if self.stop.is_set():
+                    return
+                if project_obj is not None:
+                    self.emit(project_obj.pk)
+
+
+class _ContactStage(_Stage):
+    def __init__(self, command, **kwargs):
+        super().__init__("contacts", command, **kwargs)
+
+    def work(self):
+        uid = self.command.authenticate()
+        pushed = set()  # a customer with several projects is pushed once per run
+
+        def customers():
+            # On this thread: the lookups read the database.
+            for pk in self.items():
+                customer = OpenSolarProject.objects.select_related("customer").get(pk=pk).customer
+                if customer is None or customer.pk in pushed:
+                    yield pk, None
+                else:
+                    pushed.add(customer.pk)
+                    yield pk, customer
+
+        def push(item):
+            _, customer = item
+            return None if customer is None else self.command.push_customer(uid, customer)
+
+        # imap yields in input order, so a project is only passed on once its
+        # customer's push (or the earlier one it shares) has finished.
+        for (pk, customer), outcome in concurrency.imap(push, customers(), "odoo"):
+            if customer is not None:
+                self.command.record_outcome(customer, outcome)
+            self.emit(pk)
+
+
+class _ProjectStage(_Stage):
+    def __init__(self, command, **kwargs):
+        super().__init__("projects", command, **kwargs)
+
+    def work(self):
+        uid = self.command._authenticate()
+        prepared = (
+            (proj, self.command.prepare_project(proj))
+            for proj in (OpenSolarProject.objects.select_related("customer").get(pk=pk) for pk in self.items())
+        )
+        for (proj, _), outcome in concurrency.imap(lambda item: self.command.push_project(uid, *item),
+                                                   prepared, "odoo"):
+            self.command.record_outcome(proj, outcome)
+
+
+def run_pipeline(stdout=None, stderr=None, queue_size=QUEUE_SIZE, targets=None, commands=None, full=False):
+    """
+    Stream the new and changed projects (every project with `full`, or just
+    `targets`) through ingest → contact push → project push. `commands` are the three stage Command instances to
+    reuse; fresh ones are built by default.
+    Re-raises the first stage error once all stages have stopped.
+    """
+    if commands is None:
+        from apps.api.management.commands import (
+            sync_opensolar, sync_contacts_to_odoo, sync_projects_to_odoo,
+        )
+        commands = (sync_opensolar.Command(stdout, stderr), sync_contacts_to_odoo.Command(stdout, stderr),
+                    sync_projects_to_odoo.Command(stdout, stderr))
+    ingest, contacts, projects = commands
+
+    stop = threading.Event()
+    fetched = queue.Queue(maxsize=queue_size)
+    contacted = queue.Queue(maxsize=queue_size)
+
+    with track_run(PIPELINE, targeted=targets is not None, full=full) as run:
+        stages = [
+            _IngestStage(ingest, targets, full=full, stop=stop, outbox=fetched, run_record=run),
+            _ContactStage(contacts, stop=stop, inbox=fetched, outbox=contacted, run_record=run),
+            _ProjectStage(projects, stop=stop, inbox=contacted, run_record=run),
+        ]
+        for stage in stages:
+            stage.start()
+        for stage in stages:
+            stage.join()
+
+        for stage in stages:
+            if stage.error is not None:
+                raise stage.error
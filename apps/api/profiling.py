@@ -0,0 +1,129 @@
+"""
+cProfile support for the sync commands (`--profile`).
+
+profile_session() profiles the calling thread and any pipeline stage thread
+that opts in through thread_profile(), writes one merged .pstats file and
+returns a short report: where the time went (HTTP wait, JSON decode, ORM,
+throttle sleep, everything else) plus the top-N functions.
+"""
+import cProfile
+import io
+import os
+import pstats
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.conf import settings
+
+_session = None
+_session_lock = threading.Lock()
+
+# (bucket, path suffix of the module, function name, use cumulative time?)
+# Cumulative entries must not nest inside each other or time would count twice.
+BUCKETS = [
+    ("HTTP wait",       "requests/sessions.py",         "request",     True),
+    ("HTTP wait",       "xmlrpc/client.py",             "request",     True),
+    ("JSON decode",     "json/__init__.py",             "loads",       True),
+    ("ORM time",        "django/db/models/sql/compiler.py", "execute_sql", True),
+    ("throttle sleep",  "~",                            "<built-in method time.sleep>", False),
+]
+
+
+def default_path(label):
+    base = getattr(settings, "BASE_DIR", os.getcwd())
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return os.path.join(base, "profiles", f"{label}-{stamp}.pstats")
+
+
+class _Session:
+    def __init__(self):
+        self.profiles = []
+        self.lock = threading.Lock()
+
+    def add(self, profile):
+        with self.lock:
+            self.profiles.append(profile)
+
+
+@contextmanager
+def thread_profile():
+    """Profile the current (worker) thread if a profile_session() is active."""
+    session = _session
+    if session is None:
+        yield
+        return
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        session.add(profile)
+
+
+@contextmanager
+def profile_session(path):
+    """
+    Profile the block and write the merged stats to `path`.
+    Yields a dict that is filled with {"path", "stats"} on exit.
+    """
+    global _session
+    result = {}
+    with _session_lock:
+        if _session is not None:
+            raise RuntimeError("A profile session is already active in this process")
+        _session = _Session()
+    session = _session
+
+    main = cProfile.Profile()
+    main.enable()
+    try:
+        yield result
+    finally:
+        main.disable()
+        with _session_lock:
+            _session = None
+
+        stats = pstats.Stats(main)
+        for profile in session.profiles:
+            stats.add(profile)
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        stats.dump_stats(path)
+        result.update(path=path, stats=stats)
+
+
+def breakdown(stats):
+    """Seconds per bucket, plus "other" and "total", from a pstats.Stats."""
+    totals = {name: 0.0 for name, *_ in BUCKETS}
+    total = 0.0
+    for (filename, _line, funcname), (_cc, _nc, tottime, cumtime, _callers) in stats.stats.items():
+        total += tottime
+        for name, suffix, func, cumulative in BUCKETS:
+            if funcname == func and filename.replace("\\", "/").endswith(suffix):
+                totals[name] += cumtime if cumulative else tottime
+                break
+    totals["other"] = max(total - sum(totals.values()), 0.0)
+    totals["total"] = total
+    return totals
+
+
+def report(stats, top=20):
+    """Human-readable breakdown and top-N functions by cumulative time."""
+    totals = breakdown(stats)
+    total = totals["total"] or 1.0
+    lines = ["⏱️  Where the time went:"]
+    for name, seconds in totals.items():
+        if name == "total":
+            continue
+        lines.append(f"   {name:<15} {seconds:9.2f}s  {seconds / total:6.1%}")
+    lines.append(f"   {'total':<15} {totals['total']:9.2f}s")
+
+    buf = io.StringIO()
+    stats.stream = buf
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+    lines.append("")
+    lines.append(f"🔝 Top {top} functions by cumulative time:")
+    lines.append(buf.getvalue().strip())
+    return "\n".join(lines)
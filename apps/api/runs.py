@@ -0,0 +1,94 @@
+"""
+Run history: every sync command execution is recorded as a SyncRun with one
+SyncStageRun per stage, carrying timings and the counters collected in a
+StageStats while the stage runs.
+
+A SyncRun opened by sync_all is the "current run" for
+the thread, so stage commands called underneath add their stage to it rather
+than opening runs of their own. When it finishes, the process's metrics are
+flushed to the database (see apps.api.metrics).
+"""
+import contextvars
+import threading
+from contextlib import contextmanager
+
+from django.utils import timezone
+
+from apps.api import metrics, tracing
+from apps.api.models import SyncRun, SyncStageRun
+
+_current_run = contextvars.ContextVar("sync_run", default=None)
+
+
+class StageStats:
+    """Counters for one stage; shared by the stage's HTTP clients."""
+    FIELDS = ("processed", "skipped", "failed", "http_calls", "retries", "bytes_transferred")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Zero the counters in place (the stage's clients keep a reference to this object)."""
+        for field in self.FIELDS:
+            setattr(self, field, 0)
+        self.error = None  # set when the stage swallowed a fatal error
+
+    def incr(self, field, n=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + n)
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+def current_run():
+    return _current_run.get()
+
+
+@contextmanager
+def track_run(command, targeted=False, full=False):
+    """Record a SyncRun around the block, unless one is already open in this thread."""
+    parent = _current_run.get()
+    if parent is not None:
+        yield parent
+        return
+
+    run = SyncRun.objects.create(command=command, targeted=targeted, full=full, started_at=timezone.now())
+    token = _current_run.set(run)
+    try:
+        with tracing.bind(run_id=run.pk):
+            yield run
+        run.status = SyncRun.STATUS_OK
+    except BaseException as e:
+        run.status = SyncRun.STATUS_FAILED
+        run.error = repr(e)
+        raise
+    finally:
+        _current_run.reset(token)
+        run.finished_at = timezone.now()
+        run.save(update_fields=["status", "error", "finished_at"])
+        metrics.flush()
+
+
+@contextmanager
+def track_stage(stage, stats, run=None):
+    """Record a SyncStageRun for `stage` under `run` (default: the current run)."""
+    run = run or _current_run.get()
+    stage_run = SyncStageRun.objects.create(run=run, stage=stage, started_at=timezone.now())
+    try:
+        yield stage_run
+        if stats.error:
+            stage_run.status = SyncRun.STATUS_FAILED
+            stage_run.error = stats.error
+        else:
+            stage_run.status = SyncRun.STATUS_OK
+    except BaseException as e:
+        stage_run.status = SyncRun.STATUS_FAILED
+        stage_run.error = repr(e)
+        raise
+    finally:
+        for field, value in stats.as_dict().items():
+            setattr(stage_run, field, value)
+        stage_run.finished_at = timezone.now()
+        stage_run.save()
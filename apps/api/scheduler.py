@@ -0,0 +1,211 @@
+"""
+Per-stage schedule for `run_sync_daemon --schedule`.
+
+SYNC_SCHEDULE maps a job name to the management command it runs and when:
+
+    "ingest": {"command": "sync_opensolar", "every": 300, "jitter": 30},
+    "full":   {"command": "sync_all", "at": "02:30", "exclusive": True},
+
+    every      seconds between the starts of two runs
+    at         "HH:MM" once a day in TIME_ZONE, instead of `every`
+    jitter     up to this many seconds added at random to each due time, so
+               jobs on the same cadence don't hit OpenSolar/Odoo together
+    catch_up   when a slot was missed (the daemon was down, or the previous
+               run overran): "once" runs as soon as possible, once however
+               many slots went by; "skip" waits for the next slot
+    exclusive  run alone: wait for running jobs to finish and start nothing
+               else until it is done
+    options    keyword options for call_command
+
+At most SYNC_SCHEDULE_MAX_CONCURRENT jobs run at a time, each in its own
+thread, and a job never overlaps itself. Jobs that are held back start in the
+order they fell due. The last run of each job is read from SyncRun /
+SyncStageRun on start-up, so a restart neither reruns everything at once nor
+forgets a nightly pass that fell in the downtime. A job with the "full" option
+only counts --full runs, so an incremental run doesn't stand in for it.
+"""
+import logging
+import math
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.db.models import Max
+from django.utils import timezone
+
+from apps.api.models import SyncRun, SyncStageRun
+
+logger = logging.getLogger(__name__)
+
+CATCH_UP_ONCE = "once"
+CATCH_UP_SKIP = "skip"
+POLL_SECONDS = 1.0  # upper bound on the daemon's sleep, so freed-up slots are noticed quickly
+
+
+class Job:
+    """One SYNC_SCHEDULE entry plus its run state."""
+
+    def __init__(self, name, command, every=None, at=None, jitter=0,
+                 catch_up=CATCH_UP_ONCE, exclusive=False, options=None):
+        where = f"SYNC_SCHEDULE[{name!r}]"
+        if (every is None) == (at is None):
+            raise ImproperlyConfigured(f"{where} needs exactly one of 'every' or 'at'")
+        if catch_up not in (CATCH_UP_ONCE, CATCH_UP_SKIP):
+            raise ImproperlyConfigured(f"{where}: catch_up must be {CATCH_UP_ONCE!r} or {CATCH_UP_SKIP!r}")
+        if every is not None and every <= 0:
+            raise ImproperlyConfigured(f"{where}: 'every' must be a positive number of seconds")
+        try:
+            at = datetime.strptime(at, "%H:%M").time() if at is not None else None
+        except ValueError:
+            raise ImproperlyConfigured(f"{where}: 'at' must look like 'HH:MM', not {at!r}")
+
+        self.name = name
+        self.command = command
+        self.every = timedelta(seconds=every) if every is not None else None
+        self.at = at
+        self.jitter = jitter
+        self.catch_up = catch_up
+        self.exclusive = exclusive
+        self.options = dict(options or {})
+
+        self.last_run = None   # start of the last run, aware datetime
+        self.next_due = None
+        self.running = False
+        self.runs = 0          # runs finished by this process
+
+    def __repr__(self):
+        return f"<Job {self.name}: {self.command} due {self.next_due}>"
+
+    def _daily_slot(self, after):
+        """The first `at` time strictly after `after`."""
+        local = timezone.localtime(after)
+        slot = local.replace(hour=self.at.hour, minute=self.at.minute, second=0, microsecond=0)
+        if slot <= local:
+            slot += timedelta(days=1)
+        return slot
+
+    def schedule(self, now, rng=random):
+        """Set and return `next_due` from `last_run`, applying the catch-up rule and jitter."""
+        if self.every is not None:
+            if self.last_run is None:
+                due = now
+            else:
+                due = self.last_run + self.every
+                if due < now and self.catch_up == CATCH_UP_SKIP:
+                    due = self.last_run + math.ceil((now - self.last_run) / self.every) * self.every
+        else:
+            # A daily job that has never run waits for its first slot.
+            due = self._daily_slot(self.last_run or now)
+            if due < now and self.catch_up == CATCH_UP_SKIP:
+                due = self._daily_slot(now)
+        # With "once" an overdue slot is left in the past, so the job is due straight away.
+        if self.jitter:
+            due += timedelta(seconds=rng.uniform(0, self.jitter))
+        self.next_due = due
+        return due
+
+
+def jobs_from_settings(schedule=None):
+    schedule = getattr(settings, "SYNC_SCHEDULE", {}) if schedule is None else schedule
+    return [Job(name, **spec) for name, spec in schedule.items()]
+
+
+def last_run_at(command, full=False):
+    """
+    Start of the latest whole-table run of `command`, on its own or as a
+    sync_all stage. With `full` only --full runs count, so an incremental
+    run doesn't stand in for a missed full one.
+    """
+    runs = SyncRun.objects.filter(command=command, targeted=False)
+    stages = SyncStageRun.objects.filter(stage=command, run__targeted=False)
+    if full:
+        runs, stages = runs.filter(full=True), stages.filter(run__full=True)
+    last = [qs.aggregate(last=Max("started_at"))["last"] for qs in (runs, stages)]
+    return max(filter(None, last), default=None)
+
+
+class Scheduler:
+    """
+    Starts due jobs in threads within the concurrency limits.
+
+    `runner(job)` does the work; `on_finish(job, elapsed, error)`, if given,
+    is called after the job has been rescheduled.
+    """
+
+    def __init__(self, jobs, runner, max_concurrent=1, on_finish=None, clock=timezone.now, rng=None):
+        self.jobs = list(jobs)
+        self.runner = runner
+        self.max_concurrent = max(1, max_concurrent)
+        self.on_finish = on_finish
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._threads = {}
+
+    def start(self, history=True):
+        """Schedule every job, from its SyncRun history unless `history` is False."""
+        now = self.clock()
+        for job in self.jobs:
+            if history:
+                job.last_run = last_run_at(job.command, full=bool(job.options.get("full")))
+            job.schedule(now, self.rng)
+
+    def run_pending(self):
+        """Start the due jobs the limits allow and return them."""
+        started = []
+        with self._lock:
+            now = self.clock()
+            due = sorted((j for j in self.jobs if not j.running and j.next_due <= now),
+                         key=lambda j: j.next_due)
+            for job in due:
+                running = [j for j in self.jobs if j.running]
+                # Stop at the first job that can't start, so later ones don't starve it.
+                if (len(running) >= self.max_concurrent or any(j.exclusive for j in running)
+                        or (job.exclusive and running)):
+                    break
+                job.running = True
+                job.last_run = now
+                thread = threading.Thread(target=self._run, args=(job,), name=f"sync-{job.name}", daemon=True)
+                self._threads[job.name] = thread
+                thread.start()
+                started.append(job)
+        return started
+
+    def _run(self, job):
+        started = time.monotonic()
+        error = None
+        try:
+            self.runner(job)
+        except Exception as e:
+            error = e
+            logger.exception("Scheduled job %s failed", job.name)
+        finally:
+            connections.close_all()  # this thread's connections only
+            with self._lock:
+                job.running = False
+                job.runs += 1
+                job.schedule(self.clock(), self.rng)
+                self._threads.pop(job.name, None)
+        if self.on_finish:
+            self.on_finish(job, time.monotonic() - started, error)
+
+    def seconds_until_next(self):
+        waiting = [j.next_due for j in self.jobs if not j.running]
+        if not waiting:
+            return POLL_SECONDS
+        return max(0.0, (min(waiting) - self.clock()).total_seconds())
+
+    def serve(self, stop):
+        """Run jobs as they fall due until `stop` is set, then wait for the running ones."""
+        while not stop.is_set():
+            self.run_pending()
+            stop.wait(min(self.seconds_until_next(), POLL_SECONDS))
+        self.join()
+
+    def join(self):
+        for thread in list(self._threads.values()):
+            thread.join()
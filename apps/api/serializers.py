@@ -1,19 +1,78 @@
-
 from rest_framework import serializers
 
-class OpenSolarProjectSerializer(serializers.Serializer):
-    name = serializers.CharField()
-    address = serializers.CharField()
-    city = serializers.CharField()
-    state = serializers.CharField()
-    postal_code = serializers.CharField()
-    country = serializers.CharField(default="USA")
-    customer_email = serializers.EmailField(required=False, allow_null=True)
-    customer_first_name = serializers.CharField(required=False, allow_blank=True, allow_null=True)
-    customer_last_name = serializers.CharField(required=False, allow_blank=True, allow_null=True)
-    phone_number = serializers.CharField(required=False, allow_blank=True, allow_null=True)
-    project_stage = serializers.CharField(required=False, allow_blank=True, allow_null=True)
-    utility_provider = serializers.CharField(required=False, allow_blank=True, allow_null=True)
-    utility_rate = serializers.CharField(required=False, allow_blank=True, allow_null=True)
-    sales_rep_id = serializers.CharField(required=False, allow_blank=True, allow_null=True)
-    notes = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+from apps.api.models import OpenSolarCustomer, OpenSolarProject, OpenSolarProposal
+
+
+def requested_fields(request):
+    """The set of names in ?fields=a,b,c, or None when every field is wanted."""
+    raw = request.query_params.get("fields") if request is not None else None
+    if not raw:
+        return None
+    return {name.strip() for name in raw.split(",") if name.strip()}
+
+
+class DynamicFieldsMixin:
+    """Drops the top-level fields not listed in the request's ?fields=."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        wanted = requested_fields(self.context.get("request"))
+        if wanted is not None:
+            for name in set(self.fields) - wanted:
+                self.fields.pop(name)
+
+
+class ComponentSerializer(serializers.Serializer):
+    manufacturer_name = serializers.CharField()
+    code = serializers.CharField()
+    quantity = serializers.IntegerField()
+
+
+class CustomerSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OpenSolarCustomer
+        fields = ["external_id", "name", "email"]
+
+
+class ProposalSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OpenSolarProposal
+        fields = ["external_id", "title", "pdf_url", "price", "system_size_kw", "updated_at"]
+
+
+class OpenSolarProjectSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    customer = CustomerSummarySerializer(read_only=True)
+    proposals = ProposalSummarySerializer(many=True, read_only=True)
+    modules = ComponentSerializer(many=True, read_only=True)
+    inverters = ComponentSerializer(many=True, read_only=True)
+    batteries = ComponentSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = OpenSolarProject
+        fields = [
+            "external_id", "name", "status", "project_type", "created_at", "updated_at",
+            "system_size_kw", "system_output_kwh", "battery_size_kwh", "price_including_tax",
+            "share_link", "deleted_at", "customer", "proposals", "modules", "inverters", "batteries",
+        ]
+
+
+class OpenSolarCustomerSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    projects = serializers.SlugRelatedField(many=True, read_only=True, slug_field="external_id")
+
+    class Meta:
+        model = OpenSolarCustomer
+        fields = [
+            "external_id", "name", "email", "phone", "address", "city", "state", "zip_code",
+            "updated_at", "projects",
+        ]
+
+
+class OpenSolarProposalSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    project = serializers.SlugRelatedField(read_only=True, slug_field="external_id")
+
+    class Meta:
+        model = OpenSolarProposal
+        fields = [
+            "external_id", "project", "title", "pdf_url", "proposal_link", "created_at",
+            "system_size_kw", "system_output_kwh", "price", "battery_size_kwh", "updated_at",
+        ]
@@ -1,3 +1,833 @@
-from django.test import TestCase
+import json
+import os
+import signal
+import threading
+from datetime import timedelta
+import tempfile
+import xmlrpc.client
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.api import backfill, circuit, concurrency, metrics, profiling, scheduler, tracing, webhooks
+from apps.api.conf import sync_settings
+from apps.api.fakes.odoo import FakeOdoo
+from apps.api.fakes.opensolar import FakeOpenSolar, Fleet
+from apps.api.fakes.transport import WSGIAdapter, serve
+from apps.api.opensolar import OpenSolarClient
+from apps.api.locks import lock_key, SyncAlreadyRunning
+from apps.api.management.base import SyncCommand
+from apps.api.models import (
+    MetricTotal, PendingProjectSync, OpenSolarBattery, OpenSolarCustomer, OpenSolarInverter, OpenSolarProject,
+    OpenSolarModule, OpenSolarProjectPayload, OpenSolarProposal, SyncFailure, SyncRun, SyncStageRun,
+)
+from utils import odoo_sync
+
+# Every credential apps.api.conf requires, so no test depends on the environment or .env.
+SYNC_CREDENTIALS = dict(
+    OPENSOLAR_API_TOKEN="1", OPENSOLAR_ORG_ID="1",
+    ODOO_URL="http://odoo.test", ODOO_DB="db", ODOO_API_USERNAME="sync@example.com", ODOO_API_TOKEN="t",
+)
+
+
+class LockKeyTests(SimpleTestCase):
+    def test_keys_are_signed_int4_and_stable(self):
+        for name in ("sync_all", "sync_opensolar", "sync_contacts_to_odoo"):
+            classid, objid = lock_key(name)
+            self.assertEqual(lock_key(name), (classid, objid))
+            self.assertTrue(-2**31 <= classid < 2**31)
+            self.assertTrue(-2**31 <= objid < 2**31)
+        self.assertNotEqual(lock_key("sync_all"), lock_key("sync_opensolar"))
+
+
+class SingleFlightCommandTests(TestCase):
+    def test_second_trigger_exits_with_clear_status(self):
+        def busy(name, attach=False):
+            raise SyncAlreadyRunning(name)
+
+        with mock.patch("apps.api.management.base.single_flight", busy), \
+                self.assertRaisesMessage(CommandError, "sync_projects_to_odoo is already running"):
+            call_command("sync_projects_to_odoo", stdout=StringIO())
+
+    @override_settings(SYNC_SECRET="k")
+    def test_view_runs_the_command_and_maps_busy_to_409(self):
+        def busy(attach=False):
+            raise SyncAlreadyRunning("sync_all")
+
+        with mock.patch("apps.api.management.commands.sync_all.pipeline_lock", busy):
+            response = self.client.get("/api/sync-all/", {"key": "k"})
+        self.assertEqual(response.status_code, 409)
+
+        with mock.patch("apps.api.management.commands.sync_all.run_pipeline") as pipeline, \
+                redirect_stdout(StringIO()):
+            response = self.client.get("/api/sync-all/", {"key": "k", "mode": "pipeline", "full": "1"})
+        self.assertEqual(response.json(), {"status": "ok"})
+        self.assertTrue(pipeline.call_args.kwargs["full"])
+        self.assertEqual(SyncRun.objects.get().command, "sync_all")
+
+
+@override_settings(OPENSOLAR_WEBHOOK_SECRET="s3cret", WEBHOOK_COALESCE_SECONDS=10)
+@mock.patch("apps.api.webhooks.kick")
+class OpenSolarWebhookTests(TestCase):
+    url = "/api/webhooks/opensolar/"
+
+    def post(self, payload, secret="s3cret"):
+        body = json.dumps(payload).encode()
+        return self.client.post(
+            self.url, body, content_type="application/json",
+            HTTP_X_OPENSOLAR_SIGNATURE=webhooks.sign(body, secret),
+        )
+
+    def test_rejects_bad_signature(self, kick):
+        resp = self.post({"model": "Project", "object_id": 7}, secret="wrong")
+        self.assertEqual(resp.status_code, 403)
+        self.assertFalse(PendingProjectSync.objects.exists())
+
+    def test_burst_for_one_project_is_coalesced(self, kick):
+        for _ in range(5):
+            self.assertEqual(self.post({"model": "Project", "object_id": 7}).status_code, 202)
+        self.post({"model": "Project", "object_id": 8})
+
+        self.assertEqual(PendingProjectSync.objects.count(), 2)
+        self.assertEqual(PendingProjectSync.objects.get(external_id="7").event_count, 5)
+        kick.assert_called()
+
+    def test_non_project_event_is_ignored(self, kick):
+        resp = self.post({"model": "Org", "object_id": 1})
+        self.assertEqual(resp.json()["status"], "ignored")
+
+    def test_due_projects_are_synced_once(self, kick):
+        now = timezone.now()
+        webhooks.enqueue("7", now=now)
+        webhooks.enqueue("7", now=now + timedelta(seconds=5))
+
+        with mock.patch("apps.api.webhooks.sync_single_project") as sync:
+            self.assertEqual(webhooks.process_pending(now=now + timedelta(seconds=11)), 0)
+            self.assertEqual(webhooks.process_pending(now=now + timedelta(seconds=16)), 1)
+        sync.assert_called_once_with("7", None, None)
+        self.assertFalse(PendingProjectSync.objects.exists())
+
+    def test_failed_sync_stays_queued_with_backoff(self, kick):
+        now = timezone.now()
+        webhooks.enqueue("7", now=now)
+        later = now + timedelta(seconds=11)
+
+        with mock.patch("apps.api.webhooks.sync_single_project", side_effect=requests.ConnectionError("down")):
+            self.assertEqual(webhooks.process_pending(now=later), 0)
+        pending = PendingProjectSync.objects.get(external_id="7")
+        self.assertEqual(pending.attempts, 1)
+        self.assertIn("ConnectionError", pending.last_error)
+        self.assertEqual(pending.due_at, later + timedelta(seconds=webhooks.RETRY_BASE_SECONDS))
+
+        with mock.patch("apps.api.webhooks.sync_single_project") as sync:
+            self.assertEqual(webhooks.process_pending(now=later + timedelta(seconds=30)), 0)
+            self.assertEqual(webhooks.process_pending(now=pending.due_at), 1)
+        sync.assert_called_once_with("7", None, None)
+        self.assertFalse(PendingProjectSync.objects.exists())
+
+    def test_event_during_sync_keeps_the_row(self, kick):
+        now = timezone.now()
+        webhooks.enqueue("7", now=now)
+
+        def sync(external_id, stdout, stderr):
+            webhooks.enqueue(external_id, now=now + timedelta(seconds=12))
+
+        with mock.patch("apps.api.webhooks.sync_single_project", side_effect=sync):
+            self.assertEqual(webhooks.process_pending(now=now + timedelta(seconds=11)), 1)
+        self.assertEqual(PendingProjectSync.objects.get(external_id="7").event_count, 2)
+
+    def test_opensolar_outage_is_retried_but_a_deleted_project_is_not(self, kick):
+        app = FakeOpenSolar(Fleet(3, seed=1), error_500=1.0)
+        server, url = serve(app)
+        self.addCleanup(server.shutdown)
+        self.addCleanup(circuit.reset)
+        pid = str(app.fleet.ids()[0])
+        now = timezone.now()
+        webhooks.enqueue(pid, now=now)
+
+        with override_settings(OPENSOLAR_BASE_URL=f"{url}/api", OPENSOLAR_GET_DELAY=0, **SYNC_CREDENTIALS):
+            self.assertEqual(webhooks.process_pending(now=now + timedelta(seconds=11), stdout=StringIO()), 0)
+            pending = PendingProjectSync.objects.get(external_id=pid)
+            self.assertEqual(pending.attempts, 1)
+            self.assertIn("OpenSolarUnavailable", pending.last_error)
+
+            app.error_500 = 0.0
+            app.fleet.deleted.add(int(pid))  # a 404 now: gone, nothing left to retry
+            self.assertEqual(webhooks.process_pending(now=pending.due_at, stdout=StringIO()), 1)
+        self.assertFalse(PendingProjectSync.objects.exists())
+
+
+class TargetedSyncTests(TestCase):
+    def test_ids_from_options_and_file(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as fh:
+            fh.write("101\n# fixed by support\n102, 103\n\n")
+        targets = SyncCommand().get_targets({
+            "project_id": ["100", "101"], "project_id_file": fh.name, "customer_id": [],
+        })
+        self.assertEqual(targets.project_ids, {"100", "101", "102", "103"})
+        self.assertEqual(targets.customer_ids, set())
+        self.assertIsNone(SyncCommand().get_targets({"project_id": [], "customer_id": []}))
+
+    def test_projects_push_only_touches_targets(self):
+        cust = OpenSolarCustomer.objects.create(external_id="9", name="Cust")
+        for pid in ("1", "2", "3"):
+            OpenSolarProject.objects.create(external_id=pid, name=f"P{pid}", customer=cust if pid == "3" else None)
+
+        pushed = []
+        with mock.patch("apps.api.management.commands.sync_projects_to_odoo.Command._authenticate", return_value=1), \
+             mock.patch("apps.api.management.commands.sync_projects_to_odoo.Command.prepare_project",
+                        lambda self, proj: pushed.append(proj.external_id)):
+            call_command("sync_projects_to_odoo", project_id=["1"], customer_id=["9"], stdout=StringIO())
+        self.assertEqual(sorted(pushed), ["1", "3"])
+
+
+class RunHistoryTests(TestCase):
+    def test_stage_run_records_counters(self):
+        OpenSolarProject.objects.create(external_id="1", name="No customer")
+        with mock.patch("apps.api.management.commands.sync_projects_to_odoo.Command._authenticate", return_value=1):
+            call_command("sync_projects_to_odoo", stdout=StringIO(), stderr=StringIO())
+
+        run = SyncRun.objects.get()
+        self.assertEqual((run.command, run.status), ("sync_projects_to_odoo", SyncRun.STATUS_OK))
+        stage = run.stages.get()
+        self.assertEqual((stage.stage, stage.skipped, stage.processed), ("sync_projects_to_odoo", 1, 0))
+        self.assertIsNotNone(stage.finished_at)
+
+
+class TracingTests(SimpleTestCase):
+    def setUp(self):
+        self.exporter = tracing.MemoryExporter()
+        self.previous = tracing.set_exporter(self.exporter)
+
+    def tearDown(self):
+        tracing.set_exporter(self.previous)
+
+    def test_opensolar_get_records_one_span_with_retries(self):
+        responses = [mock.Mock(status_code=429, content=b"", raise_for_status=mock.Mock(
+                         side_effect=requests.HTTPError("429"))),
+                     mock.Mock(status_code=200, content=b'{"id": 5}', json=lambda: {"id": 5},
+                               raise_for_status=lambda: None)]
+        client = OpenSolarClient("t", "1", warn=lambda msg: None)
+        client.GET_DELAY = 0
+        client.session.get = mock.Mock(side_effect=responses)
+
+        with tracing.bind(run_id=3, project_id="5"):
+            self.assertEqual(client.get_project(5), {"id": 5})
+
+        span, = self.exporter.spans
+        self.assertEqual(span["endpoint"], "GET /projects/{id}/")
+        self.assertEqual((span["status"], span["retries"], span["bytes"]), (200, 1, 9))
+        self.assertEqual((span["run_id"], span["project_id"]), (3, "5"))
+        self.assertIn("latency_ms", span)
+
+
+@override_settings(SYNC_SECRET="s3cret")
+class MetricsEndpointTests(TestCase):
+    def setUp(self):
+        for metric in metrics.REGISTRY:  # counts left over from other tests
+            metric.values.clear()
+
+    def test_requires_key(self):
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 403)
+
+    def test_exposes_call_and_run_series(self):
+        with tracing.span("odoo", "res.partner.search_read"):
+            pass
+        run = SyncRun.objects.create(command="sync_all", started_at=timezone.now())
+        SyncStageRun.objects.create(run=run, stage="sync_opensolar", status=SyncRun.STATUS_OK,
+                                    started_at=timezone.now(), finished_at=timezone.now(), processed=4)
+
+        resp = self.client.get("/api/metrics/", HTTP_AUTHORIZATION="Bearer s3cret")
+        body = resp.content.decode()
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('opensolar_sync_odoo_rpc_total{model="res.partner",method="search_read"}', body)
+        self.assertIn('opensolar_sync_http_request_duration_seconds_count{system="odoo",'
+                      'endpoint="res.partner.search_read"}', body)
+        self.assertIn('opensolar_sync_last_success_timestamp_seconds{stage="sync_opensolar"}', body)
+        self.assertIn('opensolar_sync_stage_records_total{stage="sync_opensolar",outcome="processed"} 4.0', body)
+
+    def test_totals_add_up_across_processes(self):
+        # What a cron run in another process flushed before this scrape.
+        MetricTotal.objects.create(name="opensolar_sync_projects_ingested_total", labels="[]",
+                                   value=40, updated_at=timezone.now())
+        MetricTotal.objects.create(name="opensolar_sync_circuit_trips_total", labels='["odoo"]',
+                                   value=1, updated_at=timezone.now())
+        metrics.PROJECTS_INGESTED.inc(2)
+        metrics.flush()
+        metrics.PROJECTS_INGESTED.inc(3)
+        metrics.CONCURRENCY_LIMIT.set(6, system="odoo")
+        with tracing.span("opensolar", "GET /projects/"):
+            pass
+        metrics.flush()
+        with tracing.span("opensolar", "GET /projects/"):
+            pass
+
+        body = self.client.get("/api/metrics/", {"key": "s3cret"}).content.decode()
+        self.assertIn("opensolar_sync_projects_ingested_total 45.0", body)
+        self.assertIn('opensolar_sync_circuit_trips_total{system="odoo"} 1.0', body)
+        self.assertIn('opensolar_sync_concurrency_limit{system="odoo"} 6.0', body)
+        self.assertIn('opensolar_sync_http_request_duration_seconds_count{system="opensolar",'
+                      'endpoint="GET /projects/"} 2', body)
+        self.assertIn('opensolar_sync_http_request_duration_seconds_bucket{system="opensolar",'
+                      'endpoint="GET /projects/",le="+Inf"} 2', body)
+
+
+@override_settings(OPENSOLAR_GET_DELAY=0, **SYNC_CREDENTIALS)
+class FakeOpenSolarTests(TestCase):
+    def setUp(self):
+        self.app = FakeOpenSolar(Fleet(45, seed=7))
+
+    def sync(self, **options):
+        from apps.api.management.commands.sync_opensolar import Command
+        command = Command(stdout=StringIO(), stderr=StringIO())
+        command.client.session.mount(command.client.base, WSGIAdapter(self.app))
+        command.run(**options)
+        return command
+
+    def test_full_ingest_against_fake_fleet(self):
+        command = self.sync(full=True)
+        self.assertEqual(command.stats.processed, 45)
+        self.assertEqual(OpenSolarProject.objects.count(), 45)
+        self.assertTrue(OpenSolarProposal.objects.exists())
+        self.assertEqual(self.app.calls["/projects/"], 2 + 4)  # the id pass, then 3 full pages + the empty one
+
+    def test_id_listing_fetches_only_changes_and_tombstones_deletions(self):
+        self.sync()
+        self.assertEqual(OpenSolarProject.objects.exclude(remote_modified_at=None).count(), 45)
+        self.app.calls.clear()
+
+        changed = self.app.fleet.change(0.1, seed=1)
+        deleted = self.app.fleet.delete(0.05, seed=2)
+        command = self.sync()
+
+        refetched = set(changed) - set(deleted)
+        self.assertEqual(self.app.calls["/projects/"], 2)  # one id-only page for the whole org, then the empty one
+        self.assertEqual(self.app.calls["/projects/{id}/"], len(refetched))
+        self.assertEqual(command.stats.processed, len(refetched))
+        self.assertEqual(command.stats.skipped, 45 - len(deleted) - len(refetched))
+        tombstoned = set(OpenSolarProject.objects.exclude(deleted_at=None).values_list("external_id", flat=True))
+        self.assertEqual(tombstoned, {str(pid) for pid in deleted})
+
+        self.app.fleet.deleted.clear()  # restored in OpenSolar
+        self.app.calls.clear()
+        self.sync()
+        self.assertEqual(self.app.calls["/projects/{id}/"], len(deleted))
+        self.assertFalse(OpenSolarProject.objects.exclude(deleted_at=None).exists())
+
+    def test_capped_id_pages_are_read_to_the_end(self):
+        self.sync()
+        self.app.max_page_size = 10  # the server quietly ignores limit=1000
+        deleted = self.app.fleet.delete(0.05, seed=2)
+        self.app.calls.clear()
+        self.sync()
+
+        self.assertEqual(self.app.calls["/projects/"], 5)  # 4 pages of 10, then the short one
+        tombstoned = set(OpenSolarProject.objects.exclude(deleted_at=None).values_list("external_id", flat=True))
+        self.assertEqual(tombstoned, {str(pid) for pid in deleted})
+
+    def test_listing_count_decides_completeness(self):
+        from apps.api.management.commands.sync_opensolar import Command
+        command = Command(stdout=StringIO(), stderr=StringIO())
+        pages = {1: {"count": 3, "projects": [{"id": 1}, {"id": 2}]}, 2: None}
+        with mock.patch.object(OpenSolarClient, "list_project_ids", side_effect=pages.get):
+            remote, complete = command.list_remote_ids()
+        self.assertEqual(set(remote), {"1", "2"})
+        self.assertFalse(complete)
+
+    def test_mass_disappearance_needs_full(self):
+        self.sync()
+        deleted = self.app.fleet.delete(0.4, seed=2)
+        self.sync()
+        self.assertFalse(OpenSolarProject.objects.exclude(deleted_at=None).exists())
+
+        self.sync(full=True)
+        tombstoned = set(OpenSolarProject.objects.exclude(deleted_at=None).values_list("external_id", flat=True))
+        self.assertEqual(tombstoned, {str(pid) for pid in deleted})
+
+    def test_stored_payload_remaps_to_the_ingested_rows(self):
+        self.sync()
+        project = OpenSolarProject.objects.exclude(battery_size_kwh=None).first()
+        payload = project.payload
+
+        rows = backfill.normalize(payload.detail, payload.detail, payload.systems, payload.activations)
+
+        remapped, = rows[OpenSolarProject]
+        self.assertEqual((remapped["name"], remapped["share_link"]), (project.name, project.share_link))
+        self.assertEqual(remapped["battery_size_kwh"], float(project.battery_size_kwh))
+        self.assertEqual(len(rows[OpenSolarInverter]), project.inverters.count())
+
+    def test_remap_keeps_tombstones(self):
+        self.sync()
+        project = OpenSolarProject.objects.first()
+        deleted_at = timezone.now()
+        OpenSolarProject.objects.filter(pk=project.pk).update(deleted_at=deleted_at)
+
+        call_command("remap", stdout=StringIO(), stderr=StringIO())
+        project.refresh_from_db()
+        self.assertEqual(project.deleted_at, deleted_at)
+
+    def test_injected_errors(self):
+        self.app.error_500 = 1.0
+        command = self.sync(full=True)
+        self.assertEqual(command.stats.processed, 0)
+        self.assertEqual(self.app.statuses[500], 2)  # the id pass and the first listing page
+
+
+@override_settings(**SYNC_CREDENTIALS)
+class FakeOdooTests(TestCase):
+    def setUp(self):
+        self.app = FakeOdoo()
+
+    def push(self, name):
+        from importlib import import_module
+        command = import_module(f"apps.api.management.commands.{name}").Command(
+            stdout=StringIO(), stderr=StringIO())
+        command.odoo.session.mount(command.odoo.url, WSGIAdapter(self.app))
+        command.run()
+        return command
+
+    def test_contacts_then_projects(self):
+        customer = OpenSolarCustomer.objects.create(external_id="77", name="Ada", email="ada@example.com", state="CA")
+        OpenSolarProject.objects.create(external_id="9", name="Roof", customer=customer,
+                                        share_link="https://app.opensolar.com/share/9")
+
+        self.assertEqual(self.push("sync_contacts_to_odoo").stats.processed, 1)
+        self.assertEqual(self.push("sync_projects_to_odoo").stats.processed, 1)
+
+        partner, = self.app.records["res.partner"].values()
+        project, = self.app.records["x_projects"].values()
+        self.assertEqual(partner["x_studio_opensolar_external_id"], 77)
+        self.assertEqual(project["x_studio_partner_id"], partner["id"])
+        self.assertEqual(self.app.calls["res.partner.create"], 1)
+
+    def test_partner_cache_and_locks_last_one_run(self):
+        customer = OpenSolarCustomer.objects.create(external_id="77", name="Ada", email="ada@example.com", state="CA")
+        OpenSolarProject.objects.create(external_id="9", name="Roof", customer=customer,
+                                        share_link="https://app.opensolar.com/share/9")
+        self.push("sync_contacts_to_odoo")
+        command = self.push("sync_projects_to_odoo")
+        self.assertEqual(len(command._partners), 1)
+        self.assertEqual(len(command._dedupe_locks), 0)  # released keys are dropped
+
+        with mock.patch.object(command, "run"):
+            call_command(command, stdout=StringIO())  # the next daemon cycle
+        self.assertEqual(command._partners, {})
+
+    def test_open_circuit_ends_the_run(self):
+        for n in range(20):
+            OpenSolarCustomer.objects.create(external_id=str(n), name=f"C{n}", email=f"c{n}@example.com")
+        calls = []
+
+        def outage(environ, start_response):
+            calls.append(environ["PATH_INFO"])
+            start_response("503 Service Unavailable", [("Content-Type", "text/plain")])
+            return [b"down"]
+
+        self.addCleanup(circuit.reset)
+        self.addCleanup(concurrency.reset)
+        circuit.reset()
+        concurrency.reset()
+        one_at_a_time = override_settings(SYNC_CONCURRENCY={"odoo": {"max_limit": 1}})
+        one_at_a_time.enable()
+        self.addCleanup(one_at_a_time.disable)
+        from importlib import import_module
+        command = import_module("apps.api.management.commands.sync_contacts_to_odoo").Command(
+            stdout=StringIO(), stderr=StringIO())
+        command.odoo.session.mount(command.odoo.url, WSGIAdapter(outage))
+        command._uid = 1  # logged in before Odoo went away
+        command.run()
+
+        self.assertEqual(len(calls), circuit.FAILURES)
+        self.assertEqual(command.stats.failed, circuit.FAILURES)
+        self.assertIn("circuit is open", command.stats.error)
+
+    def test_skipped_projects_are_dead_lettered_and_retried(self):
+        customer = OpenSolarCustomer.objects.create(external_id="77", name="Ada", email="ada@example.com", state="CA")
+        project = OpenSolarProject.objects.create(external_id="9", name="Roof", customer=customer)
+        self.push("sync_contacts_to_odoo")
+        self.push("sync_projects_to_odoo")
+        self.push("sync_projects_to_odoo")
+
+        failure = SyncFailure.objects.get(stage="sync_projects_to_odoo", external_id="9")
+        self.assertEqual((failure.error_class, failure.attempts), ("MissingShareLink", 2))
+        self.assertGreater(failure.next_retry_at - failure.last_failed_at, timedelta(minutes=9))
+
+        project.share_link = "https://app.opensolar.com/share/9"
+        project.save()
+        server, url = serve(self.app)
+        self.addCleanup(server.shutdown)
+        with override_settings(ODOO_URL=url):
+            call_command("retry_failures", stdout=StringIO(), stderr=StringIO())
+            self.assertTrue(SyncFailure.objects.exists())  # not due yet
+            call_command("retry_failures", all=True, stdout=StringIO(), stderr=StringIO())
+
+        self.assertFalse(SyncFailure.objects.exists())
+        self.assertEqual(len(self.app.records["x_projects"]), 1)
+
+    def test_failures_of_tombstoned_projects_are_dropped(self):
+        OpenSolarProject.objects.create(external_id="9", name="Roof", deleted_at=timezone.now())
+        now = timezone.now()
+        SyncFailure.objects.create(stage="sync_projects_to_odoo", external_id="9", error_class="MissingShareLink",
+                                   first_failed_at=now, last_failed_at=now, next_retry_at=now)
+        with mock.patch("apps.api.management.commands.retry_failures.call_command") as retry:
+            call_command("retry_failures", stdout=StringIO(), stderr=StringIO())
+        retry.assert_not_called()
+        self.assertFalse(SyncFailure.objects.exists())
+
+    def test_domains_and_batch_create_over_xmlrpc(self):
+        server, url = serve(self.app)
+        self.addCleanup(server.shutdown)
+        uid = xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/common").authenticate("db", "bot", "pw", {})
+        models = xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/object")
+
+        ids = models.execute_kw("db", uid, "pw", "res.partner", "create",
+                                [[{"name": "A", "email": "a@x.io"}, {"name": "B", "email": ""}]])
+        self.assertEqual(len(ids), 2)
+        self.assertEqual(models.execute_kw("db", uid, "pw", "res.partner", "search",
+                                           [["|", ["email", "=", False], ["name", "ilike", "a"]]]), ids)
+        self.assertEqual(models.execute_kw("db", uid, "pw", "res.partner", "search",
+                                           [[["email", "=", "a@x.io"]]], {"limit": 1}), ids[:1])
+
+
+class SyncSettingsTests(SimpleTestCase):
+    def test_resolved_on_first_use_and_reset_by_override(self):
+        with override_settings(ODOO_URL="http://odoo.test"):
+            self.assertEqual(sync_settings.ODOO_URL, "http://odoo.test")
+        with override_settings(ODOO_URL=""):
+            with self.assertRaises(ImproperlyConfigured):
+                sync_settings.ODOO_URL
+
+
+class OdooConnectionTests(SimpleTestCase):
+    def setUp(self):
+        self.app = FakeOdoo()
+        session = requests.Session()
+        session.mount("http://odoo.test", WSGIAdapter(self.app))
+        self.conn = odoo_sync.OdooConnection("http://odoo.test", "db", "bot", "pw", session=session)
+
+    def test_logs_in_lazily_once_and_again_when_rejected(self):
+        self.assertEqual(self.app.total_calls, 0)
+        self.conn.execute_kw("res.country", "search", [[["code", "=", "US"]]])
+        self.conn.execute_kw("res.country", "search", [[["code", "=", "CA"]]])
+        self.assertEqual(self.app.calls["common.authenticate"], 1)
+
+        self.conn._uid = 99  # e.g. the API user was re-created
+        self.assertEqual(self.conn.execute_kw("res.country", "search", [[["code", "=", "US"]]]), [233])
+        self.assertEqual(self.app.calls["common.authenticate"], 2)
+
+    def test_payload_push_uses_the_shared_connection(self):
+        previous = odoo_sync.set_connection(self.conn)
+        self.addCleanup(odoo_sync.set_connection, previous)
+        with redirect_stdout(StringIO()):
+            result = odoo_sync.sync_opensolar_payload_to_odoo({
+                "customer_name": "Ada", "email": "ada@example.com", "external_id": "os-42",
+                "address": {"country": "United States"},
+            })
+        self.assertEqual(self.app.records["x_projects"][result["project_id"]]["x_studio_opensolar_id"], 42)
+
+
+class GenerateFleetTests(TestCase):
+    def test_generates_linked_records(self):
+        call_command("generate_fleet", "30", "--batch-size", "7", stdout=StringIO())
+        self.assertEqual(OpenSolarProject.objects.count(), 30)
+        self.assertEqual(OpenSolarProject.objects.filter(customer__isnull=True).count(), 0)
+        self.assertGreaterEqual(OpenSolarProposal.objects.count(), 30)
+        self.assertLess(OpenSolarCustomer.objects.count(), 30)  # some customers own several projects
+
+
+class BackfillNormalizeTests(SimpleTestCase):
+    def test_rows_match_per_row_ingest_rules(self):
+        summary = {"id": 5, "title": "Roof", "stage": 2, "contacts_data": [{"id": 9, "display": "Ada"}]}
+        detail = {"share_link": "https://x/5", "proposals": [{"id": 51, "price_including_tax": 900}]}
+        systems = [{
+            "kw_stc": 6.5, "price_including_tax": None,
+            "modules": [{"code": "M", "quantity": 20}],
+            "inverters": [{"code": "MICRO", "inverter_activation_id": 1},
+                          {"code": "LOST", "inverter_activation_id": 2}],
+            "batteries": [{"code": "PW", "quantity": 1}, {"code": "PW", "quantity": 1}],
+        }]
+        activations = {"1": {"data": json.dumps({"microinverter": "Y"})}}
+
+        rows = backfill.normalize(summary, detail, systems, activations)
+
+        project, = rows[OpenSolarProject]
+        self.assertEqual((project["parent_external_id"], project["price_including_tax"]), ("9", 900))
+        self.assertEqual(rows[OpenSolarCustomer][0]["name"], "Ada")
+        self.assertEqual([(i["code"], i["quantity"]) for i in rows[OpenSolarInverter]], [("MICRO", 20)])
+        self.assertEqual(len(rows[OpenSolarBattery]), 1)
+        self.assertEqual(rows[OpenSolarProjectPayload][0]["activations"], activations)
+        self.assertEqual(backfill._copy_value("a\tb\n"), "a\\tb\\n")
+
+
+class AdminChangelistQueryTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+
+    def queries_for(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_component_and_project_lists_do_not_grow_with_rows(self):
+        call_command("generate_fleet", "3", stdout=StringIO())
+        few = {url: self.queries_for(url) for url in ("/admin/api/opensolarmodule/", "/admin/api/opensolarproject/")}
+        call_command("generate_fleet", "30", "--seed", "1", "--clear", stdout=StringIO())
+        for url, n in few.items():
+            self.assertEqual(self.queries_for(url), n, url)
+
+    def test_components_are_searchable_by_code_and_manufacturer(self):
+        call_command("generate_fleet", "5", stdout=StringIO())
+        module = OpenSolarModule.objects.select_related("project").first()
+        for term in (module.code.lower(), module.manufacturer_name, module.project.name):
+            response = self.client.get("/admin/api/opensolarmodule/", {"q": term})
+            self.assertContains(response, module.code)
+        response = self.client.get("/admin/api/opensolarmodule/", {"q": "no such part"})
+        self.assertContains(response, "0 results")
+
+
+@override_settings(SYNC_SECRET="s3cret")
+class ReadApiTests(TestCase):
+    auth = {"HTTP_AUTHORIZATION": "Bearer s3cret"}
+
+    def setUp(self):
+        call_command("generate_fleet", "5", stdout=StringIO())
+
+    def test_requires_key(self):
+        self.assertEqual(self.client.get("/api/projects/").status_code, 403)
+
+    def test_keyset_pages_and_field_selection(self):
+        resp = self.client.get("/api/projects/?page_size=2&fields=external_id,customer", **self.auth)
+        body = resp.json()
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(set(body["results"][0]), {"external_id", "customer"})
+        self.assertIn("cursor=", body["next"])
+
+        seen = [p["external_id"] for p in body["results"]]
+        while body["next"]:
+            body = self.client.get(body["next"], **self.auth).json()
+            seen += [p["external_id"] for p in body["results"]]
+        self.assertEqual(sorted(seen), sorted(OpenSolarProject.objects.values_list("external_id", flat=True)))
+
+    def test_unrequested_relations_are_not_loaded(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/api/projects/?fields=external_id,name", **self.auth)
+        self.assertEqual(len(ctx.captured_queries), 2)  # ETag aggregate + page
+
+    def test_etag_gives_304_until_a_row_changes(self):
+        project = OpenSolarProject.objects.first()
+        for url in ("/api/projects/", f"/api/projects/{project.external_id}/"):
+            etag = self.client.get(url, **self.auth)["ETag"]
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.auth).status_code, 304)
+
+            project.save()
+            resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.auth)
+            self.assertEqual(resp.status_code, 200)
+            self.assertNotEqual(resp["ETag"], etag)
+
+
+@override_settings(OPENSOLAR_GET_DELAY=0, **SYNC_CREDENTIALS)
+class SyncDaemonTests(TransactionTestCase):
+    def setUp(self):
+        self.odoo = FakeOdoo()
+        os_server, os_url = serve(FakeOpenSolar(Fleet(6, seed=3)))
+        odoo_server, odoo_url = serve(self.odoo)
+        for server in (os_server, odoo_server):
+            self.addCleanup(server.shutdown)
+        urls = override_settings(OPENSOLAR_BASE_URL=f"{os_url}/api", ODOO_URL=odoo_url)
+        urls.enable()
+        self.addCleanup(urls.disable)
+
+    def test_cycles_reuse_logins_and_lookups(self):
+        call_command("run_sync_daemon", max_cycles=2, interval=0, stdout=StringIO(), stderr=StringIO())
+
+        self.assertEqual(SyncRun.objects.filter(command="sync_all", status=SyncRun.STATUS_OK).count(), 2)
+        self.assertEqual(self.odoo.calls["common.login"], 2)  # once per push stage, not per cycle
+        self.assertEqual(self.odoo.calls["res.country.search"], 1)
+
+    def test_sigterm_finishes_the_cycle_and_exits(self):
+        out = StringIO()
+        threading.Timer(0.5, os.kill, (os.getpid(), signal.SIGTERM)).start()
+        call_command("run_sync_daemon", interval=60, stdout=out, stderr=StringIO())
+        self.assertIn("stopped after 1 cycle", out.getvalue())
+
+    @override_settings(SYNC_SCHEDULE={"ingest": {"command": "sync_opensolar", "every": 3600}})
+    def test_schedule_runs_each_job_on_its_own(self):
+        out = StringIO()
+        threading.Timer(1.5, os.kill, (os.getpid(), signal.SIGTERM)).start()
+        call_command("run_sync_daemon", schedule=True, stdout=out, stderr=StringIO())
+
+        self.assertIn("stopped after 1 scheduled run", out.getvalue())
+        self.assertEqual(SyncRun.objects.filter(command="sync_opensolar", status=SyncRun.STATUS_OK).count(), 1)
+        self.assertEqual(OpenSolarProject.objects.count(), 6)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_trips_fails_fast_and_probes_half_open(self):
+        now = [0.0]
+        breaker = circuit.CircuitBreaker("odoo", failures=3, reset_seconds=30, clock=lambda: now[0])
+        for _ in range(3):
+            breaker.before_call()
+            breaker.record_failure()
+        self.assertEqual(breaker.state, circuit.OPEN)
+        self.assertRaises(circuit.CircuitOpen, breaker.before_call)
+
+        now[0] = 31
+        breaker.before_call()  # the probe
+        self.assertRaises(circuit.CircuitOpen, breaker.before_call)  # only one at a time
+        breaker.record_failure()
+        self.assertEqual(breaker.state, circuit.OPEN)
+
+        now[0] = 62
+        breaker.before_call()
+        breaker.record_success()
+        self.assertEqual(breaker.state, circuit.CLOSED)
+        breaker.before_call()
+
+
+class AdaptiveLimitTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.limit = concurrency.AdaptiveLimit("test", initial=1, max_limit=4, window=4, clock=lambda: self.now)
+
+    def burst(self, latency, status=200):
+        """Fill every allowed slot, then let them all finish after `latency` seconds."""
+        from contextlib import ExitStack
+        with ExitStack() as stack:
+            outcomes = [stack.enter_context(self.limit.slot()) for _ in range(self.limit.allowed)]
+            self.now += latency
+            for outcome in outcomes:
+                outcome.check(status)
+
+    def test_increases_while_latency_holds_and_backs_off(self):
+        for _ in range(4):
+            self.burst(0.1)
+        self.assertEqual(self.limit.allowed, 2)
+        for _ in range(4):
+            self.burst(0.1)
+        self.assertEqual(self.limit.allowed, 4)
+
+        self.burst(0.1, status=429)  # four calls throttled at once: one cut, not four
+        self.assertEqual(self.limit.allowed, 2)
+
+        for _ in range(2):
+            self.burst(0.1)
+        self.assertEqual(self.limit.allowed, 3)
+        self.burst(0.1)
+        self.burst(0.5)  # the window's p95 jumps 5x
+        self.assertEqual(self.limit.allowed, 1)
+        self.assertEqual(self.limit.in_flight, 0)
+        self.assertIn('opensolar_sync_concurrency_limit{system="test"} 1.0', metrics.CONCURRENCY_LIMIT.render())
+
+
+class ConcurrentMapTests(SimpleTestCase):
+    @override_settings(SYNC_CONCURRENCY={"test": {"max_limit": 3}})
+    def test_results_in_order_and_workers_profiled(self):
+        concurrency.reset()
+        self.addCleanup(concurrency.reset)
+
+        def fetch_on_worker(n):
+            return n * 2, threading.current_thread().name
+
+        with tempfile.TemporaryDirectory() as tmp, \
+                profiling.profile_session(os.path.join(tmp, "imap.pstats")) as result:
+            out = list(concurrency.imap(fetch_on_worker, range(10), "test"))
+        self.assertEqual([(n, doubled) for n, (doubled, _) in out], [(n, n * 2) for n in range(10)])
+        self.assertTrue(all(thread.startswith("test-worker") for _, (_, thread) in out))
+        profiled = {func for _, _, func in result["stats"].stats}
+        self.assertIn("fetch_on_worker", profiled)
+
+    def test_keyed_locks_serialise_a_key_and_then_drop_it(self):
+        locks = concurrency.KeyedLocks()
+        inside = threading.Event()
+        release = threading.Event()
+        order = []
+
+        def hold():
+            with locks("a"):
+                inside.set()
+                release.wait(5)
+                order.append("holder")
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        inside.wait(5)
+        with locks("b"):
+            self.assertEqual(len(locks), 2)
+        self.assertEqual(len(locks), 1)
+        release.set()
+        with locks("a"):  # waits for the holder
+            order.append("waiter")
+        self.assertEqual(order, ["holder", "waiter"])
+        holder.join()
+        self.assertEqual(len(locks), 0)
+
+
+class SchedulerTests(TestCase):
+    now = timezone.make_aware(timezone.datetime(2024, 5, 1, 12, 0))
+
+    def test_interval_catch_up_rules(self):
+        job = scheduler.Job("ingest", "sync_opensolar", every=300)
+        self.assertEqual(job.schedule(self.now), self.now)  # never ran: run now
+
+        job.last_run = self.now - timedelta(seconds=1000)
+        self.assertEqual(job.schedule(self.now), self.now - timedelta(seconds=700))  # once: overdue, run now
+        job.catch_up = scheduler.CATCH_UP_SKIP
+        self.assertEqual(job.schedule(self.now), self.now + timedelta(seconds=200))  # skip: next slot
+
+    def test_daily_catch_up_and_jitter(self):
+        job = scheduler.Job("full", "sync_all", at="02:30", jitter=60)
+        due = job.schedule(self.now)
+        self.assertTrue(self.now + timedelta(hours=14, minutes=30) <= due <= self.now + timedelta(hours=14, minutes=31))
+
+        job.jitter = 0
+        job.last_run = self.now - timedelta(days=2)
+        self.assertLess(job.schedule(self.now), self.now)
+        job.catch_up = scheduler.CATCH_UP_SKIP
+        self.assertEqual(job.schedule(self.now), self.now + timedelta(hours=14, minutes=30))
+
+    def test_bad_entries_are_rejected(self):
+        for spec in ({}, {"every": 60, "at": "01:00"}, {"at": "25:00"}, {"every": 60, "catch_up": "all"}):
+            with self.assertRaises(ImproperlyConfigured):
+                scheduler.Job("x", "sync_all", **spec)
+
+    def test_full_job_ignores_incremental_runs(self):
+        SyncRun.objects.create(command="sync_all", full=True, started_at=self.now - timedelta(days=2))
+        SyncRun.objects.create(command="sync_all", started_at=self.now - timedelta(hours=1))
+        jobs = scheduler.jobs_from_settings({
+            "full": {"command": "sync_all", "at": "02:30", "options": {"full": True}},
+            "all": {"command": "sync_all", "every": 3600},
+        })
+        scheduler.Scheduler(jobs, lambda job: None, clock=lambda: self.now).start()
+        self.assertEqual(jobs[0].last_run, self.now - timedelta(days=2))
+        self.assertLess(jobs[0].next_due, self.now)  # last night's full run is still owed
+        self.assertEqual(jobs[1].last_run, self.now - timedelta(hours=1))
+
+    def test_concurrency_limits(self):
+        release = threading.Event()
+        jobs = [scheduler.Job("a", "a", every=60), scheduler.Job("b", "b", every=60),
+                scheduler.Job("full", "sync_all", every=60), scheduler.Job("c", "c", every=60)]
+        sched = scheduler.Scheduler(jobs, lambda job: release.wait(5), max_concurrent=2, clock=lambda: self.now)
+        sched.start(history=False)
+        jobs[2].next_due -= timedelta(seconds=1)  # due first
+        jobs[2].exclusive = True
+
+        self.assertEqual([j.name for j in sched.run_pending()], ["full"])
+        self.assertEqual(sched.run_pending(), [])  # nothing starts alongside an exclusive job
+        release.set()
+        sched.join()
+        release.clear()
+        self.assertEqual([j.name for j in sched.run_pending()], ["a", "b"])  # then two at a time
+        self.assertEqual(sched.run_pending(), [])
+        release.set()
+        sched.join()
+        self.assertEqual(jobs[0].next_due, self.now + timedelta(seconds=60))
@@ -0,0 +1,128 @@
+"""
+Lightweight per-call tracing for outbound OpenSolar and Odoo requests.
+
+Every GET / RPC runs inside span(), which records the endpoint template,
+status, latency, retries, response bytes and whatever ids are bound in the
+current context (run_id, project_id, customer_id). Finished spans go to the
+active exporter:
+
+  * JsonlExporter – one JSON object per line, for latency distributions;
+  * MemoryExporter – keeps spans in a list, for tests;
+  * nothing, when tracing is off (the default).
+
+The exporter comes from the SYNC_TRACE_FILE setting / environment variable,
+or is swapped in with set_exporter().
+"""
+import json
+import os
+import threading
+import time
+import contextvars
+from contextlib import contextmanager
+
+from apps.api import metrics
+
+_context = contextvars.ContextVar("trace_context", default={})
+_exporter = None
+_configured = False
+_config_lock = threading.Lock()
+
+
+class JsonlExporter:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export(self, record):
+        line = json.dumps(record, default=str)
+        with self.lock, open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(line + "\n")
+
+
+class MemoryExporter:
+    def __init__(self):
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def export(self, record):
+        with self.lock:
+            self.spans.append(record)
+
+
+def _trace_file():
+    try:
+        from django.conf import settings
+        path = getattr(settings, "SYNC_TRACE_FILE", "")
+    except Exception:  # used outside Django (utils/ scripts)
+        path = ""
+    return path or os.getenv("SYNC_TRACE_FILE", "")
+
+
+def get_exporter():
+    global _exporter, _configured
+    if not _configured:
+        with _config_lock:
+            if not _configured:
+                path = _trace_file()
+                _exporter = JsonlExporter(path) if path else None
+                _configured = True
+    return _exporter
+
+
+def set_exporter(exporter):
+    """Install `exporter` (or None to switch tracing off). Returns the previous one."""
+    global _exporter, _configured
+    with _config_lock:
+        previous = _exporter
+        _exporter, _configured = exporter, True
+    return previous
+
+
+@contextmanager
+def bind(**ids):
+    """Attach ids (run_id, project_id, ...) to every span started inside the block."""
+    token = _context.set({**_context.get(), **ids})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class Span:
+    __slots__ = ("attrs",)
+
+    def __init__(self, attrs):
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+@contextmanager
+def span(system, endpoint, **attrs):
+    """
+    Time one outbound call. `endpoint` is the template, e.g. "GET /projects/{id}/"
+    or "res.partner.search_read". Set status/retries/bytes on the yielded Span.
+
+    Every span feeds the in-process metrics; it is only exported when an
+    exporter is configured.
+    """
+    exporter = get_exporter()
+    record = Span({"system": system, "endpoint": endpoint, "status": None,
+                   "retries": 0, "bytes": 0, **_context.get(), **attrs})
+    started = time.time()
+    t0 = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        elapsed = time.perf_counter() - t0
+        metrics.observe_call(system, endpoint, elapsed,
+                             retries=record.attrs.get("retries"), error=record.attrs.get("error"))
+        if exporter is not None:
+            record.attrs["start"] = started
+            record.attrs["latency_ms"] = round(elapsed * 1000, 2)
+            exporter.export(record.attrs)
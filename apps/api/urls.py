@@ -1,8 +1,19 @@
 from django.urls import path
-from .views import sync_all
+from rest_framework.routers import SimpleRouter
+from .views import sync_all, opensolar_webhook, metrics_view
+from .viewsets import CustomerViewSet, ProjectViewSet, ProposalViewSet
+
+# GET /api/projects/, /api/customers/, /api/proposals/   (read-only; see apps.api.viewsets)
+router = SimpleRouter()
+router.register('projects', ProjectViewSet, basename='project')
+router.register('customers', CustomerViewSet, basename='customer')
+router.register('proposals', ProposalViewSet, basename='proposal')
 
 urlpatterns = [
     # GET /api/sync-all/?key=<YOUR_SECRET>
     path('sync-all/', sync_all, name='sync_all'),
-]
-
+    # POST /api/webhooks/opensolar/   (signed with OPENSOLAR_WEBHOOK_SECRET)
+    path('webhooks/opensolar/', opensolar_webhook, name='opensolar_webhook'),
+    # GET /api/metrics/   (Prometheus text format; ?key= or Bearer SYNC_SECRET)
+    path('metrics/', metrics_view, name='metrics'),
+] + router.urls
@@ -1,18 +1,31 @@
+import json
 import logging
 from django.conf import settings
-from django.core.management import call_command
-from django.http import JsonResponse, HttpResponseForbidden
-from django.views.decorators.http import require_GET
+from django.core.management import call_command, load_command_class
+from django.http import HttpResponse, JsonResponse, HttpResponseForbidden
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from apps.api.locks import SyncAlreadyRunning
+from apps.api.permissions import has_sync_key
+from apps.api import metrics, webhooks
 
 logger = logging.getLogger(__name__)
 
 @require_GET
 def sync_all(request):
     """
-    Runs in order:
+    Runs the sync_all command, i.e. in order:
       1. sync_opensolar
       2. sync_contacts_to_odoo
       3. sync_projects_to_odoo
+
+    Only one full sync runs at a time. A second call gets 409 straight away,
+    or with ?wait=1 blocks until the running sync finishes and reports that.
+
+    ?mode=pipeline streams each project through all three stages as soon as
+    it is fetched (sync_all --pipeline), and ?full=1 ingests every project's
+    details (sync_all --full).
     """
     secret = request.GET.get("key")
     if getattr(settings, "SYNC_SECRET", None):
@@ -20,24 +33,73 @@ def sync_all(request):
             logger.warning("Rejected sync_all call with bad key=%r", secret)
             return HttpResponseForbidden("❌ Invalid sync key")
 
+    command = load_command_class("apps.api", "sync_all")
     try:
-        logger.info("▶️ Full sync: OpenSolar → Django → Odoo")
-
-        call_command("sync_opensolar")
-        logger.info("   ✔️  sync_opensolar complete")
-
-        call_command("sync_contacts_to_odoo")
-        logger.info("   ✔️  sync_contacts_to_odoo complete")
-
-        call_command("sync_projects_to_odoo")
-        logger.info("   ✔️  sync_projects_to_odoo complete")
+        call_command(
+            command,
+            pipeline=request.GET.get("mode") == "pipeline",
+            full=bool(request.GET.get("full")),
+            wait=bool(request.GET.get("wait")),
+            raise_if_running=True,
+        )
+        if command.attached:
+            logger.info("⏳ sync_all attached to a run that was already in progress")
+            return JsonResponse({"status": "attached"})
 
         logger.info("✅ Full sync_all succeeded")
         return JsonResponse({"status": "ok"})
 
+    except SyncAlreadyRunning as e:
+        logger.warning("⏭️ Rejected sync_all: %s", e)
+        return JsonResponse({"status": "busy", "detail": str(e)}, status=409)
+
     except Exception:
         logger.exception("💥 Full sync_all failed")
         return JsonResponse(
             {"status": "error", "detail": "See server logs"},
             status=500
         )
+
+
+@csrf_exempt
+@require_POST
+def opensolar_webhook(request):
+    """
+    Receives OpenSolar project-change webhooks.
+
+    The delivery is verified, then coalesced per project: a burst of events
+    for one project results in a single targeted ingest + Odoo push once the
+    project has been quiet for WEBHOOK_COALESCE_SECONDS.
+    """
+    if not webhooks.verify(request):
+        logger.warning("Rejected OpenSolar webhook with bad signature")
+        return HttpResponseForbidden("❌ Invalid webhook signature")
+
+    try:
+        payload = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"status": "error", "detail": "Body is not JSON"}, status=400)
+
+    external_id = webhooks.project_id_from_payload(payload)
+    if not external_id:
+        return JsonResponse({"status": "ignored"}, status=202)
+
+    pending = webhooks.enqueue(external_id)
+    webhooks.kick()
+    logger.info("📬 Webhook queued targeted sync for project %s", external_id)
+    return JsonResponse(
+        {"status": "queued", "project_id": external_id, "due_at": pending.due_at.isoformat()},
+        status=202,
+    )
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Prometheus scrape target. Guarded by SYNC_SECRET like sync-all, passed
+    as ?key= or as an "Authorization: Bearer <secret>" header.
+    """
+    if not has_sync_key(request):
+        return HttpResponseForbidden("❌ Invalid metrics key")
+
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,129 @@
+"""
+Read-only REST endpoints over the synced OpenSolar data, for dashboards:
+
+    GET /api/projects/            GET /api/projects/<external_id>/
+    GET /api/customers/           GET /api/customers/<external_id>/
+    GET /api/proposals/           GET /api/proposals/<external_id>/
+
+  * keyset pagination: ?cursor= from the "next" link, ?page_size= up to 1000;
+  * ?fields=a,b trims the response, and relations that are not asked for
+    are neither joined nor prefetched;
+  * ?updated_since=<ISO 8601> returns only rows changed since then;
+  * every response carries an ETag built from updated_at, so a poller that
+    sends If-None-Match gets a 304 from a single aggregate query.
+
+Guarded by SYNC_SECRET, like the metrics endpoint.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status, viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+from apps.api.models import OpenSolarCustomer, OpenSolarProject, OpenSolarProposal
+from apps.api.permissions import HasSyncKey
+from apps.api.serializers import (
+    OpenSolarCustomerSerializer,
+    OpenSolarProjectSerializer,
+    OpenSolarProposalSerializer,
+    requested_fields,
+)
+
+
+class KeysetPagination(CursorPagination):
+    """WHERE id > last-seen, so deep pages cost the same as the first one."""
+    ordering = "id"
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+
+class SyncReadViewSet(viewsets.ReadOnlyModelViewSet):
+    lookup_field = "external_id"
+    authentication_classes = []
+    permission_classes = [HasSyncKey]
+    pagination_class = KeysetPagination
+
+    select = {}          # ?fields= name -> select_related path
+    prefetch = {}        # ?fields= name -> prefetch_related lookup
+    etag_fields = ("updated_at",)  # every timestamp the representation depends on
+
+    def get_queryset(self):
+        queryset = self.queryset.all()
+
+        since = self.request.query_params.get("updated_since")
+        if since:
+            parsed = parse_datetime(since)
+            if parsed is None:
+                raise ValidationError({"updated_since": "Expected an ISO 8601 datetime."})
+            queryset = queryset.filter(updated_at__gte=parsed)
+
+        wanted = requested_fields(self.request)
+        selected = [path for name, path in self.select.items() if wanted is None or name in wanted]
+        prefetched = [path for name, path in self.prefetch.items() if wanted is None or name in wanted]
+        if selected:
+            queryset = queryset.select_related(*selected)
+        if prefetched:
+            queryset = queryset.prefetch_related(*prefetched)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        etag = self.etag(self.filter_queryset(self.get_queryset()))
+        if self.not_modified(etag):
+            return self.not_modified_response(etag)
+        response = super().list(request, *args, **kwargs)
+        response["ETag"] = etag
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = {self.lookup_field: self.kwargs[self.lookup_url_kwarg or self.lookup_field]}
+        etag = self.etag(self.get_queryset().filter(**lookup))
+        if self.not_modified(etag):
+            return self.not_modified_response(etag)
+        response = super().retrieve(request, *args, **kwargs)
+        response["ETag"] = etag
+        return response
+
+    def etag(self, queryset):
+        """Hash of the row count and newest timestamps of `queryset`, and the request's query string."""
+        aggregates = {f"max_{i}": Max(path) for i, path in enumerate(self.etag_fields)}
+        state = queryset.order_by().aggregate(count=Count("pk"), **aggregates)
+        key = f"{self.request.get_full_path()}|{sorted(state.items())}"
+        return quote_etag(hashlib.md5(key.encode("utf-8")).hexdigest())
+
+    def not_modified(self, etag):
+        sent = parse_etags(self.request.headers.get("If-None-Match", ""))
+        return "*" in sent or etag in sent
+
+    @staticmethod
+    def not_modified_response(etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        response["ETag"] = etag
+        return response
+
+
+class ProjectViewSet(SyncReadViewSet):
+    queryset = OpenSolarProject.objects.all()
+    serializer_class = OpenSolarProjectSerializer
+    select = {"customer": "customer"}
+    prefetch = {"proposals": "proposals", "modules": "modules",
+                "inverters": "inverters", "batteries": "batteries"}
+    # Proposals and parts are only ever written by their project's ingest,
+    # which touches the project; a customer is shared, so it counts on its own.
+    etag_fields = ("updated_at", "customer__updated_at")
+
+
+class CustomerViewSet(SyncReadViewSet):
+    queryset = OpenSolarCustomer.objects.all()
+    serializer_class = OpenSolarCustomerSerializer
+    prefetch = {"projects": "projects"}
+
+
+class ProposalViewSet(SyncReadViewSet):
+    queryset = OpenSolarProposal.objects.all()
+    serializer_class = OpenSolarProposalSerializer
+    select = {"project": "project"}
@@ -0,0 +1,231 @@
+"""
+OpenSolar project-change webhooks → targeted single-project syncs.
+
+The view verifies a delivery and calls enqueue(); bursts for the same project
+collapse into one PendingProjectSync row whose `due_at` slides forward with
+every event (capped, so a chatty project still gets synced). Due rows are
+drained by process_pending() – kicked off in-process a moment after each
+delivery, and also runnable from cron via `manage.py process_webhooks`.
+
+A row is only deleted once its sync succeeds. Claiming a row leases it for
+CLAIM_LEASE_SECONDS (so a crashed drain is picked up again), and a failed
+sync – OpenSolar or Odoo down – pushes it back exponentially from
+RETRY_BASE_SECONDS up to RETRY_MAX_SECONDS.
+"""
+import hashlib
+import hmac
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.api import metrics
+from apps.api.locks import single_flight, SyncAlreadyRunning
+from apps.api.models import PendingProjectSync
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "HTTP_X_OPENSOLAR_SIGNATURE"
+COALESCE_SECONDS = 10      # quiet period after the last event for a project
+MAX_COALESCE_SECONDS = 120  # never hold a project back longer than this
+CLAIM_LEASE_SECONDS = 600   # a claimed row comes due again if its drain dies
+RETRY_BASE_SECONDS = 60     # first retry after a failed sync, doubling per attempt
+RETRY_MAX_SECONDS = 3600
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def sign(body, secret):
+    """Signature header value for `body`; what the sender must put in X-OpenSolar-Signature."""
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify(request):
+    """
+    Accept a delivery signed with OPENSOLAR_WEBHOOK_SECRET, either as an
+    HMAC-SHA256 of the body in X-OpenSolar-Signature or, for webhook configs
+    that can only add a static value, the secret itself as ?key=.
+    With no secret configured every delivery is accepted (local development).
+    """
+    secret = _setting("OPENSOLAR_WEBHOOK_SECRET", "")
+    if not secret:
+        return True
+    signature = request.META.get(SIGNATURE_HEADER, "")
+    if signature:
+        return hmac.compare_digest(signature, sign(request.body, secret))
+    return hmac.compare_digest(request.GET.get("key", ""), secret)
+
+
+def project_id_from_payload(payload):
+    """Pull the OpenSolar project id out of a webhook body, or None if it isn't about a project."""
+    if not isinstance(payload, dict):
+        return None
+    if payload.get("project_id"):
+        return str(payload["project_id"])
+    model = str(payload.get("model", "Project")).lower()
+    data = payload.get("data") or {}
+    if model == "project":
+        pid = payload.get("object_id") or data.get("id")
+    else:
+        # e.g. a contact or system change carries the project it belongs to
+        pid = data.get("project_id") or data.get("project")
+    if isinstance(pid, str) and pid.rstrip("/").split("/")[-1].isdigit():
+        pid = pid.rstrip("/").split("/")[-1]  # project given as an API URL
+    return str(pid) if pid else None
+
+
+def enqueue(external_id, now=None):
+    """Record (or coalesce) a pending sync for one project. Returns the row."""
+    now = now or timezone.now()
+    window = timedelta(seconds=_setting("WEBHOOK_COALESCE_SECONDS", COALESCE_SECONDS))
+    cap = timedelta(seconds=_setting("WEBHOOK_MAX_COALESCE_SECONDS", MAX_COALESCE_SECONDS))
+
+    for _ in range(2):
+        with transaction.atomic():
+            pending = (PendingProjectSync.objects
+                       .select_for_update()
+                       .filter(external_id=external_id)
+                       .first())
+            if pending:
+                pending.last_event_at = now
+                due_at = min(now + window, pending.first_event_at + cap)
+                # New events don't cut short the backoff of a project whose sync is failing.
+                pending.due_at = max(due_at, pending.due_at) if pending.attempts else due_at
+                pending.event_count = F("event_count") + 1
+                pending.save(update_fields=["last_event_at", "due_at", "event_count"])
+                return pending
+            try:
+                with transaction.atomic():
+                    return PendingProjectSync.objects.create(
+                        external_id=external_id,
+                        first_event_at=now,
+                        last_event_at=now,
+                        due_at=now + window,
+                    )
+            except IntegrityError:
+                continue  # a concurrent delivery created it first; coalesce into that
+    raise RuntimeError(f"Could not enqueue project {external_id}")
+
+
+def claim_due(now=None, limit=100):
+    """
+    Lease due rows and return (external_id, event_count) for each. The rows
+    stay queued until finish() or fail() settles them.
+    """
+    now = now or timezone.now()
+    lease = timedelta(seconds=_setting("WEBHOOK_CLAIM_LEASE_SECONDS", CLAIM_LEASE_SECONDS))
+    with transaction.atomic():
+        rows = list(PendingProjectSync.objects
+                    .select_for_update(skip_locked=True)
+                    .filter(due_at__lte=now)
+                    .order_by("due_at")
+                    .values_list("pk", "external_id", "event_count")[:limit])
+        PendingProjectSync.objects.filter(pk__in=[pk for pk, _, _ in rows]).update(due_at=now + lease)
+    return [(external_id, event_count) for _, external_id, event_count in rows]
+
+
+def finish(external_id, event_count):
+    """Dequeue a synced project, unless more events for it arrived during the sync."""
+    PendingProjectSync.objects.filter(external_id=external_id, event_count=event_count).delete()
+
+
+def fail(external_id, error, now=None):
+    """Keep a project whose sync failed queued, due again after an exponential backoff."""
+    now = now or timezone.now()
+    base = _setting("WEBHOOK_RETRY_BASE_SECONDS", RETRY_BASE_SECONDS)
+    cap = _setting("WEBHOOK_RETRY_MAX_SECONDS", RETRY_MAX_SECONDS)
+    pending = PendingProjectSync.objects.filter(external_id=external_id).first()
+    if pending is None:
+        return
+    pending.attempts += 1
+    pending.last_error = f"{type(error).__name__}: {error}"
+    pending.due_at = now + timedelta(seconds=min(base * 2 ** (pending.attempts - 1), cap))
+    pending.save(update_fields=["attempts", "last_error", "due_at"])
+
+
+def sync_single_project(external_id, stdout=None, stderr=None):
+    """
+    Ingest one project from OpenSolar and push its contact and project to
+    Odoo, using the same per-record code as the full stage commands.
+    Returns the Odoo x_projects id, or None if the project was skipped
+    (gone from OpenSolar, or without a customer). An OpenSolar 500 or retry
+    exhaustion raises OpenSolarUnavailable, so the row is retried.
+    """
+    from apps.api.management.commands import (
+        sync_opensolar, sync_contacts_to_odoo, sync_projects_to_odoo,
+    )
+
+    project = sync_opensolar.Command(stdout, stderr).ingest_by_id(external_id, strict=True)
+    if project is None or project.customer is None:
+        return None
+
+    contacts = sync_contacts_to_odoo.Command(stdout, stderr)
+    contacts.sync_customer(contacts.authenticate(), project.customer)
+
+    projects = sync_projects_to_odoo.Command(stdout, stderr)
+    return projects.sync_project(projects._authenticate(), project)
+
+
+def process_pending(now=None, stdout=None, stderr=None):
+    """
+    Run a targeted sync for every due project. Returns how many succeeded;
+    failed ones stay queued for a retry.
+    """
+    processed = 0
+    try:
+        with single_flight("process_webhooks"):
+            while True:
+                due = claim_due(now)
+                if not due:
+                    break
+                for external_id, event_count in due:
+                    try:
+                        sync_single_project(external_id, stdout, stderr)
+                    except Exception as e:
+                        logger.exception("💥 Targeted sync failed for project %s; will retry", external_id)
+                        fail(external_id, e, now)
+                        continue
+                    finish(external_id, event_count)
+                    processed += 1
+    except SyncAlreadyRunning:
+        logger.info("⏭️ Webhook queue is already being drained elsewhere")
+    metrics.flush()
+    return processed
+
+
+_kick_lock = threading.Lock()
+_kick_timer = None
+
+
+def kick(delay=None):
+    """
+    Drain the queue in this process once the coalescing window has passed.
+    At most one timer is pending per process; extra kicks are no-ops.
+    """
+    global _kick_timer
+    delay = delay if delay is not None else _setting("WEBHOOK_COALESCE_SECONDS", COALESCE_SECONDS) + 1
+
+    def _drain():
+        global _kick_timer
+        with _kick_lock:
+            _kick_timer = None
+        try:
+            process_pending()
+            # events that arrived while we were draining
+            nxt = PendingProjectSync.objects.order_by("due_at").values_list("due_at", flat=True).first()
+            if nxt is not None:
+                kick(max((nxt - timezone.now()).total_seconds(), 0) + 1)
+        finally:
+            connections.close_all()
+
+    with _kick_lock:
+        if _kick_timer is None:
+            _kick_timer = threading.Timer(delay, _drain)
+            _kick_timer.daemon = True
+            _kick_timer.start()
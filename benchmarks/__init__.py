@@ -0,0 +1,11 @@
+"""
+End-to-end benchmarks for the sync: sync_all against the local fake
+OpenSolar and Odoo servers (apps/api/fakes) at several fleet sizes.
+
+    python -m benchmarks.run                        # 1k, 10k and 50k projects
+    python -m benchmarks.run --sizes 1000 --save-baseline
+    python -m benchmarks.compare benchmarks/baseline.json benchmarks/results/latest.json
+    python -m benchmarks.explain                    # index usage on the hot paths
+
+See benchmarks/README.md.
+"""
@@ -0,0 +1,93 @@
+"""
+Diff two benchmark result files.
+
+    python -m benchmarks.compare benchmarks/baseline.json benchmarks/results/20250101-120000.json
+
+Prints every metric side by side and exits 1 if any of them got worse by
+more than --threshold (default 10%). A metric that rises from zero (say, a
+scenario that made no RPCs now making some) counts as an infinite change.
+Sizes or scenarios present in only one file are listed but not judged.
+"""
+import argparse
+import json
+import sys
+
+# metric -> True when a larger number is better
+METRICS = {
+    "wall_s": False,
+    "http_calls": False,
+    "rpcs": False,
+    "db_queries": False,
+    "peak_rss_mb": False,
+    "projects_per_s": True,
+}
+
+
+def load(path):
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def relative_change(old, new):
+    """(new - old) / old, or ±inf when the baseline is zero and the value moved off it."""
+    if old:
+        return (new - old) / old
+    if new == old:
+        return 0.0
+    return float("inf") if new > old else float("-inf")
+
+
+def compare(old, new, threshold):
+    """Return (lines, regressions)."""
+    lines, regressions = [], []
+    header = f"{'size':>7} {'scenario':<12} {'metric':<15} {'old':>12} {'new':>12} {'change':>8}"
+    lines.append(header)
+    lines.append("-" * len(header))
+
+    for size in sorted(set(old["results"]) | set(new["results"]), key=int):
+        old_size, new_size = old["results"].get(size), new["results"].get(size)
+        if old_size is None or new_size is None:
+            lines.append(f"{size:>7} only in {'new' if old_size is None else 'old'} results")
+            continue
+        for scenario in list(old_size) + [s for s in new_size if s not in old_size]:
+            a, b = old_size.get(scenario, {}), new_size.get(scenario, {})
+            for metric, higher_is_better in METRICS.items():
+                if metric not in a or metric not in b or a[metric] is None or b[metric] is None:
+                    continue
+                change = relative_change(a[metric], b[metric])
+                worse = -change if higher_is_better else change
+                flag = ""
+                if worse > threshold:
+                    flag = "  ❌"
+                    regressions.append((size, scenario, metric, change))
+                elif worse < -threshold:
+                    flag = "  ✅"
+                lines.append(f"{size:>7} {scenario:<12} {metric:<15} {a[metric]:>12} {b[metric]:>12} "
+                             f"{change:>+8.1%}{flag}")
+    return lines, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed regression, as a fraction")
+    args = parser.parse_args(argv)
+
+    old, new = load(args.old), load(args.new)
+    for label, report in (("old", old), ("new", new)):
+        meta = report.get("meta", {})
+        print(f"{label}: {meta.get('git') or '?'} {meta.get('created', '')} mode={meta.get('mode')}")
+    print()
+
+    lines, regressions = compare(old, new, args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print(f"\n❌ {len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+        return 1
+    print(f"\n✅ No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Check that the sync and admin hot paths use the indexes added for them.
+
+    python -m benchmarks.explain --projects 20000
+
+Fills a throwaway test database with generate_fleet, ANALYZEs it, runs each
+query below under EXPLAIN ANALYZE and fails if the plan does not use the
+expected index. PostgreSQL only.
+"""
+import argparse
+import os
+import sys
+from datetime import timedelta
+
+CHECKS = [
+    # (label, index that must appear in the plan, queryset factory given the models
+    # module and a sample project whose values make the searches selective)
+    ("battery lookup by (project, code)", "battery_project_code_idx",
+     lambda m, p: m.OpenSolarBattery.objects.filter(project=p, code="Powerwall 2")),
+    ("projects changed since a cutoff", "project_updated_at_idx",
+     lambda m, p: m.OpenSolarProject.objects.filter(updated_at__gte=p.updated_at + timedelta(days=1))),
+    ("admin customer search on name", "customer_name_trgm_idx",
+     lambda m, p: m.OpenSolarCustomer.objects.filter(name__icontains=p.customer.name)),
+    ("admin customer search on email", "customer_email_trgm_idx",
+     lambda m, p: m.OpenSolarCustomer.objects.filter(email__icontains=p.customer.email.split("@")[0])),
+    ("admin component search on project name", "project_name_trgm_idx",
+     lambda m, p: m.OpenSolarModule.objects.filter(project__name__icontains=p.name)),
+]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE the indexed query paths")
+    parser.add_argument("--projects", type=int, default=20000, help="Fleet size to generate")
+    parser.add_argument("--verbose", action="store_true", help="Print every plan")
+    args = parser.parse_args(argv)
+
+    for name in ("OPENSOLAR_API_TOKEN", "ODOO_URL", "ODOO_DB", "ODOO_API_TOKEN"):
+        os.environ.setdefault(name, "bench")
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "opensolar_sync.settings")
+
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from django.db import connection
+    from apps.api import models
+
+    if connection.vendor != "postgresql":
+        print("⏭️ EXPLAIN checks need PostgreSQL; skipping.", file=sys.stderr)
+        return 0
+
+    test_db = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    failures = 0
+    try:
+        with open(os.devnull, "w") as sink:
+            call_command("generate_fleet", str(args.projects), stdout=sink)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        project = models.OpenSolarProject.objects.select_related("customer").order_by("pk").first()
+        for label, index, make in CHECKS:
+            plan = make(models, project).explain(analyze=True)
+            ok = index in plan
+            failures += not ok
+            print(f"{'✅' if ok else '❌'} {label}: {'uses' if ok else 'does not use'} {index}")
+            if args.verbose or not ok:
+                print("   " + plan.replace("\n", "\n   "))
+    finally:
+        connection.creation.destroy_test_db(test_db, verbosity=0)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
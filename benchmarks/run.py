@@ -0,0 +1,198 @@
+"""
+Run sync_all against the fakes and record the numbers as JSON.
+
+Each fleet size runs in its own child process (so peak RSS means something)
+against a throwaway test database, through three scenarios:
+
+  * cold        – empty database, empty Odoo;
+  * warm        – the same fleet again, nothing changed;
+  * change_1pct – 1% of the projects moved to a new revision.
+
+Per scenario: wall time, OpenSolar HTTP calls, Odoo RPCs, DB queries and the
+process's peak RSS so far.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+DEFAULT_SIZES = "1000,10000,50000"
+SCENARIOS = ("cold", "warm", "change_1pct")
+
+
+class QueryCounter:
+    """Counts SQL statements on every connection, including pipeline threads'."""
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self):
+        from django.db import connections
+        from django.db.backends.signals import connection_created
+
+        def attach(sender, connection, **kwargs):
+            if self not in connection.execute_wrappers:
+                connection.execute_wrappers.append(self)
+
+        connection_created.connect(attach, weak=False)
+        for connection in connections.all():
+            attach(None, connection)
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_size(size, mode, queue_size, latency, seed):
+    """Child process: benchmark one fleet size and return its scenarios."""
+    from apps.api.fakes.odoo import FakeOdoo
+    from apps.api.fakes.opensolar import FakeOpenSolar, Fleet
+    from apps.api.fakes.transport import serve
+
+    fleet = Fleet(size, seed=seed)
+    opensolar = FakeOpenSolar(fleet, latency=latency, seed=seed)
+    odoo = FakeOdoo(latency=latency)
+    os_server, os_url = serve(opensolar)
+    odoo_server, odoo_url = serve(odoo)
+
+    # decouple reads os.environ first, so this reaches settings (and apps.api.conf).
+    os.environ.update({
+        "OPENSOLAR_BASE_URL": f"{os_url}/api",
+        "OPENSOLAR_GET_DELAY": "0",
+        "ODOO_URL": odoo_url,
+    })
+    for name in ("OPENSOLAR_API_TOKEN", "OPENSOLAR_ORG_ID", "ODOO_DB", "ODOO_API_USERNAME", "ODOO_API_TOKEN"):
+        os.environ.setdefault(name, "bench")
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "opensolar_sync.settings")
+
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from django.db import connection
+
+    test_db = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    counter = QueryCounter()
+    counter.install()
+    results = {}
+    try:
+        for scenario in SCENARIOS:
+            if scenario == "change_1pct":
+                fleet.change(0.01, seed=seed)
+            http_before, rpc_before, queries_before = sum(opensolar.calls.values()), odoo.total_calls, counter.count
+
+            started = time.perf_counter()
+            with open(os.devnull, "w") as sink:
+                call_command("sync_all", pipeline=(mode == "pipeline"), queue_size=queue_size,
+                             stdout=sink, stderr=sink)
+            wall = time.perf_counter() - started
+
+            results[scenario] = {
+                "wall_s": round(wall, 3),
+                "http_calls": sum(opensolar.calls.values()) - http_before,
+                "rpcs": odoo.total_calls - rpc_before,
+                "db_queries": counter.count - queries_before,
+                "peak_rss_mb": peak_rss_mb(),
+                "projects_per_s": round(size / wall, 1) if wall else None,
+            }
+            print(f"   {size:>6} {scenario:<12} {wall:8.1f}s", file=sys.stderr)
+    finally:
+        connection.creation.destroy_test_db(test_db, verbosity=0)
+        os_server.shutdown()
+        odoo_server.shutdown()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"Comma-separated fleet sizes (default {DEFAULT_SIZES})")
+    parser.add_argument("--mode", choices=("pipeline", "stages"), default="pipeline")
+    parser.add_argument("--queue-size", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every fake response")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="Result file (default benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Also write {os.path.relpath(BASELINE, ROOT)}")
+    parser.add_argument("--child-size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--child-out", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child_size:
+        results = run_size(args.child_size, args.mode, args.queue_size, args.latency, args.seed)
+        with open(args.child_out, "w", encoding="utf-8") as fh:
+            json.dump(results, fh)
+        return 0
+
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "mode": args.mode,
+            "queue_size": args.queue_size,
+            "latency": args.latency,
+            "seed": args.seed,
+        },
+        "results": {},
+    }
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        print(f"▶️ {size} projects ({args.mode})", file=sys.stderr)
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+            child_out = tmp.name
+        try:
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.run", "--child-size", str(size), "--child-out", child_out,
+                 "--mode", args.mode, "--queue-size", str(args.queue_size),
+                 "--latency", str(args.latency), "--seed", str(args.seed)],
+                cwd=ROOT, check=True,
+            )
+            with open(child_out, encoding="utf-8") as fh:
+                report["results"][str(size)] = json.load(fh)
+        finally:
+            os.unlink(child_out)
+
+    from benchmarks import startup
+    print("▶️ import times", file=sys.stderr)
+    report["startup_ms"] = startup.measure(startup.DEFAULT_MODULES, repeat=5)
+    over = startup.over_budget(report["startup_ms"])
+
+    out = args.out or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    paths = [out] + ([BASELINE] if args.save_baseline else [])
+    for path in paths:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+            fh.write("\n")
+        print(f"✅ Wrote {os.path.relpath(path, ROOT)}", file=sys.stderr)
+
+    for module, (ms, budget) in over.items():
+        print(f"❌ {module} imports in {ms} ms, over its {budget} ms budget", file=sys.stderr)
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
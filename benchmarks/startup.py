@@ -0,0 +1,92 @@
+"""
+Measure how long it takes to import the sync entry points.
+
+Each module is imported in a fresh interpreter under `python -X importtime`.
+The run records the module's cumulative import time as the best of --repeat
+runs (noise from the machine only ever adds time), so work done at import
+time shows up: network calls, reading config, heavy imports. Modules under apps/ are imported after
+django.setup(), the way manage.py and cron load them, so only the module's
+own cost is counted.
+
+--check fails (exit 1) when a module is over its BUDGETS_MS entry. That
+covers the cron path: django_crontab runs the stage commands through
+call_command(), which imports them fresh every hour.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Milliseconds. Each measured 4-9 ms on a quiet machine (15-27 ms on a slow CI
+# box) once their credentials and `requests` were no longer loaded at import
+# time; they were 65-70 ms before. The budgets sit well clear of the first so
+# --check does not fail on noise, and below the second so that regression
+# still fails.
+BUDGETS_MS = {
+    "utils.odoo_sync": 40,
+    "apps.api.management.commands.sync_all": 45,
+    "apps.api.management.commands.sync_opensolar": 45,
+    "apps.api.management.commands.sync_contacts_to_odoo": 45,
+    "apps.api.management.commands.sync_projects_to_odoo": 45,
+}
+DEFAULT_MODULES = tuple(BUDGETS_MS)
+
+
+def import_time_ms(module):
+    """Cumulative import time of `module` in a fresh interpreter, in milliseconds."""
+    code = f"import {module}"
+    if module.startswith("apps."):
+        code = ("import os, django; os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'opensolar_sync.settings'); "
+                f"django.setup(); {code}")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+    for line in reversed(proc.stderr.splitlines()):
+        # "import time: self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1000
+    raise RuntimeError(f"no importtime line for {module}")
+
+
+def measure(modules, repeat):
+    return {module: round(min(import_time_ms(module) for _ in range(max(repeat, 1))), 1)
+            for module in modules}
+
+
+def over_budget(results):
+    """{module: (measured, budget)} for every module slower than its budget."""
+    return {module: (ms, BUDGETS_MS[module]) for module, ms in results.items()
+            if module in BUDGETS_MS and ms > BUDGETS_MS[module]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", action="append", help=f"Module to import (repeatable; default {', '.join(DEFAULT_MODULES)})")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="Also write the results to this JSON file")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if a module is over its budget")
+    args = parser.parse_args(argv)
+
+    results = measure(args.module or DEFAULT_MODULES, args.repeat)
+    for module, ms in results.items():
+        budget = BUDGETS_MS.get(module)
+        print(f"   {module:<52} {ms:8.1f} ms" + (f"  (budget {budget} ms)" if budget else ""), file=sys.stderr)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump({"import_ms": results}, fh, indent=2)
+            fh.write("\n")
+
+    over = over_budget(results)
+    for module, (ms, budget) in over.items():
+        print(f"❌ {module} imports in {ms} ms, over its {budget} ms budget", file=sys.stderr)
+    return 1 if args.check and over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
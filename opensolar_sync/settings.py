@@ -6,11 +6,17 @@ import os
 # Load environment variables from .env file
 load_dotenv()
 
-# OpenSolar and Odoo API configuration from the .env file
-OPENSOLAR_API_TOKEN = config('OPENSOLAR_API_TOKEN')
-ODOO_URL = config('ODOO_URL')
-ODOO_DB = config('ODOO_DB')
-ODOO_API_TOKEN = config("ODOO_API_TOKEN")
+# OpenSolar and Odoo API configuration from the .env file. Empty is allowed
+# here so that manage.py help, migrations and the admin run without
+# credentials; the sync code checks them on first use (apps.api.conf).
+OPENSOLAR_API_TOKEN = config('OPENSOLAR_API_TOKEN', default='')
+OPENSOLAR_ORG_ID = config('OPENSOLAR_ORG_ID', default='')
+OPENSOLAR_BASE_URL = config('OPENSOLAR_BASE_URL', default='https://api.opensolar.com/api')  # point at a fake for benchmarks
+OPENSOLAR_GET_DELAY = config('OPENSOLAR_GET_DELAY', default=1.0, cast=float)  # seconds between GETs
+ODOO_URL = config('ODOO_URL', default='')
+ODOO_DB = config('ODOO_DB', default='')
+ODOO_API_USERNAME = config('ODOO_API_USERNAME', default='')
+ODOO_API_TOKEN = config("ODOO_API_TOKEN", default='')
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -19,11 +25,14 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 DATABASES = {
     'default': {
         'ENGINE':   'django.db.backends.postgresql',
-        'NAME':     config('DATABASE_NAME'),
-        'USER':     config('DATABASE_USER'),
-        'PASSWORD': config('DATABASE_PASSWORD'),
+        'NAME':     config('DATABASE_NAME', default=''),
+        'USER':     config('DATABASE_USER', default=''),
+        'PASSWORD': config('DATABASE_PASSWORD', default=''),
         'HOST':     config('DATABASE_HOST', default='localhost'),
         'PORT':     config('DATABASE_PORT', default='5432'),
+        # Reuse connections between requests and run_sync_daemon cycles.
+        'CONN_MAX_AGE': config('DATABASE_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -44,6 +53,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'apps.api',  
 ]
@@ -112,3 +122,41 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 SYNC_SECRET = os.getenv("SYNC_SECRET", "")
 
+# Per-call tracing of OpenSolar/Odoo requests: JSONL file, empty = off
+SYNC_TRACE_FILE = os.getenv("SYNC_TRACE_FILE", "")
+
+# OpenSolar project-change webhooks (/api/webhooks/opensolar/)
+OPENSOLAR_WEBHOOK_SECRET = os.getenv("OPENSOLAR_WEBHOOK_SECRET", "")
+WEBHOOK_COALESCE_SECONDS = config("WEBHOOK_COALESCE_SECONDS", default=10, cast=int)
+
+# Outbound OpenSolar/Odoo calls (apps/api/circuit.py): timeouts in seconds, and
+# the circuit breaker that fails fast after repeated connection errors/5xx
+SYNC_CONNECT_TIMEOUT = config("SYNC_CONNECT_TIMEOUT", default=5, cast=float)
+SYNC_READ_TIMEOUT = config("SYNC_READ_TIMEOUT", default=60, cast=float)
+SYNC_BREAKER_FAILURES = config("SYNC_BREAKER_FAILURES", default=5, cast=int)
+SYNC_BREAKER_RESET_SECONDS = config("SYNC_BREAKER_RESET_SECONDS", default=30, cast=float)
+
+# Adaptive (AIMD) limits on requests in flight per system (apps/api/concurrency.py);
+# max_limit is also the number of fetch/push worker threads
+SYNC_CONCURRENCY = {
+    "opensolar": {"initial": 1, "max_limit": config("OPENSOLAR_MAX_CONCURRENCY", default=8, cast=int)},
+    "odoo":      {"initial": 2, "max_limit": config("ODOO_MAX_CONCURRENCY", default=8, cast=int)},
+}
+
+# Seconds between the starts of two run_sync_daemon cycles
+SYNC_DAEMON_INTERVAL = config("SYNC_DAEMON_INTERVAL", default=300, cast=float)
+
+# Per-stage cadences for `run_sync_daemon --schedule` (see apps/api/scheduler.py).
+# Seconds for "every"/"jitter"; "at" is HH:MM in TIME_ZONE.
+SYNC_SCHEDULE = {
+    "webhooks": {"command": "process_webhooks", "every": 60},
+    "ingest":   {"command": "sync_opensolar", "every": 300, "jitter": 30},
+    "contacts": {"command": "sync_contacts_to_odoo", "every": 600, "jitter": 60},
+    "projects": {"command": "sync_projects_to_odoo", "every": 600, "jitter": 60},
+    "retries":  {"command": "retry_failures", "every": 300, "jitter": 30},
+    # Nightly full re-fetch, in case a change didn't move OpenSolar's modified_date.
+    "full":     {"command": "sync_all", "at": "02:30", "jitter": 900, "exclusive": True,
+                 "options": {"full": True}},
+}
+SYNC_SCHEDULE_MAX_CONCURRENT = config("SYNC_SCHEDULE_MAX_CONCURRENT", default=2, cast=int)
+
@@ -1,24 +1,147 @@
+"""
+XML-RPC helpers for pushing one OpenSolar payload into Odoo.
+
+Nothing touches the network at import time: the connection is built,
+authenticated and cached on the first execute_kw() call (see
+get_connection()), reuses one keep-alive HTTP connection for every call,
+and logs in again once if Odoo rejects the cached uid.
+"""
 import os
-import xmlrpc.client
-from decouple import Config, RepositoryEnv
-
-# Load .env
-env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
-env_config = Config(RepositoryEnv(env_path))
-
-# Odoo credentials
-ODOO_URL = env_config("ODOO_URL")
-ODOO_DB = env_config("ODOO_DB")
-ODOO_USERNAME = env_config("ODOO_API_USERNAME")
-ODOO_PASSWORD = env_config("ODOO_API_TOKEN")
-
-# Connect to Odoo
-common = xmlrpc.client.ServerProxy(f"{ODOO_URL}/xmlrpc/2/common")
-uid = common.authenticate(ODOO_DB, ODOO_USERNAME, ODOO_PASSWORD, {})
-if not uid:
-    raise Exception("❌ Odoo authentication failed.")
-
-models = xmlrpc.client.ServerProxy(f"{ODOO_URL}/xmlrpc/2/object")
+import threading
+from decouple import AutoConfig
+
+from apps.api import circuit
+from apps.api.tracing import span
+
+# Settings come from the environment, then the project's .env.
+env_config = AutoConfig(search_path=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class OdooAuthError(Exception):
+    pass
+
+
+class KeepAliveTransport:
+    """
+    xmlrpc.client transport that sends requests through a pooled
+    requests.Session, so the common and object endpoints share keep-alive
+    connections instead of opening a new one per ServerProxy. Calls go
+    through the "odoo" circuit breaker; `timeout` defaults to
+    circuit.timeouts().
+    """
+    user_agent = "opensolar-sync (xmlrpc)"
+
+    def __init__(self, scheme="https", session=None, timeout=None):
+        self.scheme = scheme
+        self.timeout = timeout
+        self._session = session
+
+    @property
+    def session(self):
+        if self._session is None:
+            import requests  # deferred: it is most of this module's import cost
+            self._session = requests.Session()
+        return self._session
+
+    def request(self, host, handler, request_body, verbose=False):
+        import xmlrpc.client
+        url = f"{self.scheme}://{host}{handler}"
+        with circuit.guard("odoo") as call:
+            resp = self.session.post(url, data=request_body, timeout=self.timeout or circuit.timeouts(),
+                                     headers={"Content-Type": "text/xml", "User-Agent": self.user_agent})
+            call.check(resp.status_code)
+        if resp.status_code != 200:
+            raise xmlrpc.client.ProtocolError(url, resp.status_code, resp.reason, dict(resp.headers))
+        parser, unmarshaller = xmlrpc.client.getparser()
+        parser.feed(resp.content)
+        parser.close()
+        return unmarshaller.close()
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+
+
+class OdooConnection:
+    """An authenticated XML-RPC connection to one Odoo database; logs in on first use."""
+
+    def __init__(self, url, db, username, password, session=None, timeout=None):
+        import xmlrpc.client  # deferred with the rest of the connection: http.client and ssl are not cheap
+        self.url = url.rstrip("/")
+        self.db = db
+        self.username = username
+        self.password = password
+        transport = KeepAliveTransport(self.url.split("://", 1)[0], session=session, timeout=timeout)
+        self.common = xmlrpc.client.ServerProxy(f"{self.url}/xmlrpc/2/common", transport=transport, allow_none=True)
+        self.models = xmlrpc.client.ServerProxy(f"{self.url}/xmlrpc/2/object", transport=transport, allow_none=True)
+        self._uid = None
+        self._lock = threading.Lock()
+
+    @property
+    def uid(self):
+        if self._uid is None:
+            with self._lock:
+                if self._uid is None:
+                    self._uid = self.authenticate()
+        return self._uid
+
+    def authenticate(self):
+        with span("odoo", "common.authenticate"):
+            uid = self.common.authenticate(self.db, self.username, self.password, {})
+        if not uid:
+            raise OdooAuthError("❌ Odoo authentication failed.")
+        return uid
+
+    def execute_kw(self, model, method, *args):
+        """models.execute_kw with our credentials, traced as "<model>.<method>"."""
+        import xmlrpc.client
+        uid = self.uid
+        try:
+            return self._execute_kw(uid, model, method, args)
+        except xmlrpc.client.Fault as e:
+            if "Access Denied" not in e.faultString:
+                raise
+        # The cached uid was rejected (password rotated, user re-created): log in again, once.
+        with self._lock:
+            if self._uid == uid:
+                self._uid = None
+        return self._execute_kw(self.uid, model, method, args)
+
+    def _execute_kw(self, uid, model, method, args):
+        with span("odoo", f"{model}.{method}"):
+            return self.models.execute_kw(self.db, uid, self.password, model, method, *args)
+
+
+_connection = None
+_connection_lock = threading.Lock()
+
+
+def get_connection():
+    """The shared OdooConnection, created from ODOO_* settings on first use."""
+    global _connection
+    if _connection is None:
+        with _connection_lock:
+            if _connection is None:
+                _connection = OdooConnection(
+                    env_config("ODOO_URL"),
+                    env_config("ODOO_DB"),
+                    env_config("ODOO_API_USERNAME"),
+                    env_config("ODOO_API_TOKEN"),
+                )
+    return _connection
+
+
+def set_connection(connection):
+    """Swap the shared connection (tests, or a caller that manages its own); returns the previous one."""
+    global _connection
+    with _connection_lock:
+        previous, _connection = _connection, connection
+    return previous
+
+
+def execute_kw(model, method, *args):
+    """models.execute_kw on the shared connection, traced as "<model>.<method>"."""
+    return get_connection().execute_kw(model, method, *args)
 
 
 def sync_opensolar_payload_to_odoo(payload):
@@ -51,8 +174,7 @@ def sync_opensolar_payload_to_odoo(payload):
     # Lookup country
     country_id = None
     if country_name:
-        country_ids = models.execute_kw(
-            ODOO_DB, uid, ODOO_PASSWORD,
+        country_ids = execute_kw(
             'res.country', 'search',
             [[['name', '=', country_name]]],
             {'limit': 1}
@@ -63,8 +185,7 @@ def sync_opensolar_payload_to_odoo(payload):
     # Lookup state
     state_id = None
     if state_code and country_id:
-        state_ids = models.execute_kw(
-            ODOO_DB, uid, ODOO_PASSWORD,
+        state_ids = execute_kw(
             'res.country.state', 'search',
             [[['code', '=', state_code], ['country_id', '=', country_id]]],
             {'limit': 1}
@@ -73,8 +194,7 @@ def sync_opensolar_payload_to_odoo(payload):
             state_id = state_ids[0]
 
     # === Find or Create Contact ===
-    partner_ids = models.execute_kw(
-        ODOO_DB, uid, ODOO_PASSWORD,
+    partner_ids = execute_kw(
         'res.partner', 'search',
         [[['email', '=', email]]],
         {'limit': 1}
@@ -99,16 +219,14 @@ def sync_opensolar_payload_to_odoo(payload):
         if state_id:
             partner_data['state_id'] = state_id
 
-        partner_id = models.execute_kw(
-            ODOO_DB, uid, ODOO_PASSWORD,
+        partner_id = execute_kw(
             'res.partner', 'create',
             [partner_data]
         )
         print(f"✅ Created new contact ID: {partner_id}")
 
     # === Prevent Duplicate Project Creation ===
-    existing_project_ids = models.execute_kw(
-        ODOO_DB, uid, ODOO_PASSWORD,
+    existing_project_ids = execute_kw(
         'x_projects', 'search',
         [[['x_studio_opensolar_id', '=', external_id]]],
         {'limit': 1}
@@ -121,8 +239,7 @@ def sync_opensolar_payload_to_odoo(payload):
 
     # === Create Project ===
     print(f"🛠 Creating project: {project_name}")
-    project_id = models.execute_kw(
-        ODOO_DB, uid, ODOO_PASSWORD,
+    project_id = execute_kw(
         'x_projects', 'create',
         [{
             'x_name': project_name,